@@ -1,11 +1,20 @@
 """Modified implementation of MCRCon for testing/dev with fake_server"""
 
 import select
+import socket
+import ssl
 import struct
 
 from mcrcon import MCRcon as MCRconLib, MCRconException
 
 
+class BatchError(MCRconException):
+    """A batch failed partway; `replies` answer the commands before it."""
+    def __init__(self, message, replies):
+        super().__init__(message)
+        self.replies = replies
+
+
 class MCRcon(MCRconLib):
     """Override MCRcon to add a functioning id to rcon messaging.
 
@@ -33,48 +42,292 @@ class MCRcon(MCRconLib):
 
     I logged every packet out of the server up to the transport and
     couldn't find any deviation between failure and success.
+
+    The parent class implements its timeout with SIGALRM, which can only be
+    installed from the main thread and always fires in the main thread. We
+    use socket timeouts instead so connections can be created and used from
+    any request thread (see MCRconPool).
+
+    With framing=True, replies are framed deterministically instead of by
+    polling select() for more data, which races the server: a reply split
+    over several packets can be returned half read. Source RCON servers
+    echo an empty SERVERDATA_RESPONSE_VALUE packet back with its own ID (and
+    Minecraft answers it with "Unknown request 0"), always after the reply
+    to the command before it. So once the first packet of the reply
+    arrives, we send such a sentinel and keep reading until its ID comes
+    back; everything with the command's ID in between is the reply.
+
+      client            server
+      ------            ------
+      command (id 1) -->
+                     <--    reply (id 1)
+      sentinel (id 2)-->
+                     <--    reply (id 1)
+                     <--    sentinel (id 2)
+
+    The sentinel isn't sent together with the command because vanilla
+    servers expect every TCP read to hold exactly one packet (MC-72390) and
+    drop the connection otherwise.
+
+    Servers that do parse a stream of packets can be sent a whole batch at
+    once; with pipelining=True, command_many() writes every command and a
+    single sentinel back-to-back and sorts the replies out by ID, so a batch
+    costs about one round trip instead of one per command.
+
+    Incoming bytes are received with recv_into() into one reusable buffer,
+    and every packet already sitting in the buffer is parsed without
+    another syscall. A reply's payloads are joined once and decoded once,
+    so a long multi-packet reply costs linear rather than quadratic copying.
     """
-    def __init__(self, host, password, port=25575, tlsmode=0, timeout=5):
-        """Extends init to define self.id_"""
-        super().__init__(host, password, port, tlsmode, timeout)
+    RECV_BUFFER_SIZE = 65536
+    SERVERDATA_AUTH = 3
+    SERVERDATA_AUTH_RESPONSE = 2
+    SERVERDATA_EXECCOMMAND = 2
+    SERVERDATA_RESPONSE_VALUE = 0
+
+    def __init__(self, host, password, port=25575, tlsmode=0, timeout=5,
+                 framing=False, pipelining=False):
+        """Replaces init to define self.id_ without installing SIGALRM"""
+        self.host = host
+        self.password = password
+        self.port = port
+        self.tlsmode = tlsmode
+        self.timeout = timeout
+        self.framing = framing
+        self.pipelining = pipelining
         self.id_ = 0
+        # running totals, for metrics
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._reset_buffer()
 
-    def _send(self, out_type, out_data):
-        """Override to discard resposne packets not matching the request ID."""
+    def connect(self):
+        """Override to connect with a socket timeout rather than an alarm."""
+        self._reset_buffer()
+        self.socket = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout)
+
+        # Enable TLS
+        if self.tlsmode > 0:
+            ctx = ssl.create_default_context()
+
+            # Disable hostname and certificate verification
+            if self.tlsmode > 1:
+                ctx.check_hostname = False
+                ctx.verify_mode = ssl.CERT_NONE
+
+            self.socket = ctx.wrap_socket(
+                self.socket, server_hostname=self.host)
+
+        self._send(3, self.password)
+
+    def _reset_buffer(self):
+        self._rbuf = bytearray(self.RECV_BUFFER_SIZE)
+        self._rview = memoryview(self._rbuf)
+        self._rstart = 0  # first unread byte
+        self._rend = 0    # end of the received bytes
+
+    def _fill(self, length):
+        """Make sure at least `length` unread bytes are buffered.
+
+        Each recv_into() takes as much as fits in the buffer, which is
+        often several packets.
+        """
+        while self._rend - self._rstart < length:
+            unread = self._rend - self._rstart
+            if len(self._rbuf) - self._rstart < length:
+                # no room after the unread bytes; move them to the front of
+                #   this (or a bigger) buffer
+                tail = bytes(self._rview[self._rstart:self._rend])
+                if length > len(self._rbuf):
+                    self._rview.release()
+                    self._rbuf = bytearray(max(length, 2 * len(self._rbuf)))
+                    self._rview = memoryview(self._rbuf)
+                self._rbuf[:unread] = tail
+                self._rstart, self._rend = 0, unread
+            try:
+                received = self.socket.recv_into(self._rview[self._rend:])
+            except socket.timeout:
+                raise MCRconException("Connection timeout error")
+            if not received:
+                raise MCRconException("Connection closed by server")
+            self.bytes_received += received
+            self._rend += received
+
+    def _buffered(self):
+        """Return True if received bytes are waiting to be parsed."""
+        return self._rend > self._rstart
+
+    def _read(self, length):
+        """Override to read through the receive buffer (see _fill)."""
+        self._fill(length)
+        data = bytes(self._rview[self._rstart:self._rstart + length])
+        self._rstart += length
+        return data
+
+    def command(self, command):
+        """Override to skip the MC-72390 sleep when framing.
+
+        Reading the sentinel's reply already guarantees the server consumed
+        our last packet before the next one is sent.
+        """
+        if self.framing:
+            return self._send(self.SERVERDATA_EXECCOMMAND, command)
+        return super().command(command)
+
+    def command_many(self, commands):
+        """Run several commands, returning their replies in the same order.
+
+        Without pipelining the commands simply run one after another. If
+        the connection fails partway, BatchError has the replies to the
+        commands answered before it.
+        """
         if self.socket is None:
             raise MCRconException("Must connect before sending data")
+        if not self.pipelining:
+            replies = []
+            try:
+                for command in commands:
+                    replies.append(self.command(command))
+            except (MCRconException, OSError) as e:
+                raise BatchError(str(e), replies) from e
+            return replies
 
-        # Send a request packet
-        out_id = self.id_
+        # Write every request and a closing sentinel in one go
+        out_ids = dict()
+        out_packets = list()
+        for index, command in enumerate(commands):
+            out_id = self._next_id()
+            out_ids[out_id] = index
+            out_packets.append(self._pack(
+                out_id, self.SERVERDATA_EXECCOMMAND, command))
+        sentinel_id = self._next_id()
+        out_packets.append(self._pack(
+            sentinel_id, self.SERVERDATA_RESPONSE_VALUE, ""))
+        out_data = b"".join(out_packets)
+        in_data = [[] for _ in commands]
+        current = 0  # the replies before this one are complete
+        try:
+            self.socket.sendall(out_data)
+            self.bytes_sent += len(out_data)
+
+            # The server answers in order, so the sentinel's reply comes last
+            while True:
+                in_id, in_type, in_data_partial = self._read_packet()
+                if in_id == sentinel_id:
+                    return [b"".join(chunks).decode("utf8")
+                            for chunks in in_data]
+                index = out_ids.get(in_id)
+                if index is not None:
+                    in_data[index].append(in_data_partial)
+                    current = index
+        except (MCRconException, OSError) as e:
+            raise BatchError(str(e), [
+                b"".join(chunks).decode("utf8")
+                for chunks in in_data[:current]]) from e
+
+    def _next_id(self):
+        """Return a request ID; IDs are positive 32 bit ints, -1 is reserved"""
+        id_ = self.id_
+        self.id_ = (self.id_ + 1) % 0x7fffffff
+        return id_
+
+    @staticmethod
+    def _pack(out_id, out_type, out_data):
+        """Return a request packet as bytes."""
         out_payload = (
             struct.pack("<ii", out_id, out_type) + out_data.encode("utf8") + b"\x00\x00"
         )
-        self.id_ += 1
         out_length = struct.pack("<i", len(out_payload))
-        self.socket.send(out_length + out_payload)
+        return out_length + out_payload
+
+    def _send_packet(self, out_id, out_type, out_data):
+        """Write a single request packet."""
+        packet = self._pack(out_id, out_type, out_data)
+        self.socket.sendall(packet)
+        self.bytes_sent += len(packet)
+
+    def _read_packet(self):
+        """Read a single response packet; return (id, type, payload bytes)."""
+        self._fill(4)
+        (in_length,) = struct.unpack_from("<i", self._rbuf, self._rstart)
+        if in_length < 10:
+            raise MCRconException("Invalid packet length")
+        self._fill(4 + in_length)
+        start = self._rstart + 4
+        end = start + in_length
+        in_id, in_type = struct.unpack_from("<ii", self._rbuf, start)
+        in_padding = self._rview[end - 2:end]
+        in_data_partial = bytes(self._rview[start + 8:end - 2])
+        if self._rend == end:
+            # all parsed; start the next recv at the front of the buffer
+            self._rstart = self._rend = 0
+        else:
+            self._rstart = end
+
+        # Sanity checks
+        if in_padding != b"\x00\x00":
+            raise MCRconException("Incorrect padding")
+        if in_id == -1:
+            raise MCRconException("Login failed")
+        return in_id, in_type, in_data_partial
+
+    def _send(self, out_type, out_data):
+        """Override to discard resposne packets not matching the request ID."""
+        if self.socket is None:
+            raise MCRconException("Must connect before sending data")
+        if self.framing:
+            return self._send_framed(out_type, out_data)
+
+        # Send a request packet
+        out_id = self._next_id()
+        self._send_packet(out_id, out_type, out_data)
 
         # Read response packets
-        in_data = ""
+        in_data = []
         while True:
             # Read a packet
-            (in_length,) = struct.unpack("<i", self._read(4))
-            in_payload = self._read(in_length)
-            in_id, in_type = struct.unpack("<ii", in_payload[:8])
-            in_data_partial, in_padding = in_payload[8:-2], in_payload[-2:]
-
-            # Sanity checks
-            if in_padding != b"\x00\x00":
-                raise MCRconException("Incorrect padding")
-            if in_id == -1:
-                raise MCRconException("Login failed")
+            in_id, in_type, in_data_partial = self._read_packet()
 
             # Record the response
-            in_data += in_data_partial.decode("utf8")
+            in_data.append(in_data_partial)
 
             # If there's nothing more to receive, return the response
-            if len(select.select([self.socket], [], [], 0)[0]) == 0:
+            if (not self._buffered()
+                    and len(select.select([self.socket], [], [], 0)[0]) == 0):
                 # Discard packets if the id doesn't match our last request's ID
                 if in_id != out_id:
-                    in_data = ""
+                    in_data = []
                     continue
-                return in_data
+                return b"".join(in_data).decode("utf8")
+
+    def _send_framed(self, out_type, out_data):
+        """Send a request and read exactly its reply (see class docstring)."""
+        out_id = self._next_id()
+        self._send_packet(out_id, out_type, out_data)
+
+        if out_type == self.SERVERDATA_AUTH:
+            # Some servers send an empty RESPONSE_VALUE before AUTH_RESPONSE
+            while True:
+                in_id, in_type, _ = self._read_packet()
+                if in_id == out_id and in_type == self.SERVERDATA_AUTH_RESPONSE:
+                    return ""
+
+        sentinel_id = None
+        in_data = []
+        while True:
+            in_id, in_type, in_data_partial = self._read_packet()
+            if in_id == out_id:
+                in_data.append(in_data_partial)
+                if sentinel_id is None:
+                    sentinel_id = self._next_id()
+                    self._send_packet(
+                        sentinel_id, self.SERVERDATA_RESPONSE_VALUE, "")
+            elif in_id == sentinel_id:
+                return b"".join(in_data).decode("utf8")
+            # Anything else is left over from an earlier request (e.g. the
+            #   second packet rcon-server sends for a sentinel); discard it
+
+
+from .pool import MCRconPool, PoolTimeout
+from .aio import AsyncMCRcon, AsyncMCRconPool
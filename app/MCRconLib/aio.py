@@ -0,0 +1,254 @@
+"""An asyncio RCON client speaking the same protocol as MCRcon"""
+
+import asyncio
+import logging
+import struct
+
+from mcrcon import MCRconException
+
+from . import MCRcon
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending():
+    """A command waiting on its reply."""
+    __slots__ = ('chunks', 'first', 'done')
+
+    def __init__(self, loop):
+        self.chunks = []
+        self.first = loop.create_future()
+        self.done = loop.create_future()
+
+
+class AsyncMCRcon():
+    """Run many concurrent commands over one RCON connection.
+
+    Replies are matched to commands by request ID and framed with a sentinel
+    packet exactly as MCRcon does with framing=True (see its docstring); a
+    single reader task dispatches every incoming packet to whichever command
+    is waiting on that ID.
+
+    Vanilla servers drop a connection when one TCP read holds more than one
+    packet (MC-72390), so by default a packet is only written once the
+    server has answered the previous one. Commands still interleave (one's
+    sentinel goes out while another's reply is read) and no thread blocks
+    while waiting. With pipelining=True packets are written immediately.
+
+      async with AsyncMCRcon('localhost', 'password') as mcr:
+          replies = await asyncio.gather(mcr.command('list'), ...)
+    """
+
+    def __init__(self, host, password, port=25575, timeout=5,
+                 pipelining=False):
+        self.host = host
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.pipelining = pipelining
+        self.id_ = 0
+
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = dict()
+        self._sentinels = dict()
+        self._write_lock = None
+        self._answered = None
+        self._last_id = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, type, value, tb):
+        await self.disconnect()
+
+    @property
+    def connected(self):
+        return self._reader_task is not None and not self._reader_task.done()
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    async def connect(self):
+        """Connect and authenticate, then start dispatching replies."""
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        self._write_lock = asyncio.Lock()
+        self._answered = asyncio.Event()
+        self._answered.set()
+
+        # Some servers send an empty RESPONSE_VALUE before AUTH_RESPONSE
+        out_id = self._next_id()
+        try:
+            self._writer.write(
+                MCRcon._pack(out_id, MCRcon.SERVERDATA_AUTH, self.password))
+            while True:
+                in_id, in_type, _ = await asyncio.wait_for(
+                    self._read_packet(), self.timeout)
+                if (in_id == out_id
+                        and in_type == MCRcon.SERVERDATA_AUTH_RESPONSE):
+                    break
+        except BaseException:
+            await self.disconnect()
+            raise
+        self._reader_task = asyncio.get_running_loop().create_task(
+            self._dispatch())
+
+    async def disconnect(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def command(self, command):
+        """Run a command and return its complete reply."""
+        if not self.connected:
+            raise MCRconException("Must connect before sending data")
+        loop = asyncio.get_running_loop()
+        out_id = self._next_id()
+        pending = self._pending[out_id] = _Pending(loop)
+        try:
+            await self._write(
+                out_id, MCRcon.SERVERDATA_EXECCOMMAND, command)
+            await asyncio.wait_for(
+                asyncio.shield(pending.first), self.timeout)
+            sentinel_id = self._next_id()
+            self._sentinels[sentinel_id] = out_id
+            await self._write(
+                sentinel_id, MCRcon.SERVERDATA_RESPONSE_VALUE, "")
+            return await asyncio.wait_for(
+                asyncio.shield(pending.done), self.timeout)
+        except asyncio.TimeoutError:
+            # a late reply would hold up every later write (and with it the
+            #   other commands), so the connection is given up on
+            error = MCRconException("Connection timeout error")
+            self._pending.pop(out_id, None)
+            self._fail(error)
+            await self.disconnect()
+            raise error
+        finally:
+            self._pending.pop(out_id, None)
+
+    def _fail(self, error):
+        """Fail every command still waiting on a reply with error."""
+        for pending in self._pending.values():
+            for future in (pending.first, pending.done):
+                if not future.done():
+                    future.set_exception(error)
+        self._answered.set()
+
+    def _next_id(self):
+        id_ = self.id_
+        self.id_ = (self.id_ + 1) % 0x7fffffff
+        return id_
+
+    async def _write(self, out_id, out_type, out_data):
+        async with self._write_lock:
+            if not self.pipelining:
+                await asyncio.wait_for(self._answered.wait(), self.timeout)
+                self._answered.clear()
+            self._last_id = out_id
+            self._writer.write(MCRcon._pack(out_id, out_type, out_data))
+            await self._writer.drain()
+
+    async def _read_packet(self):
+        try:
+            header = await self._reader.readexactly(4)
+            (in_length,) = struct.unpack("<i", header)
+            in_payload = await self._reader.readexactly(in_length)
+        except asyncio.IncompleteReadError:
+            raise MCRconException("Connection closed by server")
+        in_id, in_type = struct.unpack("<ii", in_payload[:8])
+        if in_payload[-2:] != b"\x00\x00":
+            raise MCRconException("Incorrect padding")
+        if in_id == -1:
+            raise MCRconException("Login failed")
+        return in_id, in_type, in_payload[8:-2]
+
+    async def _dispatch(self):
+        """Route every incoming packet to the command waiting on its ID."""
+        try:
+            while True:
+                in_id, in_type, in_data = await self._read_packet()
+                if in_id == self._last_id:
+                    self._answered.set()
+                pending = self._pending.get(in_id)
+                if pending is not None:
+                    pending.chunks.append(in_data)
+                    if not pending.first.done():
+                        pending.first.set_result(None)
+                    continue
+                out_id = self._sentinels.pop(in_id, None)
+                pending = self._pending.get(out_id)
+                if pending is not None and not pending.done.done():
+                    pending.done.set_result(
+                        b"".join(pending.chunks).decode("utf8"))
+                # anything else is left over from an earlier request
+        except Exception as e:
+            error = e if isinstance(e, MCRconException) else \
+                MCRconException(f"Connection lost: {e!r}")
+            logger.info(f'RCON connection lost: {error}')
+            self._fail(error)
+
+
+class AsyncMCRconPool():
+    """Spread concurrent commands over up to `size` AsyncMCRcon connections.
+
+    Each command goes to the open connection with the fewest commands in
+    flight; a new connection is opened while there's room and every open
+    one is busy. Dead connections are replaced on the next command.
+    """
+
+    def __init__(self, factory, size=2):
+        self._factory = factory
+        self.size = size
+        self._connections = []
+        self._lock = None
+
+    async def command(self, command):
+        mcr = await self._connection()
+        try:
+            return await mcr.command(command)
+        except MCRconException:
+            if not mcr.connected and mcr in self._connections:
+                self._connections.remove(mcr)
+                await mcr.disconnect()
+            raise
+
+    async def close(self):
+        connections, self._connections = self._connections, []
+        for mcr in connections:
+            await mcr.disconnect()
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'open': len(self._connections),
+            'in_flight': sum(mcr.in_flight for mcr in self._connections),
+        }
+
+    async def _connection(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for mcr in [m for m in self._connections if not m.connected]:
+                self._connections.remove(mcr)
+                await mcr.disconnect()
+            idle = [m for m in self._connections if m.in_flight == 0]
+            if idle:
+                return idle[0]
+            if len(self._connections) < self.size:
+                mcr = self._factory()
+                await mcr.connect()
+                self._connections.append(mcr)
+                return mcr
+            return min(self._connections, key=lambda m: m.in_flight)
@@ -0,0 +1,194 @@
+"""A bounded, thread-safe pool of authenticated MCRcon connections"""
+
+from collections import deque
+from contextlib import contextmanager
+import logging
+import select
+import socket
+import threading
+import time
+
+from mcrcon import MCRconException
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(MCRconException):
+    """No connection became available before the acquire timeout."""
+
+
+class MCRconPool():
+    """Hand out MCRcon connections to one thread at a time.
+
+    A single MCRcon socket shared between request threads mixes up replies
+    (or serializes every request behind a lock). The pool instead keeps up to
+    `size` authenticated connections; a thread checks one out, runs its
+    command(s) and checks it back in. Connections are opened on demand and
+    kept for reuse. When all of them are busy, acquire() waits up to
+    `timeout` seconds before raising PoolTimeout.
+
+      pool = MCRconPool(lambda: MCRcon('localhost', 'password'), size=4)
+      with pool.connection() as mcr:
+          mcr.command('list')
+    """
+
+    def __init__(self, factory, size=4, timeout=5):
+        """
+        Arguments:
+        factory
+            A callable returning a new, unconnected MCRcon object.
+        size
+            The maximum number of open connections.
+        timeout
+            Default number of seconds acquire() waits for a free connection.
+        """
+        if size < 1:
+            raise ValueError('pool size must be at least 1')
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._waiting = 0
+        self._closed = False
+
+        # counters reported by stats()
+        self._created = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._reconnects = 0
+        self._lost = 0  # discarded connections not yet replaced
+
+    def acquire(self, timeout=None):
+        """Check out a healthy connection, opening one if there is room."""
+        if timeout is None:
+            timeout = self.timeout
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise MCRconException('Connection pool is closed')
+                # most recently used first; it is the least likely to be stale
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._healthy(conn):
+                        self._checkouts += 1
+                        return conn
+                    logger.info('discarding unhealthy RCON connection')
+                    self._drop(conn)
+                if self._open < self.size:
+                    # reserve a slot; connect outside the lock
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f'No RCON connection available after {timeout}s')
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            conn = self._factory()
+            conn.connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+            self._checkouts += 1
+            if self._lost:
+                self._lost -= 1
+                self._reconnects += 1
+        return conn
+
+    def warm(self, count=1):
+        """Open connections now so up to `count` are idle and ready."""
+        conns = []
+        try:
+            for _ in range(0, min(count, self.size)):
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                self.release(conn)
+
+    def release(self, conn, discard=False):
+        """Check a connection back in; discard it if it is no longer usable."""
+        with self._cond:
+            if discard or self._closed or conn.socket is None:
+                self._drop(conn)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager around acquire() and release().
+
+        If the block raises, the connection is discarded; we can't know how
+        much of a reply is left unread on the socket.
+        """
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    def close(self):
+        """Disconnect idle connections; busy ones are closed on release."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._drop(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self):
+        """Return a snapshot of pool usage counters."""
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'waiting': self._waiting,
+                'created': self._created,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'reconnects': self._reconnects,
+            }
+
+    def _drop(self, conn):
+        """Disconnect a connection and free its slot (caller holds lock)."""
+        try:
+            conn.disconnect()
+        except Exception:
+            pass
+        self._open -= 1
+        self._discarded += 1
+        if not self._closed:
+            self._lost += 1
+
+    @staticmethod
+    def _healthy(conn):
+        """Cheap liveness check; a readable socket with no data is closed."""
+        if conn.socket is None:
+            return False
+        try:
+            readable, _, _ = select.select([conn.socket], [], [], 0)
+            if readable:
+                return conn.socket.recv(1, socket.MSG_PEEK) != b''
+        except (OSError, ValueError):
+            return False
+        return True
@@ -2,12 +2,19 @@
 import atexit
 import logging
 from logging.config import dictConfig
+from logging.handlers import (
+    MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler)
 import os
+import queue
+import threading
 
 from flask import Flask
 from flask.logging import default_handler
 
-from .MCRconLib import MCRcon
+from .MCRconLib import AsyncMCRcon, AsyncMCRconPool, MCRcon, MCRconPool
+from .rcon import (AsyncMCR, CircuitBreaker, CommandCache, Dispatcher,
+                   Fleet, MCR, RCONUnavailable)
+from .slp import StatusClient
 
 ####################
 # Flask extensions #
@@ -26,49 +33,168 @@ class ApplicationLogFilter(logging.Filter):
             allow = False
         return allow
 
-class MCR():
-    def __init__(self, _mcr):
-        self._mcr = _mcr
+class DroppingQueueHandler(QueueHandler):
+    """A QueueHandler that drops records instead of blocking when full."""
+    def __init__(self, queue, listener=None):
+        super().__init__(queue)
+        # the listener writing this queue out, stopped when it's replaced
+        self.listener = listener
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class FileLogListener(QueueListener):
+    """A QueueListener whose stop() also closes its files, once."""
+    def stop(self):
+        if self._thread is None:
+            return
+        super().stop()
+        for handler in self.handlers:
+            # a MemoryHandler forgets its target when closed
+            target = getattr(handler, 'target', None)
+            handler.close()
+            if target is not None:
+                target.close()
+
+def start_file_logging(log_file, formatter, max_bytes=0, backup_count=0,
+                       queue_size=0, buffer_records=0):
+    """Log to a file from a background thread; return the QueueListener.
+
+    Records are only put on a queue by the thread that logs them, the file
+    is written (and rotated once it reaches max_bytes) by the listener's
+    thread, so request latency doesn't depend on the disk. With
+    buffer_records, records are written in batches of that many (or as
+    soon as an ERROR arrives). A full queue (queue_size) drops records.
+    Stop the listener to flush everything that's queued and close the
+    file. Any handler from an earlier call is replaced, and its listener
+    stopped.
+    """
+    fh = RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count)
+    fh.setFormatter(formatter)
+    fh.addFilter(ApplicationLogFilter())
+    handler = fh
+    if buffer_records > 1:
+        handler = MemoryHandler(
+            buffer_records, flushLevel=logging.ERROR, target=fh)
+    listener = FileLogListener(queue.Queue(queue_size), handler)
+
+    root = logging.getLogger('root')
+    old = [h for h in root.handlers if isinstance(h, QueueHandler)]
+    for handler in old:
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(listener.queue, listener))
+    listener.start()
+    # after the new one's in place, so no record goes unwritten
+    for handler in old:
+        if getattr(handler, 'listener', None) is not None:
+            handler.listener.stop()
+    return listener
+
+
+def _rcon_pool(config, size):
+    """Return an MCRconPool of up to `size` connections to one server"""
+    return MCRconPool(
+        lambda: MCRcon(
+            host=config['RCON_SERVER'],
+            password=config['RCON_PASSWD'],
+            port=config['RCON_PORT'],
+            timeout=config['RCON_TIMEOUT'],
+            framing=config['RCON_FRAMING'],
+            pipelining=config['RCON_PIPELINING']
+        ),
+        size=size,
+        timeout=config['RCON_POOL_TIMEOUT']
+    )
 
-    # This is a terrible workaround. Sometimes mcr doesn't return a value
-    # we're expecting in testing, it returns nothing. I don't know if this is
-    # a failing of our fake_server or what, but running a couple times until
-    # we get a response seems to fix things for now.
-    def command(self, command):
-        for _ in range(0,3):
-            response = self._mcr.command(command)
-            if len(response) > 0: break
-        return response
+def _rcon_clients(app, name, config):
+    """Return (MCR, AsyncMCR, job MCR) for one server's config values"""
+    address = f"{config['RCON_SERVER']}:{config['RCON_PORT']}"
+    pool = _rcon_pool(config, config['RCON_POOL_SIZE'])
+    # Connections are opened on first use; warming one in the background
+    #   spares the first request the wait and shows a bad config in the log
+    #   without holding up startup when the server is down
+    def _warm():
+        try:
+            pool.warm()
+            app.logger.info(f'Connected to RCON server "{name}" at {address}')
+        except Exception as e:
+            app.logger.error((
+                    f'Connection failure to Minecraft RCON server "{name}" '
+                    f'{address}:\n{e}'))
+
+    if config['RCON_WARM']:
+        threading.Thread(
+            target=_warm, name=f'rcon-warm-{name}', daemon=True).start()
+
+    # Every way of reaching the server takes its turn with one dispatcher
+    dispatcher = Dispatcher(
+        rate=config['RCON_RATE'],
+        burst=config['RCON_BURST'],
+        lanes=config['RCON_LANES'],
+        timeout=config['RCON_QUEUE_TIMEOUT']
+    )
+    mcr = MCR(
+        pool,
+        breaker=CircuitBreaker(
+            threshold=config['RCON_BREAKER_THRESHOLD'],
+            reset_timeout=config['RCON_BREAKER_RESET']
+        ),
+        retries=config['RCON_RETRIES'],
+        backoff=config['RCON_BACKOFF'],
+        backoff_max=config['RCON_BACKOFF_MAX'],
+        cache=CommandCache(
+            ttl=config['RCON_CACHE_TTL'],
+            invalidates=config['RCON_CACHE_INVALIDATE']
+        ),
+        dispatcher=dispatcher
+    )
 
+    # Async views share the breaker and cache but multiplex their own
+    #   connections
+    amcr = AsyncMCR(
+        AsyncMCRconPool(
+            lambda: AsyncMCRcon(
+                host=config['RCON_SERVER'],
+                password=config['RCON_PASSWD'],
+                port=config['RCON_PORT'],
+                timeout=config['RCON_TIMEOUT'],
+                pipelining=config['RCON_PIPELINING']
+            ),
+            size=config['RCON_ASYNC_CONNECTIONS']
+        ),
+        breaker=mcr._breaker,
+        dispatcher=dispatcher,
+        cache=mcr._cache
+    )
 
-def create_app(alias=None, instance_path=None):
-    '''The main function with which our flask app is created.
+    # Scheduled jobs get connections of their own, so a long one doesn't
+    #   keep requests waiting on the pool. They share the cache so a job's
+    #   kick or whitelist drops the replies it makes stale
+    job_mcr = MCR(
+        _rcon_pool(config, config['SCHEDULE_CONNECTIONS']),
+        breaker=mcr._breaker,
+        retries=config['RCON_RETRIES'],
+        backoff=config['RCON_BACKOFF'],
+        backoff_max=config['RCON_BACKOFF_MAX'],
+        cache=mcr._cache,
+        dispatcher=dispatcher
+    )
+    return mcr, amcr, job_mcr
 
-    Arguments:
-    alias
-        Used to load well-named config files (e.g. my_service.conf,
-        my_service-dev.conf, my_service-testing.conf). If not provided, this
-        value is set to os.path.basename(os.getcwd()), the projects package
-        directory, which should be appropriately named.
-    instance_path
-        The instance path is where config files and other read/write data
-        should go. This defaults to ./instance in the project's package when
-        run locally using "flask run" (regardless of profile: dev, production,
-        or testing). When deployed, the default appears to be [relative to
-        the package] ../var/alias-instance when considering $PREFIX. I'm
-        not sure how $PREFIX is set, but you can try and read about "instance
-        folders" in the Flask documentation. Set this in the wsgi to a
-        convenient location (e.g. /opt/var/alias).
-        Anyway! This is basically mandatory because the default sucks.
-    '''
 
-    # Initial setup & app creation
-    # ----------------------------
-    # Configure the application logger
-    format_string = ('%(levelname)s [%(asctime)s] '
-                     '%(name)s.%(module)s.%(funcName)s(): %(message)s')
+_logging_configured = False
+
+def _configure_logging(format_string):
+    """Set up the root logger; the file handler is added by create_app"""
     dictConfig({
         'version': 1,
+        # modules imported before this, like app.rcon, keep logging
+        'disable_existing_loggers': False,
         'formatters': {
             'default': {
                 # Brief vs precise formatters are below (one is commented out).
@@ -100,6 +226,38 @@ def create_app(alias=None, instance_path=None):
         },
     })
 
+
+def create_app(alias=None, instance_path=None):
+    '''The main function with which our flask app is created.
+
+    Arguments:
+    alias
+        Used to load well-named config files (e.g. my_service.conf,
+        my_service-dev.conf, my_service-testing.conf). If not provided, this
+        value is set to os.path.basename(os.getcwd()), the projects package
+        directory, which should be appropriately named.
+    instance_path
+        The instance path is where config files and other read/write data
+        should go. This defaults to ./instance in the project's package when
+        run locally using "flask run" (regardless of profile: dev, production,
+        or testing). When deployed, the default appears to be [relative to
+        the package] ../var/alias-instance when considering $PREFIX. I'm
+        not sure how $PREFIX is set, but you can try and read about "instance
+        folders" in the Flask documentation. Set this in the wsgi to a
+        convenient location (e.g. /opt/var/alias).
+        Anyway! This is basically mandatory because the default sucks.
+    '''
+
+    # Initial setup & app creation
+    # ----------------------------
+    # Configure the application logger, once per process
+    format_string = ('%(levelname)s [%(asctime)s] '
+                     '%(name)s.%(module)s.%(funcName)s(): %(message)s')
+    global _logging_configured
+    if not _logging_configured:
+        _configure_logging(format_string)
+        _logging_configured = True
+
     # Create the app
     app = _app_base(alias, instance_path)
 
@@ -118,11 +276,14 @@ def create_app(alias=None, instance_path=None):
         'LOG_FILE',
         os.path.join(os.getcwd(), 'application.log')
     )
-    fh = logging.FileHandler(log_file)
-    formatter = logging.Formatter(format_string)
-    fh.setFormatter(formatter)
-    fh.addFilter(ApplicationLogFilter())
-    logging.getLogger('root').addHandler(fh)
+    app._log_listener = start_file_logging(
+        log_file,
+        logging.Formatter(format_string),
+        max_bytes=app.config['LOG_MAX_BYTES'],
+        backup_count=app.config['LOG_BACKUP_COUNT'],
+        queue_size=app.config['LOG_QUEUE_SIZE'],
+        buffer_records=app.config['LOG_BUFFER_RECORDS']
+    )
 
     # set DEBUG loglevel on any loggers by looking at config values
     # TODO, I think this must be placed after registering blueprints?
@@ -145,35 +306,66 @@ def create_app(alias=None, instance_path=None):
 
     # Initialize extensions
 
-    # Connect to the RCON server
-    # TODO: Add ability for app to reconnect if disconnected
-    if len(app.config.get('RCON_SERVER', None)) == 0:
+    # Connect to the RCON servers
+    # Request threads each check out their own connection from a server's
+    # pool; one connection is opened now so a bad config shows up in the log
+    # at startup. A server that's down isn't fatal, its MCR reconnects when
+    # it's back. The server set by RCON_SERVER comes first and is app.mcr;
+    # RCON_SERVERS adds more by name.
+    servers = dict()
+    if app.config.get('RCON_SERVER'):
+        servers[app.config['RCON_SERVER_NAME']] = dict()
+    servers.update(app.config['RCON_SERVERS'])
+    if len(servers) == 0:
         app._startup_failures.append('No RCON server set in the config file')
-    else:
-        app._mcr = MCRcon(
-            host=app.config['RCON_SERVER'],
-            password=app.config['RCON_PASSWD'],
-            port=app.config['RCON_PORT']
+        servers[app.config['RCON_SERVER_NAME']] = {'RCON_SERVER': ''}
+
+    mcrs = dict()
+    app.amcrs = dict()
+    app.job_mcrs = dict()
+    app.statuses = dict()
+    for name, overrides in servers.items():
+        config = {**app.config, **overrides}
+        mcrs[name], app.amcrs[name], app.job_mcrs[name] = _rcon_clients(
+            app, name, config)
+        # Server List Ping on the game port, for /status/
+        app.statuses[name] = StatusClient(
+            config['SLP_SERVER'] or config['RCON_SERVER'],
+            port=config['SLP_PORT'],
+            timeout=config['SLP_TIMEOUT'],
+            ttl=config['STATUS_CACHE_TTL'],
+            breaker=CircuitBreaker(
+                threshold=config['RCON_BREAKER_THRESHOLD'],
+                reset_timeout=config['RCON_BREAKER_RESET'],
+                name='SLP'
+            )
         )
-    try:
-        app._mcr.connect()
-        app._startup_messages.append((
-                f'Connected to RCON server at '
-                f"{app.config['RCON_SERVER']}:{app.config['RCON_PORT']}"))
-    except Exception as e:
-        app._startup_failures.append(
-            'Could not connect to RCON server; see log for additional details')
-        app.logger.error((
-                f'Connection failure to Minecraft RCON server '
-                f"{app.config['RCON_SERVER']}:{app.config['RCON_PORT']}:\n{e}"))
+    app.fleet = Fleet(mcrs, timeout=app.config['RCON_FLEET_TIMEOUT'])
+    app.mcr = mcrs[next(iter(servers))]
+    app.amcr = app.amcrs[next(iter(servers))]
 
-    app.mcr = MCR(app._mcr)
+    @app.errorhandler(RCONUnavailable)
+    def rcon_unavailable(e):
+        return ({'result': 'failure', 'response': str(e)}, 503)
 
     # When the app is closing, close all connections
     def _app_cleanup():
         app.logger.info(f'App "{app.alias}" shutting down')
         app.logger.info('Disconnecting from RCON server')
-        app._mcr.disconnect()
+        app.scheduler.close()
+        if app.sessions is not None:
+            app.sessions.close()
+        for players in app.server_players.values():
+            players.close()
+        if app.console is not None:
+            app.console.close()
+        if app.logindex is not None:
+            app.logindex.close()
+        app.fleet.close()
+        for amcr in app.amcrs.values():
+            amcr.close()
+        # last, so everything above is written out
+        app._log_listener.stop()
 
     atexit.register(_app_cleanup)
     # Register blueprints
@@ -183,19 +375,44 @@ def create_app(alias=None, instance_path=None):
 
     from .cmd import cmd
     app.register_blueprint(cmd, url_prefix='/cmd/')
+    app.register_blueprint(cmd, url_prefix='/srv/<server>/cmd/',
+                           name='srv_cmd')
+
+    from .fleet import fleet
+    app.register_blueprint(fleet, url_prefix='/fleet/')
+
+    from .history import history
+    app.register_blueprint(history, url_prefix='/history/')
+
+    from .console import console
+    app.register_blueprint(console, url_prefix='/console/')
+
+    from .schedule import schedule
+    app.register_blueprint(schedule, url_prefix='/schedule/')
+
+    from .status import status
+    app.register_blueprint(status, url_prefix='/status/')
+
+    from .logs import logs
+    app.register_blueprint(logs, url_prefix='/logs/')
+
+    # Request timings and RCON counters at /metrics
+    from . import metrics
+    metrics.init_app(app)
 
     # Helpful log output before return
     # --------------------------------
     # list all loggers (helps to identify other log levels you can set)
-    loggers = [
-        str(logging.getLogger(name))
-        for name in logging.root.manager.loggerDict
-    ]
-    logger_list = '\n * '.join(loggers)
-    app.logger.debug(
-        '\nList of loggers available:'
-        f'{logger_list}'
-    )
+    if app.logger.isEnabledFor(logging.DEBUG):
+        loggers = [
+            str(logging.getLogger(name))
+            for name in logging.root.manager.loggerDict
+        ]
+        logger_list = '\n * '.join(loggers)
+        app.logger.debug(
+            '\nList of loggers available:'
+            f'{logger_list}'
+        )
 
     if app._startup_failures:
         @app.before_request
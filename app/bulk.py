@@ -0,0 +1,110 @@
+"""Run one player action on many players at once
+
+  commands = bulk_commands('kick', ['alice', 'bob'], reason='griefing')
+  for result in run_bulk(app.mcr, 'kick', commands, concurrency=4):
+      ...
+
+Targets must be plain player names; a selector like @a or a name with a
+space in it would act on players nobody listed.
+"""
+
+from concurrent.futures import as_completed, ThreadPoolExecutor
+import re
+
+from .rcon import RCONUnavailable
+
+# action: (command template, pattern of a reply meaning it worked)
+ACTIONS = {
+    'kick': ('kick {target} {reason}', re.compile(r'Kicked ')),
+    'ban': ('ban {target} {reason}', re.compile(r'Banned ')),
+    'op': ('op {target}', re.compile(r'Made .+ a server operator')),
+    'whitelist add': (
+        'whitelist add {target}', re.compile(r'Added .+ to the whitelist')),
+    'whitelist remove': (
+        'whitelist remove {target}',
+        re.compile(r'Removed .+ from the whitelist')),
+    'tp': ('tp {target} {destination}', re.compile(r'Teleported ')),
+}
+
+PLAYER = re.compile(r'[A-Za-z0-9_]{1,16}\Z')
+_COORDINATE = r'(?:[~^]|[~^]?-?\d+(?:\.\d+)?)'
+DESTINATION = re.compile(
+    rf'(?:[A-Za-z0-9_]{{1,16}}|{_COORDINATE} {_COORDINATE} {_COORDINATE})\Z')
+
+
+class BulkError(ValueError):
+    """The bulk request can't be run as given."""
+
+
+def bulk_commands(action, targets, reason='', destination=None,
+                  max_targets=100):
+    """Validate a bulk request; return [(target, command), ...]"""
+    if action not in ACTIONS:
+        raise BulkError(f"action must be one of {', '.join(ACTIONS)}")
+    # type([]) rather than list, which views shadow
+    if (not isinstance(targets, type([])) or not targets
+            or not all(isinstance(t, str) and PLAYER.match(t)
+                       for t in targets)):
+        raise BulkError('targets must be a list of player names')
+    if len(targets) > max_targets:
+        raise BulkError(f'at most {max_targets} targets at once')
+    if not isinstance(reason, str):
+        raise BulkError('reason must be a string')
+    if action == 'tp' and not (isinstance(destination, str)
+                               and DESTINATION.match(destination)):
+        raise BulkError('tp needs a destination player or "x y z"')
+
+    template = ACTIONS[action][0]
+    reason = ' '.join(reason.split())
+    return [
+        (target, template.format(
+            target=target, reason=reason, destination=destination).strip())
+        for target in dict.fromkeys(targets)
+    ]
+
+
+def run_bulk(mcr, action, commands, concurrency=4):
+    """Run commands, up to `concurrency` at a time; yield results as they end.
+
+    Each result is {'target', 'result': 'success'|'failure', 'response'}.
+    Closing the generator early cancels commands that haven't started.
+    """
+    succeeded = ACTIONS[action][1]
+
+    def _run(target, command):
+        try:
+            response = mcr.command(command)
+        except RCONUnavailable as e:
+            return {'target': target, 'result': 'failure',
+                    'response': str(e)}
+        return {
+            'target': target,
+            'result': 'success' if succeeded.match(response) else 'failure',
+            'response': response,
+        }
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(concurrency, len(commands))),
+        thread_name_prefix='rcon-bulk'
+    )
+    try:
+        futures = [executor.submit(_run, target, command)
+                   for target, command in commands]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def summarize(results):
+    """Overall result of a bulk run: success, partial or failure"""
+    succeeded = sum(1 for r in results if r['result'] == 'success')
+    if succeeded == len(results):
+        result = 'success'
+    else:
+        result = 'failure' if succeeded == 0 else 'partial'
+    return {
+        'result': result,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+    }
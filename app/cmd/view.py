@@ -1,15 +1,48 @@
 
 import json
-import re
 
-from flask import current_app, request
+from flask import current_app, g, request, Response
 
+from ..bulk import bulk_commands, BulkError, run_bulk, summarize
+from ..parsers import parse
+from ..players import PlayerWatcher
+from ..rcon import BatchIncomplete
+from ..stream import sse_stream
 from . import logger
 from . import cmd
 
-list_player_count = re.compile('(?<=There are )\\d*')
-list_player_max = re.compile('(?<=a max of )\\d*')
-list_players = re.compile('(?<=online: ).*')
+@cmd.record_once
+def _setup(state):
+    """Create the player watchers feeding /list/stream, one per server"""
+    app = state.app
+    app.server_players = {
+        name: PlayerWatcher(
+            app.fleet[name], _list_result,
+            interval=app.config['PLAYER_POLL_INTERVAL'])
+        for name in app.fleet
+    }
+    app.players = app.server_players[next(iter(app.fleet))]
+
+# The blueprint is also registered at /srv/<server>/cmd/ (as "srv_cmd"); the
+#   views below run their commands on the server named in the URL, or on
+#   app.mcr without one
+@cmd.url_value_preprocessor
+def _pull_server(endpoint, values):
+    g.server = values.pop('server', None) if values else None
+
+@cmd.url_defaults
+def _add_server(endpoint, values):
+    if ('server' not in values and g.get('server') is not None
+            and current_app.url_map.is_endpoint_expecting(endpoint, 'server')):
+        values['server'] = g.server
+
+@cmd.before_request
+def _check_server():
+    if g.server is not None and g.server not in current_app.fleet:
+        return ({
+            'result': 'failure',
+            'response': f'no server named {g.server}'
+        }, 404)
 
 @cmd.route('/', methods=['GET'])
 def root():
@@ -17,24 +50,31 @@ def root():
 
 @cmd.route('/list/')
 def list():
-    """Show player count, max players, and a list of current players"""
-    response = current_app.mcr.command('list')
-    match = list_player_count.findall(response)
-    if not match:
-        raise RuntimeError('missing or unexpected list result on count:')
-    player_count = int(match[0])
-    match = list_player_max.findall(response)
-    if not match:
-        raise RuntimeError('missing or unexpected list result on max')
-    player_max = int(match[0])
-    match = list_players.findall(response)
-    if not match:
-        raise RuntimeError('missing or unexpected list result on player list')
-    player_list = match[0]
-    return ({'count': player_count,
-        'max': player_max,
-        'players': player_list.split(', ')
-    }, 200)
+    """Show player count, max players, and a list of current players.
+
+    The ETag only changes when the list does, so a poll with If-None-Match
+    gets a 304 while nobody joins or leaves. ?since=<version> returns just
+    the players who joined and left after that version.
+    """
+    response = _mcr().command('list')
+    return _versioned(_list_result(response))
+
+@cmd.route('/list/stream')
+def list_stream():
+    """Stream the player list, then joins and leaves, as Server-Sent Events"""
+    players = _players()
+    return Response(
+        sse_stream(players.broadcaster, players.subscribe(),
+                   current_app.config['SSE_KEEPALIVE']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@cmd.route('/aio/list/')
+async def list_async():
+    """Same as list, awaiting the reply instead of blocking a thread"""
+    response = await _amcr().command('list')
+    return _versioned(_list_result(response))
 
 @cmd.route('/kick/', methods=['GET', 'POST'])
 def kick():
@@ -42,14 +82,143 @@ def kick():
     player = request.json['player']
     reason = request.json.get('reason', '')
     logger.info(f'requested kick player {player}') 
-    response = current_app.mcr.command(f'kick {player} {reason}')
+    response = _mcr().command(f'kick {player} {reason}')
+    return (_kick_result(response), 200)
+
+@cmd.route('/aio/kick/', methods=['GET', 'POST'])
+async def kick_async():
+    """Same as kick, awaiting the reply instead of blocking a thread"""
+    player = request.json['player']
+    reason = request.json.get('reason', '')
+    logger.info(f'requested kick player {player}')
+    response = await _amcr().command(f'kick {player} {reason}')
+    return (_kick_result(response), 200)
+
+@cmd.route('/batch/', methods=['POST'])
+def batch():
+    """Run several commands at once, replies are returned in order.
+
+    A batch that fails partway is a 503 with the replies received; the
+    commands after those may or may not have run.
+    """
+    commands = request.json.get('commands')
+    # type([]) because the list view above shadows the builtin
+    if (not isinstance(commands, type([]))
+            or not all(isinstance(c, str) for c in commands)):
+        return ({
+            'result': 'failure',
+            'response': 'commands must be a list of strings'
+        }, 400)
+    logger.info(f'requested batch of {len(commands)} commands')
+    try:
+        responses = _mcr().command_many(commands)
+    except BatchIncomplete as e:
+        # the caller decides what to do about the commands not answered
+        return ({
+            'result': 'failure',
+            'response': str(e),
+            'responses': e.responses
+        }, 503)
+    return ({'result': 'success', 'responses': responses}, 200)
+
+@cmd.route('/bulk/', methods=['POST'])
+def bulk():
+    """Run one action on many players at once, a few commands at a time.
+
+    {"action": "kick", "targets": ["alice", "bob"], "reason": "griefing"}
+
+    Actions are kick, ban, op, whitelist add, whitelist remove and tp (with
+    a "destination"). Results are returned in target order; with
+    "stream": true each is sent as a line of JSON as soon as it's done,
+    followed by a summary line.
+    """
+    try:
+        commands = bulk_commands(
+            request.json.get('action'),
+            request.json.get('targets'),
+            reason=request.json.get('reason', ''),
+            destination=request.json.get('destination'),
+            max_targets=current_app.config['BULK_MAX_TARGETS']
+        )
+    except BulkError as e:
+        return ({'result': 'failure', 'response': str(e)}, 400)
+    action = request.json['action']
+    logger.info(f'requested bulk {action} of {len(commands)} players')
+    results = run_bulk(_mcr(), action, commands,
+                       concurrency=current_app.config['BULK_CONCURRENCY'])
+
+    if request.json.get('stream'):
+        def _stream():
+            done = []
+            for result in results:
+                done.append(result)
+                yield json.dumps(result) + '\n'
+            yield json.dumps(summarize(done)) + '\n'
+        return Response(_stream(), mimetype='application/x-ndjson')
+
+    order = {target: i for i, (target, _) in enumerate(commands)}
+    results = sorted(results, key=lambda r: order[r['target']])
+    return ({**summarize(results), 'results': results}, 200)
+
+@cmd.route('/pool/')
+def pool():
+    """Show RCON connection pool usage"""
+    return (_mcr().stats(), 200)
+
+
+def _mcr():
+    """Return the MCR for the request's server"""
+    if g.server is None:
+        return current_app.mcr
+    return current_app.fleet[g.server]
+
+def _amcr():
+    """Return the AsyncMCR for the request's server"""
+    if g.server is None:
+        return current_app.amcr
+    return current_app.amcrs[g.server]
+
+def _players():
+    """Return the PlayerWatcher for the request's server"""
+    if g.server is None:
+        return current_app.players
+    return current_app.server_players[g.server]
+
+def _list_result(response):
+    """Parse the list command's response"""
+    return parse('list', response).as_dict()
+
+def _versioned(result):
+    """Respond to a list request with its version: in full, 304 or a delta"""
+    version, etag = _players().update(result)
+    since = request.args.get('since')
+    if since is not None:
+        changes = _players().changes_since(since)
+        # an unknown version (or another worker's) gets the full list, which
+        #   has the version now
+        if changes is not None:
+            version, joined, left = changes
+            return ({
+                'version': version,
+                'since': since,
+                'count': result['count'],
+                'max': result['max'],
+                'joined': joined,
+                'left': left,
+            }, 200)
+    headers = {'Cache-Control': 'no-cache'}
+    if etag in request.if_none_match:
+        return Response(status=304, headers={**headers, 'ETag': f'"{etag}"'})
+    response = current_app.make_response(
+        ({**result, 'version': version}, 200, headers))
+    response.set_etag(etag)
+    return response
 
-    if response == 'No player was found':
-        result = 'failure'
-    else:
-        result = 'success'
+def _kick_result(response):
+    """Interpret the kick command's response"""
+    result = parse('kick', response)
     json = {
-        'result': result,
+        'result': 'success' if result.kicked else 'failure',
         'response': response
     }
-    return (json, 200)
+    return json
@@ -0,0 +1,8 @@
+import logging
+
+from flask import Blueprint
+
+console = Blueprint('console', __name__, template_folder='templates')
+logger = logging.getLogger('console')
+
+from . import view
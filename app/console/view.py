@@ -0,0 +1,95 @@
+import os
+
+from flask import current_app, render_template, request, Response
+
+from ..logtail import LogTail
+from ..tmux import TmuxConsole, TmuxError
+from ..stream import sse_stream
+from . import logger
+from . import console
+
+
+@console.record_once
+def _setup(state):
+    """Follow the server's tmux pane or its log, if either is configured"""
+    app = state.app
+    app.console = None
+    app.tmux = None
+    if app.config.get('CONSOLE_TMUX_SOCKET'):
+        # relative paths are in the instance folder
+        app.tmux = app.console = TmuxConsole(
+            os.path.join(app.instance_path, app.config['CONSOLE_TMUX_SOCKET']),
+            session=app.config['CONSOLE_TMUX_SESSION'],
+            history=app.config['CONSOLE_HISTORY']
+        )
+    elif app.config.get('CONSOLE_LOG_FILE'):
+        app.console = LogTail(
+            app.config['CONSOLE_LOG_FILE'],
+            history=app.config['CONSOLE_HISTORY'],
+            interval=app.config['CONSOLE_POLL_INTERVAL']
+        )
+
+@console.route('/', methods=['GET'])
+def root():
+    return render_template('console.html', keys=current_app.tmux is not None)
+
+@console.route('/stream')
+def stream():
+    """Stream recent console lines, then new ones, as Server-Sent Events"""
+    tail = current_app.console
+    if tail is None:
+        return ({
+            'result': 'failure',
+            'response': 'No console log file set in the config file'
+        }, 404)
+    logger.debug(f'console stream subscriber #{len(tail.broadcaster) + 1}')
+    try:
+        subscriber = tail.subscribe()
+    except TmuxError as e:
+        return ({'result': 'failure', 'response': str(e)}, 503)
+    return Response(
+        sse_stream(tail.broadcaster, subscriber,
+                   current_app.config['SSE_KEEPALIVE']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@console.route('/keys', methods=['POST'])
+def keys():
+    """Type into the server's tmux pane, for what RCON can't do.
+
+    {"text": "stop"} types the text and Enter ("enter": false leaves it
+    off); {"keys": ["C-c"]} sends keys by their tmux names, and nothing
+    else unless "text" or "enter": true is given too.
+    """
+    if current_app.tmux is None:
+        return ({
+            'result': 'failure',
+            'response': 'No tmux socket set in the config file'
+        }, 404)
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return ({
+            'result': 'failure',
+            'response': 'expected a JSON object'
+        }, 400)
+    text = body.get('text', '')
+    names = body.get('keys', [])
+    enter = body.get('enter')
+    if (not isinstance(text, str) or enter not in (None, True, False)
+            or not isinstance(names, list)
+            or not all(isinstance(name, str) for name in names)):
+        return ({
+            'result': 'failure',
+            'response': ('"text" must be a string, "enter" true or false '
+                         'and "keys" a list of names')
+        }, 400)
+    logger.info(f'sending keys to tmux: {text!r} {names}')
+    try:
+        if text or enter:
+            current_app.tmux.send(text, enter=enter is not False)
+        if names:
+            current_app.tmux.keys(*names)
+    except TmuxError as e:
+        return ({'result': 'failure', 'response': str(e)}, 503)
+    return ({'result': 'success'}, 200)
@@ -1,2 +1,156 @@
 
 ROOT_LOG_LEVEL_DEBUG = False
+
+# The RCON server; set in the instance config file
+RCON_SERVER = ''
+RCON_PASSWD = ''
+RCON_PORT = 25575
+
+# More servers by name, each a dict of the RCON_ settings that differ from
+#   the ones here (at least RCON_SERVER, RCON_PORT and RCON_PASSWD); each is
+#   served at /srv/<name>/cmd/. The server set by RCON_SERVER is named
+#   RCON_SERVER_NAME. Fleet-wide commands give up on a server after
+#   RCON_FLEET_TIMEOUT seconds
+RCON_SERVER_NAME = 'default'
+RCON_SERVERS = {}
+RCON_FLEET_TIMEOUT = 5
+
+# RCON connection pool; each request thread checks out its own connection
+RCON_POOL_SIZE = 4
+RCON_POOL_TIMEOUT = 5
+
+# Open a connection to each server in the background at startup; otherwise
+#   the first command opens it
+RCON_WARM = True
+
+# Seconds to wait on the RCON socket before treating the server as down
+RCON_TIMEOUT = 5
+
+# Failed commands reconnect and retry with exponential backoff (seconds)
+RCON_RETRIES = 2
+RCON_BACKOFF = 0.1
+RCON_BACKOFF_MAX = 2.0
+
+# After this many failed commands, fail fast with a 503 for RCON_BREAKER_RESET
+#   seconds before trying the server again
+RCON_BREAKER_THRESHOLD = 3
+RCON_BREAKER_RESET = 10
+
+# Frame each reply with a sentinel packet so it's read completely in one go;
+#   see app.MCRconLib.MCRcon
+RCON_FRAMING = True
+
+# Write batched commands back-to-back; vanilla servers can't read more than
+#   one packet at a time (MC-72390) so this is off by default
+RCON_PIPELINING = False
+
+# The server runs RCON commands on its main thread; pace them at RCON_RATE a
+#   second (after a burst of RCON_BURST) to keep a flood of web requests
+#   from lagging the game. 0 doesn't limit them. Waiting commands go out by
+#   lane, high before normal (any command not listed) before low, and give
+#   up with a 503 after RCON_QUEUE_TIMEOUT seconds
+RCON_RATE = 0
+RCON_BURST = 10
+RCON_LANES = {
+    'high': ['kick', 'ban', 'ban-ip', 'pardon', 'op', 'deop', 'whitelist',
+             'save-all', 'stop'],
+    'low': ['list', 'seed', 'help'],
+}
+RCON_QUEUE_TIMEOUT = 5
+
+# Connections shared by async views; each carries many concurrent commands
+RCON_ASYNC_CONNECTIONS = 2
+
+# Seconds to cache replies to read-only commands, by command name; concurrent
+#   requests for the same command share one RCON call
+RCON_CACHE_TTL = {
+    'list': 1,
+}
+# Running a command on the left drops cached replies to those on the right
+RCON_CACHE_INVALIDATE = {
+    'kick': ['list'],
+    'ban': ['list'],
+    'ban-ip': ['list'],
+}
+
+# /status/ asks the game port by Server List Ping (what the multiplayer
+#   screen shows), which doesn't touch RCON or the server's main thread.
+#   SLP_SERVER defaults to RCON_SERVER. Replies are cached for
+#   STATUS_CACHE_TTL seconds; with STATUS_FALLBACK a failed ping falls back
+#   to RCON list
+SLP_SERVER = ''
+SLP_PORT = 25565
+SLP_TIMEOUT = 3
+STATUS_CACHE_TTL = 1
+STATUS_FALLBACK = True
+
+# /cmd/bulk/ runs up to BULK_CONCURRENCY commands at once (each takes a pool
+#   connection) for at most BULK_MAX_TARGETS players per request
+BULK_CONCURRENCY = 4
+BULK_MAX_TARGETS = 100
+
+# Jobs run on a schedule, by name; each is a dict with "command" (or a list
+#   of "commands" run in order) and either "every" (seconds) or "cron" (five
+#   fields, local time), optionally "jitter" (up to that many seconds later)
+#   and "server" (a name from RCON_SERVERS). A job that's still running when
+#   it's due again is skipped. Jobs get SCHEDULE_CONNECTIONS connections per
+#   server of their own and /schedule/ keeps their last SCHEDULE_HISTORY runs
+SCHEDULE = {}
+SCHEDULE_CONNECTIONS = 1
+SCHEDULE_HISTORY = 20
+
+# Seconds between the list commands feeding /cmd/list/stream, however many
+#   clients are watching
+PLAYER_POLL_INTERVAL = 5
+
+# SQLite database recording who was online when, for /history/ (relative to
+#   the instance folder; empty disables it). Joins and leaves are written in
+#   batches every SESSION_FLUSH_INTERVAL seconds. /history/ goes back at most
+#   SESSION_HISTORY_MAX_DAYS days, and /history/peak/ SESSION_PEAK_MAX_HOURS
+#   hours
+SESSION_DB = ''
+SESSION_FLUSH_INTERVAL = 1
+SESSION_HISTORY_MAX_DAYS = 365
+SESSION_PEAK_MAX_HOURS = 24 * 31
+
+# The server's world folder (e.g. /opt/minecraft/world; relative to the
+#   instance folder). Player pages show inventory, position and stats from
+#   its playerdata/ and stats/ files, offline players too, without RCON; the
+#   last PLAYERDATA_CACHE_SIZE files read are kept until they change
+WORLD_DIR = ''
+PLAYERDATA_CACHE_SIZE = 128
+
+# The server's logs folder (e.g. /opt/minecraft/logs; relative to the
+#   instance folder) for /logs/search. latest.log and the rotated .log.gz
+#   files are indexed by time, player and event into LOG_INDEX_DB (relative
+#   to the instance folder) every LOG_INDEX_INTERVAL seconds; a search
+#   returns at most LOG_SEARCH_LIMIT lines
+LOG_DIR = ''
+LOG_INDEX_DB = 'logindex.db'
+LOG_INDEX_INTERVAL = 60
+LOG_SEARCH_LIMIT = 1000
+
+# Seconds between keepalive comments on idle Server-Sent Event streams
+SSE_KEEPALIVE = 15
+
+# The server's log file to follow for /console/ (e.g. logs/latest.log); the
+#   last CONSOLE_HISTORY lines are kept for clients that join later
+CONSOLE_LOG_FILE = ''
+CONSOLE_HISTORY = 500
+CONSOLE_POLL_INTERVAL = 0.25
+
+# Or show the console of a server run in tmux, like run.bsh does: its pane
+#   is piped to the app (instead of following CONSOLE_LOG_FILE) and
+#   /console/keys types into it. The socket is relative to the instance
+#   folder
+CONSOLE_TMUX_SOCKET = ''
+CONSOLE_TMUX_SESSION = 'mc'
+
+# The log file is written by a background thread; rotate it at LOG_MAX_BYTES
+#   (0 never rotates) keeping LOG_BACKUP_COUNT old files. LOG_QUEUE_SIZE
+#   bounds records waiting to be written (0 is unbounded; when full, records
+#   are dropped) and LOG_BUFFER_RECORDS writes them in batches
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 0
+LOG_BUFFER_RECORDS = 0
@@ -0,0 +1,8 @@
+import logging
+
+from flask import Blueprint
+
+fleet = Blueprint('fleet', __name__)
+logger = logging.getLogger('fleet')
+
+from . import view
@@ -0,0 +1,80 @@
+
+from flask import current_app, request
+
+from ..parsers import parse, ParseError
+from ..rcon import Fleet
+from . import logger
+from . import fleet
+
+@fleet.route('/', methods=['GET'])
+def root():
+    """Show each server's connection pool and circuit breaker state"""
+    app_fleet = current_app.fleet
+    return ({name: app_fleet[name].stats() for name in app_fleet}, 200)
+
+@fleet.route('/list/')
+def list():
+    """Run list on every server at once; show each one's players and totals"""
+    servers = _fan_out('list')
+    count = 0
+    for server in servers.values():
+        if server['result'] == 'success':
+            try:
+                server.update(parse('list', server['response']).as_dict())
+            except ParseError as e:
+                server.update(result='failure', response=str(e))
+                continue
+            count += server['count']
+    return ({
+        'result': _overall(servers),
+        'count': count,
+        'servers': servers
+    }, 200)
+
+@fleet.route('/cmd/', methods=['POST'])
+def command():
+    """Run a command on every server (or those listed) at once.
+
+    {"command": "say hello", "servers": ["lobby"], "timeout": 2}
+    """
+    command = request.json.get('command')
+    names = request.json.get('servers')
+    timeout = request.json.get('timeout')
+    if not isinstance(command, str):
+        return _bad_request('command must be a string')
+    # type([]) because the list view above shadows the builtin
+    if names is not None and (not isinstance(names, type([]))
+                              or not all(n in current_app.fleet
+                                         for n in names)):
+        return _bad_request('servers must be a list of server names')
+    if timeout is not None and (not isinstance(timeout, (int, float))
+                                or isinstance(timeout, bool)
+                                or not timeout > 0):
+        return _bad_request('timeout must be a positive number of seconds')
+    logger.info(f'requested fleet command {command!r}')
+    servers = _fan_out(command, names, timeout)
+    return ({'result': _overall(servers), 'servers': servers}, 200)
+
+
+def _fan_out(command, names=None, timeout=None):
+    """Run a command on the fleet; return {name: {result, response}}"""
+    servers = dict()
+    for name, (status, reply) in current_app.fleet.command(
+            command, names, timeout).items():
+        if status == Fleet.SUCCESS:
+            servers[name] = {'result': 'success', 'response': reply}
+        elif status == Fleet.TIMEOUT:
+            servers[name] = {'result': 'timeout', 'response': None}
+        else:
+            servers[name] = {'result': 'failure', 'response': str(reply)}
+    return servers
+
+def _overall(servers):
+    """success if every server succeeded, failure if none did, else partial"""
+    succeeded = sum(1 for s in servers.values() if s['result'] == 'success')
+    if succeeded == len(servers):
+        return 'success'
+    return 'failure' if succeeded == 0 else 'partial'
+
+def _bad_request(message):
+    return ({'result': 'failure', 'response': message}, 400)
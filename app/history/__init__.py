@@ -0,0 +1,8 @@
+import logging
+
+from flask import Blueprint
+
+history = Blueprint('history', __name__)
+logger = logging.getLogger('history')
+
+from . import view
@@ -0,0 +1,67 @@
+import os
+import time
+
+from flask import current_app, request
+
+from ..sessions import HOUR, SessionStore
+from . import history
+
+DAY = 86400
+
+
+@history.record_once
+def _setup(state):
+    """Record every server's joins and leaves, if a database is configured"""
+    app = state.app
+    app.sessions = None
+    if app.config.get('SESSION_DB'):
+        # relative paths are in the instance folder
+        app.sessions = SessionStore(
+            os.path.join(app.instance_path, app.config['SESSION_DB']),
+            flush_interval=app.config['SESSION_FLUSH_INTERVAL']
+        )
+        for name, watcher in app.server_players.items():
+            app.sessions.follow(name, watcher)
+
+@history.before_request
+def _check_store():
+    if current_app.sessions is None:
+        return ({
+            'result': 'failure',
+            'response': 'No session database set in the config file'
+        }, 404)
+
+@history.route('/player/<player>/')
+def player(player):
+    """A player's sessions in the last ?days=30, newest first, up to
+    SESSION_HISTORY_MAX_DAYS"""
+    days = request.args.get('days', 30, type=float)
+    if not days > 0:
+        return ({
+            'result': 'failure',
+            'response': 'days must be a positive number'
+        }, 400)
+    days = min(days, current_app.config['SESSION_HISTORY_MAX_DAYS'])
+    sessions = current_app.sessions.sessions(
+        player,
+        since=time.time() - days * DAY,
+        server=request.args.get('server')
+    )
+    return ({'player': player, 'sessions': sessions}, 200)
+
+@history.route('/peak/')
+def peak():
+    """The most players online in each of the last ?hours=24, up to
+    SESSION_PEAK_MAX_HOURS"""
+    hours = request.args.get('hours', 24, type=float)
+    if not hours > 0:
+        return ({
+            'result': 'failure',
+            'response': 'hours must be a positive number'
+        }, 400)
+    hours = min(hours, current_app.config['SESSION_PEAK_MAX_HOURS'])
+    peaks = current_app.sessions.peak_by_hour(
+        since=time.time() - hours * HOUR,
+        server=request.args.get('server')
+    )
+    return ({'hours': peaks}, 200)
@@ -0,0 +1,427 @@
+"""Search the server's logs, current and rotated, through an index
+
+The server writes logs/latest.log and, when it rotates, gzips the old one
+to logs/<date>-<n>.log.gz. LogIndex keeps a SQLite index of them:
+
+files
+    Each log's time range, size and how much of it is indexed.
+blocks
+    The byte offset and time of every BLOCK_LINES-th line, so a search by
+    time starts near the right place.
+postings
+    The offset and time of every line by term: "event:join" and the like
+    for the lines EVENTS recognize, and "player:<name>" for each line
+    mentioning a player who's been seen logging in.
+
+A search by player or event reads only the lines its postings point at,
+in files that have any; a gzipped log can't be seeked into without
+decompressing what comes before, but reading stops after the last match
+and logs without one are never opened.
+
+  index = LogIndex('/opt/minecraft/logs', 'logindex.db')
+  index.update()
+  for match in index.search(player='alice', since=time.time() - 7 * 86400):
+      ...
+"""
+
+from datetime import date, datetime, timedelta
+import gzip
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    inode INTEGER,
+    size INTEGER NOT NULL,
+    indexed INTEGER NOT NULL,
+    start REAL,
+    end REAL,
+    lines INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_file ON blocks (file_id, time);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS postings_term ON postings (term, time);
+CREATE INDEX IF NOT EXISTS postings_line ON postings (file_id, offset);
+'''
+
+LATEST = 'latest.log'
+ARCHIVE = re.compile(r'(\d{4}-\d\d-\d\d)-\d+\.log\.gz\Z')
+
+# [12:34:56] [Server thread/INFO]: message
+LINE = re.compile(rb'\[(\d\d):(\d\d):(\d\d)\] \[[^\]]*/(\w+)\]: (.*)')
+
+_NAME = r'(?P<player>[A-Za-z0-9_]{1,16})'
+EVENTS = [
+    ('join', re.compile(rf'{_NAME} joined the game')),
+    ('leave', re.compile(rf'{_NAME} left the game')),
+    ('login', re.compile(rf'{_NAME}\[[^\]]*\] logged in with entity id')),
+    ('disconnect', re.compile(rf'{_NAME} lost connection: ')),
+    ('chat', re.compile(rf'<{_NAME}> ')),
+    ('advancement', re.compile(
+        rf'{_NAME} has (made the advancement|completed the challenge'
+        r'|reached the goal) ')),
+    ('command', re.compile(rf'\[{_NAME}: ')),
+]
+# events whose player is remembered, so later mentions are indexed too
+_ARRIVALS = ('join', 'login')
+_WORD = re.compile(r'[A-Za-z0-9_]{3,16}')
+
+BLOCK_LINES = 1000
+# a line stamped this much earlier than the one before is the next day
+_WRAP = 6 * 3600
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+def _timestamp(day, seconds):
+    """A Unix timestamp for seconds past midnight on a date (local time)"""
+    return (datetime.combine(day, datetime.min.time())
+            + timedelta(seconds=seconds)).timestamp()
+
+
+class LogIndex():
+    """An incremental index of a logs folder, and searches using it.
+
+    A rotated log never changes, so it's indexed once; latest.log is
+    indexed from where the last update stopped, and from the start again
+    once it's been rotated (a new inode) or truncated.
+    """
+    def __init__(self, log_dir, path, interval=60):
+        self.log_dir = log_dir
+        self.path = path
+        self.interval = interval
+        self._players = set()
+        self._update_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        db = self._connect()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(SCHEMA)
+        self._players.update(row[0][len('player:'):] for row in db.execute(
+            "SELECT DISTINCT term FROM postings WHERE term LIKE 'player:%'"))
+        db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def start(self):
+        """Update the index now and every `interval` seconds, in the
+        background"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='log-index', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.update()
+            except Exception as e:
+                logger.error(f'failed to index {self.log_dir}: {e!r}')
+            self._stop.wait(self.interval)
+
+    # --------
+    # Indexing
+    # --------
+    def update(self):
+        """Index new and grown logs; forget deleted ones. Returns the number
+        of lines indexed."""
+        with self._update_lock:
+            db = self._connect()
+            try:
+                return self._update(db)
+            finally:
+                db.close()
+
+    def _update(self, db):
+        try:
+            names = [name for name in os.listdir(self.log_dir)
+                     if name == LATEST or ARCHIVE.match(name)]
+        except FileNotFoundError:
+            names = []
+        known = {row['name']: row for row in db.execute('SELECT * FROM files')}
+        for name in set(known) - set(names):
+            with db:
+                self._forget(db, known[name]['id'])
+
+        count = 0
+        # oldest first, so players are known before later logs mention them
+        for name in sorted(names, key=lambda n: (n == LATEST, n)):
+            path = os.path.join(self.log_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            row = known.get(name)
+            if row is not None and name != LATEST:
+                if row['size'] == st.st_size:
+                    continue
+            if row is not None and name == LATEST:
+                if row['inode'] == st.st_ino and row['indexed'] <= st.st_size:
+                    if row['indexed'] == st.st_size:
+                        continue
+                    with db:
+                        count += self._index(db, path, row, st)
+                    continue
+                logger.info(f'{path} changed; indexing it again')
+            with db:
+                if row is not None:
+                    self._forget(db, row['id'])
+                count += self._index(db, path, None, st)
+        return count
+
+    @staticmethod
+    def _forget(db, file_id):
+        db.execute('DELETE FROM postings WHERE file_id = ?', (file_id,))
+        db.execute('DELETE FROM blocks WHERE file_id = ?', (file_id,))
+        db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def _index(self, db, path, row, st):
+        """Index a log from where row left off (or the start); one pass"""
+        name = os.path.basename(path)
+        offset = row['indexed'] if row is not None else 0
+        lines = self._read_lines(path, offset, complete=name == LATEST)
+
+        # Lines only have a time of day. Count the days from the first line
+        # (or the last one indexed), then date them: a log ends on the day
+        # it's named for, or latest.log on the day it was last written.
+        entries, day, previous = [], 0, None
+        anchored = row is not None and row['end'] is not None
+        if anchored:
+            last = datetime.fromtimestamp(row['end'])
+            first_day = last.date()
+            previous = last.hour * 3600 + last.minute * 60 + last.second
+        end = offset
+        for offset, line in lines:
+            end = offset + len(line)
+            match = LINE.match(line)
+            if match is None:
+                continue
+            hours, minutes, seconds, level, message = match.groups()
+            seconds = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+            if previous is not None and seconds < previous - _WRAP:
+                day += 1
+            previous = seconds
+            entries.append((offset, day, seconds, level, message))
+        if not anchored:
+            archive = ARCHIVE.match(name)
+            if archive:
+                last_day = date.fromisoformat(archive.group(1))
+            else:
+                last_day = datetime.fromtimestamp(st.st_mtime).date()
+            first_day = last_day - timedelta(days=day)
+
+        if row is None:
+            file_id = db.execute(
+                'INSERT INTO files (name, inode, size, indexed, lines) '
+                'VALUES (?, ?, ?, 0, 0)',
+                (name, st.st_ino, st.st_size)).lastrowid
+            lines_before = 0
+        else:
+            file_id = row['id']
+            lines_before = row['lines']
+
+        blocks, postings = [], []
+        for n, (offset, day, seconds, level, message) in enumerate(
+                entries, start=lines_before):
+            at = _timestamp(first_day + timedelta(days=day), seconds)
+            if n % BLOCK_LINES == 0:
+                blocks.append((file_id, offset, at))
+            for term in self._terms(level, message):
+                postings.append((term, file_id, offset, at))
+        db.executemany('INSERT INTO blocks VALUES (?, ?, ?)', blocks)
+        db.executemany('INSERT INTO postings VALUES (?, ?, ?, ?)', postings)
+        if entries:
+            start = _timestamp(first_day + timedelta(days=entries[0][1]),
+                               entries[0][2])
+            last = _timestamp(first_day + timedelta(days=entries[-1][1]),
+                              entries[-1][2])
+            db.execute(
+                'UPDATE files SET start = coalesce(start, ?), end = ? '
+                'WHERE id = ?', (start, last, file_id))
+        db.execute(
+            'UPDATE files SET inode = ?, size = ?, indexed = ?, '
+            'lines = lines + ? WHERE id = ?',
+            (st.st_ino, st.st_size, end, len(entries), file_id))
+        return len(entries)
+
+    def _terms(self, level, message):
+        message = message.decode('utf8', 'replace')
+        terms = set()
+        for event, pattern in EVENTS:
+            match = pattern.match(message)
+            if match:
+                terms.add(f'event:{event}')
+                player = match.group('player').lower()
+                terms.add(f'player:{player}')
+                if event in _ARRIVALS:
+                    self._players.add(player)
+                break
+        if level in (b'WARN', b'ERROR'):
+            terms.add(f'event:{level.decode().lower()}')
+        for word in _WORD.findall(message):
+            if word.lower() in self._players:
+                terms.add(f'player:{word.lower()}')
+        return terms
+
+    @staticmethod
+    def _read_lines(path, offset=0, complete=False):
+        """Yield (offset, line) from offset; with complete, not an
+        unfinished last line"""
+        with _open(path) as f:
+            f.seek(offset)
+            for line in f:
+                if complete and not line.endswith(b'\n'):
+                    return
+                yield offset, line
+                offset += len(line)
+
+    # ---------
+    # Searching
+    # ---------
+    def files(self):
+        """Return the indexed logs, oldest first"""
+        db = self._connect()
+        try:
+            return [dict(row) for row in db.execute(
+                'SELECT name, size, start, end, lines FROM files '
+                'ORDER BY start')]
+        finally:
+            db.close()
+
+    def search(self, player=None, event=None, since=None, until=None,
+               text=None, limit=100):
+        """Yield lines matching every given filter, oldest first.
+
+        Each is {'time', 'file', 'offset', 'line'}. `text` is matched
+        (case-insensitively) against lines the other filters found.
+        """
+        since = 0 if since is None else since
+        until = time.time() + 86400 if until is None else until
+        terms = []
+        if player:
+            terms.append(f'player:{player.lower()}')
+        if event:
+            terms.append(f'event:{event}')
+        text = text.lower() if text else None
+
+        db = self._connect()
+        try:
+            # one snapshot of the index, however long the results take
+            db.execute('BEGIN')
+            files = {row['id']: row for row in db.execute(
+                'SELECT * FROM files WHERE start <= ? AND end >= ? '
+                'ORDER BY start', (until, since))}
+            if terms:
+                lines = self._lines(
+                    files, self._postings(db, terms, since, until))
+            else:
+                lines = self._scan(db, files, since, until)
+            found = 0
+            for file_id, offset, at, line in lines:
+                if found >= limit:
+                    return
+                line = line.rstrip(b'\r\n').decode('utf8', 'replace')
+                if text is not None and text not in line.lower():
+                    continue
+                found += 1
+                yield {
+                    'time': at,
+                    'file': files[file_id]['name'],
+                    'offset': offset,
+                    'line': line,
+                }
+        finally:
+            db.close()
+
+    @staticmethod
+    def _postings(db, terms, since, until):
+        """(file_id, offset, time) of lines with every term, by time"""
+        sql = 'SELECT p.file_id, p.offset, p.time FROM postings p'
+        args = []
+        for n, term in enumerate(terms[1:]):
+            sql += (f' JOIN postings p{n} ON p{n}.file_id = p.file_id '
+                    f'AND p{n}.offset = p.offset AND p{n}.term = ?')
+            args.append(term)
+        sql += (' WHERE p.term = ? AND p.time >= ? AND p.time <= ? '
+                'ORDER BY p.time, p.file_id, p.offset')
+        return db.execute(sql, args + [terms[0], since, until])
+
+    def _scan(self, db, files, since, until):
+        """(file_id, offset, time) of every line in the time range"""
+        for file_id, row in files.items():
+            # start at the last block beginning before `since`
+            (offset,) = db.execute(
+                'SELECT coalesce(max(offset), 0) FROM blocks '
+                'WHERE file_id = ? AND time <= ?', (file_id, since)
+            ).fetchone()
+            (at,) = db.execute(
+                'SELECT time FROM blocks WHERE file_id = ? AND offset = ?',
+                (file_id, offset)).fetchone() or (row['start'],)
+            last = datetime.fromtimestamp(at)
+            day = last.date()
+            previous = last.hour * 3600 + last.minute * 60 + last.second
+            with _open(os.path.join(self.log_dir, row['name'])) as f:
+                f.seek(offset)
+                for line in f:
+                    if offset >= row['indexed']:
+                        break
+                    match = LINE.match(line)
+                    if match is not None:
+                        hours, minutes, seconds = match.groups()[:3]
+                        seconds = (int(hours) * 3600 + int(minutes) * 60
+                                   + int(seconds))
+                        if seconds < previous - _WRAP:
+                            day += timedelta(days=1)
+                        previous = seconds
+                        at = _timestamp(day, seconds)
+                    if at > until:
+                        break
+                    if at >= since:
+                        yield file_id, offset, at, line
+                    offset += len(line)
+
+    def _lines(self, files, matches):
+        """(file_id, offset, time, line) for each match, reading each file
+        up to its last match only"""
+        current, f = None, None
+        try:
+            for file_id, offset, at in matches:
+                if file_id != current:
+                    if f is not None:
+                        f.close()
+                    f = _open(os.path.join(
+                        self.log_dir, files[file_id]['name']))
+                    current = file_id
+                # a file's lines are in time order, so this only seeks
+                #   forward; a gzipped log is decompressed, not re-read
+                f.seek(offset)
+                yield file_id, offset, at, f.readline()
+        finally:
+            if f is not None:
+                f.close()
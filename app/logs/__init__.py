@@ -0,0 +1,8 @@
+import logging
+
+from flask import Blueprint
+
+logs = Blueprint('logs', __name__)
+logger = logging.getLogger('logs')
+
+from . import view
@@ -0,0 +1,70 @@
+import json
+import os
+import time
+
+from flask import current_app, request, Response
+
+from ..logindex import EVENTS, LogIndex
+from . import logger
+from . import logs
+
+DAY = 86400
+# events searchable besides those the index recognizes by message
+LEVELS = ('warn', 'error')
+
+
+@logs.record_once
+def _setup(state):
+    """Index the server's logs in the background, if a folder is configured"""
+    app = state.app
+    app.logindex = None
+    if app.config.get('LOG_DIR'):
+        # relative paths are in the instance folder
+        app.logindex = LogIndex(
+            os.path.join(app.instance_path, app.config['LOG_DIR']),
+            os.path.join(app.instance_path, app.config['LOG_INDEX_DB']),
+            interval=app.config['LOG_INDEX_INTERVAL']
+        )
+        app.logindex.start()
+
+@logs.before_request
+def _check_index():
+    if current_app.logindex is None:
+        return ({
+            'result': 'failure',
+            'response': 'No log folder set in the config file'
+        }, 404)
+
+@logs.route('/')
+def root():
+    """The logs indexed so far, oldest first"""
+    return ({'files': current_app.logindex.files()}, 200)
+
+@logs.route('/search')
+def search():
+    """Log lines by ?player=, ?event=, ?q= (text) and time, oldest first.
+
+    The time range is ?since= and ?until= (Unix timestamps), or the last
+    ?days=; results are streamed as lines of JSON, at most ?limit= of them.
+    """
+    event = request.args.get('event')
+    if event and event not in {name for name, _ in EVENTS} | set(LEVELS):
+        return ({'result': 'failure', 'response': f'unknown event {event}'},
+                400)
+    since = request.args.get('since', type=float)
+    days = request.args.get('days', type=float)
+    if since is None and days is not None:
+        since = time.time() - days * DAY
+    limit = min(request.args.get('limit', 100, type=int),
+                current_app.config['LOG_SEARCH_LIMIT'])
+    logger.debug(f'log search {dict(request.args)}')
+    matches = current_app.logindex.search(
+        player=request.args.get('player'),
+        event=event,
+        since=since,
+        until=request.args.get('until', type=float),
+        text=request.args.get('q'),
+        limit=limit
+    )
+    return Response((json.dumps(match) + '\n' for match in matches),
+                    mimetype='application/x-ndjson')
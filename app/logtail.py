@@ -0,0 +1,136 @@
+"""Follow a server log file and fan new lines out to streaming clients"""
+
+from collections import deque
+import logging
+import os
+import threading
+
+from .stream import Broadcaster
+
+logger = logging.getLogger(__name__)
+
+
+class LogTail():
+    """Follow a log file like `tail -F`.
+
+    The file is polled with os.stat() every `interval` seconds and only the
+    bytes appended since the last read are read. A changed inode means the
+    log was rotated (the rest of the old file is read first, then the new
+    file from the start); a file smaller than our offset was truncated and
+    is read again from the start.
+
+    The last `history` lines are kept in a ring buffer. On start it's seeded
+    from the last `seed_bytes` of the file rather than reading it all.
+
+    Subscribers receive ('history', [lines]) first, then ('line', line).
+    The file is only followed while someone is subscribed.
+    """
+    def __init__(self, path, history=500, interval=0.25, seed_bytes=65536,
+                 maxsize=1000):
+        self.path = path
+        self.interval = interval
+        self.seed_bytes = seed_bytes
+        self.lines = deque(maxlen=history)
+        self._broadcaster = Broadcaster(maxsize)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._inode = None
+        self._partial = b''
+
+    @property
+    def broadcaster(self):
+        return self._broadcaster
+
+    def subscribe(self):
+        """Return a queue of events, starting with the recent history."""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._open(seed=True)
+                self._thread = threading.Thread(
+                    target=self._run, name='log-tail', daemon=True)
+                self._thread.start()
+            return self._broadcaster.subscribe(('history', list(self.lines)))
+
+    def unsubscribe(self, subscriber):
+        self._broadcaster.unsubscribe(subscriber)
+
+    def close(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            stopped = self._stop.wait(self.interval)
+            # deciding to stop and saying so in one go: a subscribe() in
+            #   between would see this thread and not start another. The
+            #   next subscribe() after it seeds the history again
+            with self._lock:
+                if stopped or not len(self._broadcaster):
+                    if self._thread is threading.current_thread():
+                        self._close_file()
+                        self._thread = None
+                    return
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.warning(f'failed to follow {self.path}: {e!r}')
+
+    def poll(self):
+        """Read whatever was appended, handling rotation and truncation."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # mid-rotation; finish the old file and wait for the new one
+            self._read()
+            return
+        if self._file is None:
+            self._open(seed=False)
+        elif st.st_ino != self._inode:
+            self._read()
+            self._open(seed=False)
+        elif st.st_size < self._file.tell():
+            logger.info(f'{self.path} was truncated')
+            self._file.seek(0)
+            self._partial = b''
+        self._read()
+
+    def _open(self, seed):
+        self._close_file()
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b''
+        if seed:
+            self.lines.clear()
+            size = self._file.seek(0, os.SEEK_END)
+            self._file.seek(max(0, size - self.seed_bytes))
+            if self._file.tell() > 0:
+                # drop the (probably partial) first line
+                self._file.readline()
+            lines = self._file.read().split(b'\n')
+            self._partial = lines.pop()
+            for line in lines:
+                self.lines.append(line.rstrip(b'\r').decode('utf8', 'replace'))
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read(self):
+        if self._file is None:
+            return
+        data = self._file.read()
+        if not data:
+            return
+        lines = (self._partial + data).split(b'\n')
+        # the last piece is an unfinished line (or empty)
+        self._partial = lines.pop()
+        for line in lines:
+            line = line.rstrip(b'\r').decode('utf8', 'replace')
+            self.lines.append(line)
+            self._broadcaster.publish(('line', line))
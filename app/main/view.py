@@ -1,10 +1,27 @@
 
-from flask import render_template
+from datetime import datetime
+import os
+import time
 
+from flask import current_app, render_template
+
+from ..playerdata import PlayerData
 from . import logger
 from . import main
 
 
+@main.record_once
+def _setup(state):
+    """Read players' saved state, if the world folder is configured"""
+    app = state.app
+    app.playerdata = None
+    if app.config.get('WORLD_DIR'):
+        # relative paths are in the instance folder
+        app.playerdata = PlayerData(
+            os.path.join(app.instance_path, app.config['WORLD_DIR']),
+            cache_size=app.config['PLAYERDATA_CACHE_SIZE']
+        )
+
 @main.route('/', methods=['GET'])
 def root():
     return render_template('root.html')
@@ -12,4 +29,25 @@ def root():
 @main.route('/player/')
 @main.route('/player/<player>/', methods=['GET'])
 def player(player):
-   return render_template('player.html', player=player) 
+   # the last 30 days, if sessions are recorded
+   sessions = None
+   if current_app.sessions is not None:
+       sessions = current_app.sessions.sessions(
+           player, since=time.time() - 30 * 86400)
+   # inventory, position and stats from the world's files, online or not
+   data = None
+   if current_app.playerdata is not None:
+       data = current_app.playerdata.player(player)
+   return render_template(
+       'player.html', player=player, sessions=sessions, data=data)
+
+@main.app_template_filter('duration')
+def duration(seconds):
+    """Format seconds as hours and minutes"""
+    minutes = int(seconds) // 60
+    return f'{minutes // 60}h {minutes % 60:02d}m'
+
+@main.app_template_filter('timestamp')
+def timestamp(value):
+    """Format a Unix timestamp in local time"""
+    return datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,321 @@
+"""Counters and histograms exposed at /metrics in Prometheus text format
+
+Recording a value never takes a lock shared with other threads: each thread
+adds to its own cells and the cells are only summed when /metrics is
+scraped. Cells of threads that have finished are folded into a shared total
+at scrape time, so short-lived request threads don't pile up.
+
+  RCON_RETRIES.inc()
+  RCON_COMMAND_SECONDS.observe(0.012, command='list')
+"""
+
+from bisect import bisect_left
+import threading
+import time
+import weakref
+
+from flask import g, request, Response
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _Cells():
+    """Per-thread {labels: value} dicts, merged on demand."""
+    def __init__(self, new):
+        self._new = new
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads = []      # (weakref to thread, cells)
+        self._retired = dict()  # merged cells of finished threads
+
+    def get(self):
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = self._local.cells = dict()
+            with self._lock:
+                self._threads.append(
+                    (weakref.ref(threading.current_thread()), cells))
+            return cells
+
+    def cell(self, key):
+        cells = self.get()
+        try:
+            return cells[key]
+        except KeyError:
+            cell = cells[key] = self._new()
+            return cell
+
+    def collect(self):
+        """Return {labels: summed values} across all threads."""
+        with self._lock:
+            alive = []
+            for ref, cells in self._threads:
+                thread = ref()
+                if thread is not None and thread.is_alive():
+                    alive.append((ref, cells))
+                else:
+                    self._merge(self._retired, cells)
+            self._threads = alive
+            total = dict()
+            self._merge(total, self._retired)
+            for _, cells in alive:
+                self._merge(total, cells)
+        return total
+
+    def _merge(self, into, cells):
+        for key, values in list(cells.items()):
+            merged = into.setdefault(key, self._new())
+            for i, value in enumerate(list(values)):
+                merged[i] += value
+
+
+class _Metric():
+    type_ = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        inner = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return '{' + inner + '}'
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}',
+                 f'# TYPE {self.name} {self.type_}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+    type_ = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._cells = _Cells(lambda: [0])
+
+    def inc(self, amount=1, **labels):
+        self._cells.cell(self._key(labels))[0] += amount
+
+    def value(self, **labels):
+        return self._cells.collect().get(self._key(labels), [0])[0]
+
+    def _samples(self):
+        for key, (value,) in sorted(self._cells.collect().items()):
+            yield f'{self.name}{self._labels(key)} {value}'
+
+
+class Histogram(_Metric):
+    """Counts of observed values by bucket, plus their sum and count."""
+    type_ = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # one count per bucket, then +Inf, sum and count
+        size = len(self.buckets) + 3
+        self._cells = _Cells(lambda: [0] * size)
+
+    def observe(self, value, **labels):
+        cell = self._cells.cell(self._key(labels))
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def time(self, **labels):
+        """Context manager observing how long its block took"""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        return self._cells.collect().get(self._key(labels), [0])[-1]
+
+    def _samples(self):
+        for key, values in sorted(self._cells.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                le = ('le', bound if bound == '+Inf' else repr(float(bound)))
+                yield f'{self.name}_bucket{self._labels(key, le)} {cumulative}'
+            yield f'{self.name}_sum{self._labels(key)} {values[-2]}'
+            yield f'{self.name}_count{self._labels(key)} {values[-1]}'
+
+
+class Gauge(_Metric):
+    """A value read from a callback when scraped.
+
+    The callback returns a number, or {label values tuple: number}.
+    """
+    type_ = 'gauge'
+
+    def __init__(self, name, help, func, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.func = func
+
+    def _samples(self):
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{self._labels(key)} {value}'
+
+
+class CounterFunc(Gauge):
+    """A count kept elsewhere (like the pool's), read when scraped."""
+    type_ = 'counter'
+
+
+class _Timer():
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry():
+    """Metrics by name, in the order they were registered."""
+    def __init__(self):
+        self._metrics = dict()
+
+    def register(self, metric):
+        # re-registering a name (e.g. another app's gauge) replaces it
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, func, labelnames=()):
+        return self.register(Gauge(name, help, func, labelnames))
+
+    def counter_func(self, name, help, func, labelnames=()):
+        return self.register(CounterFunc(name, help, func, labelnames))
+
+    def exposition(self):
+        """Return every metric in the Prometheus text exposition format"""
+        return '\n'.join(m.expose() for m in self._metrics.values()) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+REGISTRY = Registry()
+
+RCON_COMMAND_SECONDS = REGISTRY.histogram(
+    'rcon_command_seconds', 'Time spent running RCON commands', ['command'])
+RCON_RETRIES = REGISTRY.counter(
+    'rcon_retries_total', 'RCON commands retried on a new connection')
+RCON_FAILURES = REGISTRY.counter(
+    'rcon_failures_total', 'RCON commands that failed after all retries')
+RCON_EMPTY_RESPONSES = REGISTRY.counter(
+    'rcon_empty_responses_total', 'RCON commands with an empty reply')
+RCON_SENT_BYTES = REGISTRY.counter(
+    'rcon_sent_bytes_total', 'Bytes written to RCON connections')
+RCON_RECEIVED_BYTES = REGISTRY.counter(
+    'rcon_received_bytes_total', 'Bytes read from RCON connections')
+RCON_QUEUE_SECONDS = REGISTRY.histogram(
+    'rcon_queue_seconds', 'Time RCON commands waited for the rate limit',
+    ['lane'])
+RCON_QUEUE_TIMEOUTS = REGISTRY.counter(
+    'rcon_queue_timeouts_total', 'RCON commands that gave up in the queue')
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_seconds', 'Time spent handling HTTP requests',
+    ['endpoint', 'method', 'status'])
+
+
+def init_app(app, registry=REGISTRY):
+    """Time every request and serve the registry at /metrics"""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None and request.endpoint not in (None, 'metrics',
+                                                          'static'):
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                endpoint=request.endpoint,
+                method=request.method,
+                status=response.status_code
+            )
+        return response
+
+    def metrics():
+        return Response(registry.exposition(),
+                        mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+    # Every server's RCON pool and cache state, read when scraped
+    def _stats(*path):
+        def _values():
+            values = dict()
+            for name in app.fleet:
+                value = app.fleet[name].stats()
+                for key in path:
+                    value = value[key]
+                values[(name,)] = value
+            return values
+        return _values
+
+    for stat, help in [
+            ('in_use', 'RCON connections checked out'),
+            ('idle', 'RCON connections waiting in the pool'),
+            ('waiting', 'Requests waiting for an RCON connection')]:
+        registry.gauge(f'rcon_pool_{stat}', help, _stats(stat),
+                       labelnames=('server',))
+    for stat, help in [
+            ('created', 'RCON connections opened'),
+            ('reconnects', 'RCON connections opened to replace lost ones'),
+            ('timeouts', 'Requests that gave up waiting for a connection')]:
+        registry.counter_func(f'rcon_pool_{stat}_total', help, _stats(stat),
+                              labelnames=('server',))
+    for stat, help in [
+            ('hits', 'RCON replies served from cache'),
+            ('misses', 'RCON replies fetched for the cache'),
+            ('coalesced', 'RCON replies shared with a concurrent request')]:
+        registry.counter_func(f'rcon_cache_{stat}_total', help,
+                              _stats('cache', stat), labelnames=('server',))
+    registry.gauge(
+        'rcon_queue_depth', 'RCON commands waiting for the rate limit',
+        lambda: {
+            (name, lane): depth
+            for name in app.fleet
+            for lane, depth in app.fleet[name].stats()['queue'][
+                'queued'].items()
+        },
+        labelnames=('server', 'lane'))
+    registry.gauge(
+        'rcon_circuit_open', 'Whether the RCON circuit breaker is open',
+        lambda: {
+            (name,): int(state != 'closed')
+            for (name,), state in _stats('breaker')().items()
+        },
+        labelnames=('server',))
@@ -0,0 +1,151 @@
+"""Read Minecraft's NBT files, only as far as the tags asked for
+
+  load('world/playerdata/<uuid>.dat', select={'Pos': True, 'Health': True})
+  {'Pos': [12.5, 64.0, -3.2], 'Health': 20.0}
+
+The file is decompressed as it's read. Tags that aren't selected are
+skipped without building Python objects for them, and reading stops as
+soon as every selected top-level tag has been found.
+"""
+
+import gzip
+import struct
+import zlib
+
+END, BYTE, SHORT, INT, LONG, FLOAT, DOUBLE, BYTE_ARRAY, STRING, LIST, \
+    COMPOUND, INT_ARRAY, LONG_ARRAY = range(0, 13)
+
+# tag type: struct format of its (fixed size) payload
+_NUMBERS = {
+    BYTE: struct.Struct('>b'),
+    SHORT: struct.Struct('>h'),
+    INT: struct.Struct('>i'),
+    LONG: struct.Struct('>q'),
+    FLOAT: struct.Struct('>f'),
+    DOUBLE: struct.Struct('>d'),
+}
+# array tag type: size of each element
+_ARRAYS = {BYTE_ARRAY: 1, INT_ARRAY: 4, LONG_ARRAY: 8}
+_LENGTH = struct.Struct('>i')
+_STRING_LENGTH = struct.Struct('>H')
+
+
+class NBTError(Exception):
+    """The file isn't valid (gzipped) NBT."""
+
+
+class NBTReader():
+    """Decode NBT from a binary file object, reading it front to back.
+
+    `select` picks what's decoded: a dict of tag names, each True for the
+    whole tag or another dict to pick from a compound. None decodes it all.
+    """
+    def __init__(self, fileobj):
+        self._file = fileobj
+
+    def read(self, select=None):
+        """Return the root compound's (selected) tags as a dict"""
+        tag_type = self._read(1)[0]
+        if tag_type != COMPOUND:
+            raise NBTError(f'root tag is type {tag_type}, not a compound')
+        self._skip(_STRING_LENGTH.unpack(self._read(2))[0])  # its name
+        return self._compound(select, root=True)
+
+    def _read(self, length):
+        data = self._file.read(length)
+        if len(data) < length:
+            raise NBTError('file ends mid-tag')
+        return data
+
+    def _length(self):
+        """A list or array length; they're signed, but never negative"""
+        length = _LENGTH.unpack(self._read(4))[0]
+        if length < 0:
+            raise NBTError(f'negative length {length}')
+        return length
+
+    def _skip(self, length):
+        # read in chunks rather than allocate a large skipped array
+        while length > 0:
+            length -= len(self._read(min(length, 65536)))
+
+    def _string(self):
+        length = _STRING_LENGTH.unpack(self._read(2))[0]
+        # Java's "modified UTF-8" only differs for NUL and astral characters
+        return self._read(length).decode('utf-8', errors='replace')
+
+    def _compound(self, select=None, root=False):
+        result = dict()
+        while True:
+            tag_type = self._read(1)[0]
+            if tag_type == END:
+                return result
+            name = self._string()
+            wanted = True if select is None else select.get(name)
+            if wanted is None:
+                self._skip_payload(tag_type)
+                continue
+            if wanted is True or tag_type != COMPOUND:
+                result[name] = self._payload(tag_type)
+            else:
+                result[name] = self._compound(wanted)
+            # nothing after this is wanted; don't decompress the rest
+            if root and select is not None and len(result) == len(select):
+                return result
+
+    def _payload(self, tag_type):
+        if tag_type in _NUMBERS:
+            number = _NUMBERS[tag_type]
+            return number.unpack(self._read(number.size))[0]
+        if tag_type == STRING:
+            return self._string()
+        if tag_type == COMPOUND:
+            return self._compound()
+        if tag_type == LIST:
+            item_type = self._read(1)[0]
+            length = self._length()
+            return [self._payload(item_type) for _ in range(0, length)]
+        if tag_type in _ARRAYS:
+            length = self._length()
+            if tag_type == BYTE_ARRAY:
+                return self._read(length)
+            size = _ARRAYS[tag_type]
+            return list(struct.unpack(
+                f'>{length}{"i" if size == 4 else "q"}',
+                self._read(length * size)))
+        raise NBTError(f'unknown tag type {tag_type}')
+
+    def _skip_payload(self, tag_type):
+        if tag_type in _NUMBERS:
+            self._skip(_NUMBERS[tag_type].size)
+        elif tag_type == STRING:
+            self._skip(_STRING_LENGTH.unpack(self._read(2))[0])
+        elif tag_type == COMPOUND:
+            while True:
+                item_type = self._read(1)[0]
+                if item_type == END:
+                    return
+                self._skip(_STRING_LENGTH.unpack(self._read(2))[0])
+                self._skip_payload(item_type)
+        elif tag_type == LIST:
+            item_type = self._read(1)[0]
+            length = self._length()
+            if item_type in _NUMBERS:
+                self._skip(length * _NUMBERS[item_type].size)
+            else:
+                for _ in range(0, length):
+                    self._skip_payload(item_type)
+        elif tag_type in _ARRAYS:
+            length = self._length()
+            self._skip(length * _ARRAYS[tag_type])
+        else:
+            raise NBTError(f'unknown tag type {tag_type}')
+
+
+def load(path, select=None):
+    """Read a gzipped NBT file (like playerdata/<uuid>.dat); see NBTReader"""
+    try:
+        with gzip.open(path, 'rb') as f:
+            return NBTReader(f).read(select)
+    except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+        raise NBTError(f'{path}: {e}') from e
@@ -0,0 +1,127 @@
+"""Parse command replies into result objects, one compiled pattern each
+
+Every parser pulls all of its fields out of a reply with a single match of
+one precompiled pattern. Results are small __slots__ classes; as_dict()
+gives the JSON served by the views.
+
+Add a parser for another command by registering a Result subclass:
+
+  @parser('seed')
+  class SeedResult(Result):
+      __slots__ = ('seed',)
+      pattern = re.compile(r'Seed: \\[(?P<seed>-?\\d+)\\]')
+"""
+
+import re
+
+_parsers = dict()
+
+
+class ParseError(RuntimeError):
+    """A reply didn't look like we expected."""
+
+
+def parser(name):
+    """Class decorator registering a Result as the parser for a command"""
+    def _register(cls):
+        _parsers[name] = cls
+        return cls
+    return _register
+
+def get_parser(command):
+    """Return the Result class registered for a command (line)"""
+    name = command.strip().lstrip('/').split(' ', 1)[0]
+    try:
+        return _parsers[name]
+    except KeyError:
+        raise ParseError(f'no parser registered for {name}') from None
+
+def parse(command, response):
+    """Parse the reply to a command with its registered parser"""
+    return get_parser(command).parse(response)
+
+
+class Result():
+    """Base class for parsed replies.
+
+    Subclasses set `pattern`, with a named group per slot, and may override
+    convert() to turn the groups into proper values.
+    """
+    __slots__ = ()
+    pattern = None
+
+    @classmethod
+    def parse(cls, response):
+        match = cls.pattern.search(response)
+        if match is None:
+            raise ParseError(
+                f'unexpected {cls.__name__} response: {response!r}')
+        result = cls.__new__(cls)
+        for name, value in cls.convert(match.groupdict()).items():
+            setattr(result, name, value)
+        return result
+
+    @staticmethod
+    def convert(groups):
+        return groups
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        fields = ', '.join(f'{k}={v!r}' for k, v in self.as_dict().items())
+        return f'{type(self).__name__}({fields})'
+
+
+@parser('list')
+class ListResult(Result):
+    """There are 2 of a max of 20 players online: alice, bob
+
+    Older servers say "There are 2/20 players online:".
+    """
+    __slots__ = ('count', 'max', 'players')
+    pattern = re.compile(
+        r'There are (?P<count>\d+)(?: of a max of |/)(?P<max>\d+) '
+        r'players online:\s*(?P<players>.*)',
+        re.DOTALL
+    )
+
+    @staticmethod
+    def convert(groups):
+        players = groups['players'].strip()
+        return {
+            'count': int(groups['count']),
+            'max': int(groups['max']),
+            'players': players.split(', ') if players else [],
+        }
+
+
+@parser('kick')
+class KickResult(Result):
+    """Kicked alice: Kicked by an operator
+
+    A kick that found nobody ("No player was found") parses with
+    kicked=False rather than failing.
+    """
+    __slots__ = ('kicked', 'player', 'reason', 'response')
+    pattern = re.compile(
+        r'\A(?:Kicked (?P<player>[^:]+): (?P<reason>.*)|.*)\Z',
+        re.DOTALL
+    )
+
+    @classmethod
+    def parse(cls, response):
+        result = super().parse(response)
+        result.response = response
+        return result
+
+    @staticmethod
+    def convert(groups):
+        return {
+            'kicked': groups['player'] is not None,
+            'player': groups['player'],
+            'reason': groups['reason'],
+        }
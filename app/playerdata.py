@@ -0,0 +1,184 @@
+"""What a player has and has done, read from the world's files
+
+The server saves each player to playerdata/<uuid>.dat (NBT) and their
+statistics to stats/<uuid>.json, online or not, so a player page needs no
+RCON at all. Parsed files are kept in an LRU cache until they change.
+
+  data = PlayerData('/opt/minecraft/world')
+  data.player('alice')
+  {'uuid': '...', 'position': {...}, 'inventory': [...], 'stats': {...}}
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+
+from .nbt import load, NBTError
+
+logger = logging.getLogger(__name__)
+
+GAME_MODES = ['survival', 'creative', 'adventure', 'spectator']
+
+# the tags of playerdata/<uuid>.dat used for the page
+PLAYER_TAGS = {
+    'Pos': True,
+    'Dimension': True,
+    'Health': True,
+    'foodLevel': True,
+    'XpLevel': True,
+    'playerGameType': True,
+    'SelectedItemSlot': True,
+    'Inventory': True,
+}
+
+TICKS_PER_SECOND = 20
+
+
+class FileCache():
+    """An LRU cache of values loaded from files, reloaded when one changes.
+
+    Entries are keyed by path and checked against the file's mtime and
+    size on every get, which costs a stat() instead of a parse.
+    """
+    def __init__(self, size=128):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> ((mtime, size), value)
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, path, load):
+        """Return load(path), cached; raise OSError if there's no file"""
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(path)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+        value = load(path)
+        with self._lock:
+            self._entries[path] = (key, value)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+            }
+
+
+def offline_uuid(name):
+    """The UUID an offline-mode server gives a player"""
+    digest = hashlib.md5(f'OfflinePlayer:{name}'.encode()).digest()
+    return str(uuid.UUID(bytes=digest, version=3))
+
+
+class PlayerData():
+    """Players' saved state and statistics from a world folder.
+
+    Names are looked up in the server's usercache.json (next to the world
+    folder); a name it doesn't have gets its offline-mode UUID.
+    """
+    def __init__(self, world, cache_size=128):
+        self.world = world
+        self.usercache = os.path.join(
+            os.path.dirname(os.path.abspath(world)), 'usercache.json')
+        self._cache = FileCache(cache_size)
+
+    def uuid(self, name):
+        try:
+            users = self._cache.get(self.usercache, _load_usercache)
+        except OSError:
+            users = {}
+        return users.get(name.lower()) or offline_uuid(name)
+
+    def player(self, name):
+        """Return a player's state and stats, or None for neither file.
+
+        Either part is None when its file is missing or unreadable.
+        """
+        player_uuid = self.uuid(name)
+        data = self._read(
+            os.path.join(self.world, 'playerdata', f'{player_uuid}.dat'),
+            _load_player)
+        stats = self._read(
+            os.path.join(self.world, 'stats', f'{player_uuid}.json'),
+            _load_stats)
+        if data is None and stats is None:
+            return None
+        return {'uuid': player_uuid, **(data or {}), 'stats': stats}
+
+    def _read(self, path, load):
+        try:
+            return self._cache.get(path, load)
+        except FileNotFoundError:
+            return None
+        except (OSError, NBTError, ValueError) as e:
+            logger.warning(f'failed to read {path}: {e!r}')
+            return None
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def _load_usercache(path):
+    """{lowercase name: uuid} from usercache.json"""
+    with open(path) as f:
+        return {user['name'].lower(): user['uuid'] for user in json.load(f)}
+
+def _load_player(path):
+    tags = load(path, select=PLAYER_TAGS)
+    position = tags.get('Pos') or [None, None, None]
+    game_mode = tags.get('playerGameType')
+    return {
+        'position': {
+            'x': position[0],
+            'y': position[1],
+            'z': position[2],
+            'dimension': tags.get('Dimension'),
+        },
+        'health': tags.get('Health'),
+        'food': tags.get('foodLevel'),
+        'xp_level': tags.get('XpLevel'),
+        'game_mode': (GAME_MODES[game_mode]
+                      if game_mode in range(0, len(GAME_MODES)) else None),
+        'selected_slot': tags.get('SelectedItemSlot'),
+        'inventory': sorted(
+            # 1.20.5 renamed Count to count
+            ({'slot': item.get('Slot'), 'id': item.get('id'),
+              'count': item.get('count', item.get('Count'))}
+             for item in tags.get('Inventory', [])),
+            key=lambda item: item['slot'] if item['slot'] is not None else 0
+        ),
+    }
+
+def _load_stats(path):
+    """The general ("custom") statistics, and how much was mined and killed"""
+    with open(path) as f:
+        stats = json.load(f).get('stats', {})
+    custom = {
+        name.split(':', 1)[-1]: value
+        for name, value in stats.get('minecraft:custom', {}).items()
+    }
+    return {
+        'play_time': custom.get(
+            'play_time', custom.get('play_one_minute', 0)) / TICKS_PER_SECOND,
+        'deaths': custom.get('deaths', 0),
+        'mob_kills': custom.get('mob_kills', 0),
+        'player_kills': custom.get('player_kills', 0),
+        'mined': sum(stats.get('minecraft:mined', {}).values()),
+        'killed': sum(stats.get('minecraft:killed', {}).values()),
+        'custom': custom,
+    }
@@ -0,0 +1,164 @@
+"""Watch who's online with one background poller shared by every client"""
+
+from collections import deque
+import hashlib
+import logging
+import secrets
+import threading
+
+from .stream import Broadcaster
+
+logger = logging.getLogger(__name__)
+
+
+class PlayerWatcher():
+    """Poll `list` once per interval and publish joins and leaves.
+
+    However many clients subscribe, the server sees one `list` command per
+    `interval` seconds. The polling thread starts with the first subscriber
+    and stops once the last one has gone.
+
+    Subscribers receive ('players', {...}) with the full state first, then
+    ('diff', {'joined': [...], 'left': [...], 'count': n, 'max': n}) only
+    when something changed.
+
+    Every change also bumps the state's version; the last `history`
+    changes are kept so a client that saw one version can ask for just
+    the joins and leaves since (see changes_since). Versions are counted
+    by this process only, so they and the ETags are "<epoch>-<n>", the
+    epoch random for each watcher; another worker's are never taken for
+    ours.
+    """
+    def __init__(self, mcr, parse, interval=5, maxsize=100, history=100):
+        """
+        Arguments:
+        mcr
+            The app's MCR; replies come through its cache like any other.
+        parse
+            Turns a `list` reply into {'count', 'max', 'players'}.
+        """
+        self._mcr = mcr
+        self._parse = parse
+        self.interval = interval
+        self._broadcaster = Broadcaster(maxsize, resync=self._snapshot)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._state = None
+        self.epoch = secrets.token_hex(4)
+        self._version = 0
+        self._etag = None
+        self._changes = deque(maxlen=history)  # (version, joined, left)
+
+    @property
+    def broadcaster(self):
+        return self._broadcaster
+
+    def subscribe(self):
+        """Return a queue of events, starting with the current state."""
+        with self._lock:
+            initial = [self._snapshot()] if self._state is not None else []
+            subscriber = self._broadcaster.subscribe(*initial)
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='player-watcher', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._broadcaster.unsubscribe(subscriber)
+
+    def close(self):
+        self._stop.set()
+
+    def _snapshot(self):
+        return ('players', dict(self._state))
+
+    def _run(self):
+        while True:
+            # deciding to stop and saying so in one go: a subscribe() in
+            #   between would see this thread and not start another
+            with self._lock:
+                if self._stop.is_set() or not len(self._broadcaster):
+                    if self._thread is threading.current_thread():
+                        self._thread = None
+                    return
+            try:
+                self.update(self._parse(self._mcr.command('list')))
+            except Exception as e:
+                logger.warning(f'player list poll failed: {e!r}')
+            self._stop.wait(self.interval)
+
+    def update(self, result):
+        """Publish the difference between result and the last known state.
+
+        Returns (version, etag) of the state now; the etag is a hash of the
+        state's contents, the same whenever the players are.
+        """
+        with self._lock:
+            previous, self._state = self._state, result
+            if previous is None:
+                joined, left = list(result['players']), []
+                event = self._snapshot()
+            else:
+                before = set(previous['players'])
+                after = set(result['players'])
+                joined = [p for p in result['players'] if p not in before]
+                left = [p for p in previous['players'] if p not in after]
+                if not (joined or left or previous['count'] != result['count']
+                        or previous['max'] != result['max']):
+                    return self._tag(self._version), self._etag
+                event = ('diff', {
+                    'joined': joined,
+                    'left': left,
+                    'count': result['count'],
+                    'max': result['max'],
+                })
+            self._version += 1
+            self._changes.append((self._version, joined, left))
+            self._etag = self._tag(hashlib.blake2b(
+                f"{result['count']}/{result['max']}/"
+                f"{','.join(result['players'])}".encode(),
+                digest_size=8
+            ).hexdigest())
+            # in the lock, so subscribers see changes in version order
+            self._broadcaster.publish(event)
+            return self._tag(self._version), self._etag
+
+    def _tag(self, value):
+        return f'{self.epoch}-{value}'
+
+    def changes_since(self, version):
+        """Return (version now, joined, left) since version.
+
+        Returns None for a version this watcher doesn't have the changes
+        since (another process's, too old, or from the future).
+        """
+        epoch, _, number = str(version).rpartition('-')
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        version = int(number)
+        with self._lock:
+            if not 0 <= version <= self._version:
+                return None
+            changes = [c for c in self._changes if c[0] > version]
+            if changes and changes[0][0] != version + 1:
+                return None
+            if not changes and version != self._version:
+                return None
+            current = self._tag(self._version)
+        # dicts as ordered sets; a join undoes an earlier leave and so on
+        joined, left = dict(), dict()
+        for _, joins, leaves in changes:
+            for player in joins:
+                if player in left:
+                    del left[player]
+                else:
+                    joined[player] = None
+            for player in leaves:
+                if player in joined:
+                    del joined[player]
+                else:
+                    left[player] = None
+        return current, list(joined), list(left)
@@ -0,0 +1,585 @@
+"""The app's RCON layer: reconnect, retry and fail fast when the server's down"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from mcrcon import MCRconException
+
+from .MCRconLib import BatchError, PoolTimeout
+from .metrics import (RCON_COMMAND_SECONDS, RCON_EMPTY_RESPONSES,
+                      RCON_FAILURES, RCON_QUEUE_SECONDS, RCON_QUEUE_TIMEOUTS,
+                      RCON_RECEIVED_BYTES, RCON_RETRIES, RCON_SENT_BYTES)
+
+logger = logging.getLogger(__name__)
+
+
+# Commands safe to send again when the connection fails after sending one;
+#   anything else might run twice (by first word, like CommandCache)
+RETRYABLE = frozenset(['list', 'seed', 'help', 'banlist'])
+
+
+class RCONUnavailable(Exception):
+    """The RCON server can't be reached right now; render as a 503."""
+
+
+class BatchIncomplete(RCONUnavailable):
+    """A batch failed after it was sent; `responses` answer the commands
+    run before it did, the rest may or may not have run."""
+    def __init__(self, message, responses):
+        super().__init__(message)
+        self.responses = responses
+
+
+class CircuitBreaker():
+    """Stop calling a server that keeps failing.
+
+    closed
+        Calls go through. `threshold` consecutive failures open the circuit.
+    open
+        Calls fail immediately until `reset_timeout` seconds have passed.
+    half-open
+        A single trial call goes through; success closes the circuit,
+        failure opens it again for another `reset_timeout`.
+
+    `name` says what's being called in the log messages.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold=3, reset_timeout=10, name='RCON'):
+        self.threshold = threshold
+        self.name = name
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """Return True if a call may be attempted now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            # Open, or half-open with a probe in flight. Let exactly one
+            # caller probe the server per reset_timeout; a probe that never
+            # reports back doesn't wedge the breaker.
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._opened_at = now
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f'{self.name} circuit closed')
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if (self._state == self.HALF_OPEN
+                    or self._failures >= self.threshold):
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f'{self.name} circuit opened after {self._failures} '
+                        'failure(s)')
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class Dispatcher():
+    """Pace commands to one server, the most urgent first.
+
+    The server runs RCON commands on its main thread, so a burst of them
+    shows up as lag in game. A token bucket lets `burst` commands through
+    at once and then `rate` a second (0 doesn't limit them). Commands
+    waiting for a token go out by lane, then in arrival order, so a kick
+    doesn't queue behind dashboards polling list. A command still waiting
+    after `timeout` seconds raises RCONUnavailable.
+
+      dispatcher = Dispatcher(rate=10, lanes={'high': ['kick'],
+                                              'low': ['list']})
+      dispatcher.acquire(['kick'])
+    """
+    LANES = ('high', 'normal', 'low')
+
+    def __init__(self, rate=0, burst=10, lanes=None, timeout=5):
+        """
+        Arguments:
+        lanes
+            {lane: [command name, ...]}; unnamed commands are 'normal'.
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.timeout = timeout
+        self._lanes = {
+            name: lane for lane, names in (lanes or {}).items()
+            for name in names
+        }
+        for lane in self._lanes.values():
+            if lane not in self.LANES:
+                raise ValueError(f'unknown lane {lane!r}')
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._queue = []  # heap of (lane index, arrival)
+        self._arrivals = itertools.count()
+        self._timeouts = 0
+
+    def lane(self, name):
+        return self._lanes.get(name, 'normal')
+
+    def acquire(self, names, timeout=None):
+        """Wait for a token per command in names (one batch, one lane).
+
+        The batch takes the most urgent lane of its commands.
+        """
+        if not self.rate:
+            return
+        if timeout is None:
+            timeout = self.timeout
+        rank = min(self.LANES.index(self.lane(name)) for name in names)
+        # a batch bigger than the bucket goes into debt rather than waiting
+        #   forever
+        cost = min(len(names), self.burst)
+        entry = (rank, next(self._arrivals))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._tokens = min(
+                        self.burst,
+                        self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    first = self._queue[0] == entry
+                    if first and self._tokens >= cost:
+                        break
+                    remaining = start + timeout - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        RCON_QUEUE_TIMEOUTS.inc()
+                        raise RCONUnavailable(
+                            f'RCON rate limit: still queued after {timeout}s')
+                    if first:
+                        remaining = min(
+                            remaining, (cost - self._tokens) / self.rate)
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._queue)
+            self._tokens -= len(names)
+            self._cond.notify_all()
+        RCON_QUEUE_SECONDS.observe(
+            time.monotonic() - start, lane=self.LANES[rank])
+
+    def stats(self):
+        with self._cond:
+            queued = dict.fromkeys(self.LANES, 0)
+            for rank, _ in self._queue:
+                queued[self.LANES[rank]] += 1
+            return {
+                'rate': self.rate,
+                'queued': queued,
+                'timeouts': self._timeouts,
+            }
+
+
+class _Flight():
+    """A cache miss being fetched; other callers wait on it."""
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CommandCache():
+    """A read-through cache for read-only commands.
+
+    Only commands named in `ttl` ({'list': 1.0}, by first word) are cached,
+    each for its own number of seconds. Concurrent misses on the same
+    command are coalesced; one caller runs it and the rest wait for its
+    reply. Running a command named in `invalidates` ({'kick': ['list']})
+    drops the cached replies of the commands it affects, including any
+    fetch already in flight.
+    """
+    def __init__(self, ttl=None, invalidates=None):
+        self.ttl = dict(ttl or {})
+        self.invalidates = {
+            name: set(targets) for name, targets in (invalidates or {}).items()
+        }
+        self._lock = threading.Lock()
+        self._entries = dict()      # name -> {command: (expires, reply)}
+        self._flights = dict()      # command -> _Flight
+        self._generations = dict()  # name -> invalidation count
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    @staticmethod
+    def _name(command):
+        return command.strip().lstrip('/').split(' ', 1)[0]
+
+    def get(self, command, fetch):
+        """Return the cached reply to command, calling fetch() on a miss."""
+        name = self._name(command)
+        ttl = self.ttl.get(name)
+        if not ttl:
+            return fetch()
+
+        with self._lock:
+            entry = self._entries.get(name, {}).get(command)
+            if entry is not None and entry[0] > time.monotonic():
+                self._hits += 1
+                return entry[1]
+            flight = self._flights.get(command)
+            leader = flight is None
+            if leader:
+                flight = self._flights[command] = _Flight()
+                generation = self._generations.get(name, 0)
+                self._misses += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                if self._generations.get(name, 0) == generation:
+                    self._entries.setdefault(name, {})[command] = (
+                        time.monotonic() + ttl, flight.value)
+        finally:
+            with self._lock:
+                del self._flights[command]
+            flight.event.set()
+        return flight.value
+
+    def invalidate_for(self, command):
+        """Drop replies made stale by running command."""
+        targets = self.invalidates.get(self._name(command))
+        if not targets:
+            return
+        with self._lock:
+            for name in targets:
+                self._generations[name] = self._generations.get(name, 0) + 1
+                self._entries.pop(name, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': sum(len(e) for e in self._entries.values()),
+                'hits': self._hits,
+                'misses': self._misses,
+                'coalesced': self._coalesced,
+            }
+
+
+class MCR():
+    """Run commands on a connection checked out of an MCRconPool.
+
+    A connection that fails mid-command is discarded by the pool, so a retry
+    transparently reconnects. Retries back off exponentially (with jitter)
+    from `backoff` up to `backoff_max` seconds. Only a failure before the
+    command was sent (checking out, connecting or logging in) is retried,
+    unless every command is in `retryable`; a kick that may have run isn't
+    sent again. When a command still fails
+    the circuit breaker records it; once open, commands raise RCONUnavailable
+    straight away instead of each waiting on a socket timeout.
+
+    Replies to read-only commands come from the CommandCache when fresh;
+    the rest wait their turn with the Dispatcher.
+    """
+    def __init__(self, pool, breaker=None, retries=2, backoff=0.1,
+                 backoff_max=2.0, cache=None, dispatcher=None,
+                 retryable=RETRYABLE):
+        self._pool = pool
+        self.retryable = retryable
+        self._breaker = breaker or CircuitBreaker()
+        self._cache = cache or CommandCache()
+        self._dispatcher = dispatcher or Dispatcher()
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    def command(self, command):
+        """Run a command, reconnecting and retrying if the link dropped."""
+        def _fetch():
+            result = self._call(
+                lambda mcr: mcr.command(command), self._cache._name(command))
+            if not result:
+                RCON_EMPTY_RESPONSES.inc()
+            return result
+
+        try:
+            return self._cache.get(command, _fetch)
+        finally:
+            self._cache.invalidate_for(command)
+
+    def command_many(self, commands):
+        """Run a batch of commands on one connection; see MCRcon.command_many
+
+        A batch is never sent twice; once it has been written, a failure
+        raises BatchIncomplete with the replies received so far.
+        """
+        try:
+            return self._call(
+                lambda mcr: mcr.command_many(commands), 'batch',
+                [self._cache._name(command) for command in commands],
+                retryable=False)
+        except RCONUnavailable as e:
+            if isinstance(e.__cause__, BatchError):
+                replies = e.__cause__.replies
+                raise BatchIncomplete(
+                    f'{e} ({len(replies)} of {len(commands)} answered)',
+                    replies) from e.__cause__
+            raise
+        finally:
+            for command in commands:
+                self._cache.invalidate_for(command)
+
+    def _call(self, func, name, names=None, retryable=None):
+        """Call func(connection), applying retries and the circuit breaker.
+
+        `name` labels the latency metric recorded for a successful call;
+        `names` are the commands func runs (by default just `name`), each
+        waiting for the dispatcher on every attempt. `retryable` is whether
+        func may run again after it sent something; by default, if every
+        name is in self.retryable.
+        """
+        if not self._breaker.allow():
+            raise RCONUnavailable('RCON server unavailable; circuit open')
+
+        names = names or [name]
+        if retryable is None:
+            retryable = all(n in self.retryable for n in names)
+        start = time.perf_counter()
+        delay = self.backoff
+        for attempt in range(0, self.retries + 1):
+            self._dispatcher.acquire(names)
+            written = False
+            try:
+                with self._pool.connection() as mcr:
+                    sent, received = mcr.bytes_sent, mcr.bytes_received
+                    try:
+                        result = func(mcr)
+                    finally:
+                        written = mcr.bytes_sent > sent
+                        RCON_SENT_BYTES.inc(mcr.bytes_sent - sent)
+                        RCON_RECEIVED_BYTES.inc(
+                            mcr.bytes_received - received)
+            except PoolTimeout as e:
+                # the server is fine, we're just busy
+                raise RCONUnavailable(str(e)) from e
+            except (MCRconException, OSError) as e:
+                error = e
+                logger.warning(
+                    f'RCON attempt {attempt + 1} of {self.retries + 1} '
+                    f'failed: {e!r}')
+                if written and not retryable:
+                    # the server may have run it; running it twice is worse
+                    self._breaker.failure()
+                    RCON_FAILURES.inc()
+                    raise RCONUnavailable(
+                        f'RCON connection failed after sending {name}; it '
+                        f'may or may not have run: {e}') from e
+                if attempt < self.retries:
+                    RCON_RETRIES.inc()
+                    time.sleep(random.uniform(delay / 2, delay))
+                    delay = min(delay * 2, self.backoff_max)
+                continue
+            self._breaker.success()
+            RCON_COMMAND_SECONDS.observe(
+                time.perf_counter() - start, command=name)
+            return result
+
+        self._breaker.failure()
+        RCON_FAILURES.inc()
+        raise RCONUnavailable(f'RCON server unavailable: {error}') from error
+
+    def stats(self):
+        stats = self._pool.stats()
+        stats['breaker'] = self._breaker.state
+        stats['cache'] = self._cache.stats()
+        stats['queue'] = self._dispatcher.stats()
+        return stats
+
+    def close(self):
+        self._pool.close()
+
+
+class AsyncMCR():
+    """Await RCON commands from any event loop.
+
+    Asyncio connections belong to the loop that opened them, but Flask runs
+    every async view in a fresh loop. The AsyncMCRconPool therefore lives on
+    a background loop thread, started on first use, and commands are handed
+    over to it. The circuit breaker, dispatcher and cache are normally
+    shared with the app's MCR. Replies aren't read from the cache (waiting
+    on another caller's fetch would block the event loop), but a command
+    drops the cached replies it makes stale, as it does with MCR.
+    """
+    def __init__(self, pool, breaker=None, dispatcher=None, cache=None):
+        self._pool = pool
+        self._breaker = breaker or CircuitBreaker()
+        self._dispatcher = dispatcher or Dispatcher()
+        self._cache = cache or CommandCache()
+        self._loop = None
+        self._lock = threading.Lock()
+
+    async def command(self, command):
+        """Run a command on the background loop and await its reply."""
+        if not self._breaker.allow():
+            raise RCONUnavailable('RCON server unavailable; circuit open')
+        start = time.perf_counter()
+        if self._dispatcher.rate:
+            # waiting for a token blocks, so not on the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._dispatcher.acquire,
+                [CommandCache._name(command)])
+        future = asyncio.run_coroutine_threadsafe(
+            self._pool.command(command), self._get_loop())
+        try:
+            result = await asyncio.wrap_future(future)
+        except (MCRconException, OSError, asyncio.TimeoutError) as e:
+            self._breaker.failure()
+            RCON_FAILURES.inc()
+            raise RCONUnavailable(f'RCON server unavailable: {e}') from e
+        finally:
+            self._cache.invalidate_for(command)
+        self._breaker.success()
+        RCON_COMMAND_SECONDS.observe(
+            time.perf_counter() - start,
+            command=CommandCache._name(command))
+        if not result:
+            RCON_EMPTY_RESPONSES.inc()
+        return result
+
+    def stats(self):
+        stats = self._pool.stats()
+        stats['breaker'] = self._breaker.state
+        return stats
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(
+                self._pool.close(), loop).result(timeout=5)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name='rcon-asyncio',
+                    daemon=True
+                ).start()
+            return self._loop
+
+
+class Fleet():
+    """Named servers' MCRs, and commands fanned out to all of them at once.
+
+    Each server runs the command on a worker thread of its own, so a
+    fleet-wide command takes as long as the slowest server rather than the
+    sum of them. A server that hasn't answered within `timeout` seconds is
+    reported as timed out; its command finishes (or fails) in the
+    background.
+
+      fleet = Fleet({'lobby': mcr_lobby, 'survival': mcr_survival})
+      fleet.command('list')
+      {'lobby': ('success', 'There are ...'), 'survival': ('timeout', None)}
+    """
+    SUCCESS = 'success'
+    FAILURE = 'failure'
+    TIMEOUT = 'timeout'
+
+    def __init__(self, servers, timeout=5):
+        self._servers = dict(servers)
+        self.timeout = timeout
+        # room for a few fan-outs to overlap with a server hanging
+        self._executor = ThreadPoolExecutor(
+            max_workers=4 * max(1, len(self._servers)),
+            thread_name_prefix='rcon-fleet'
+        )
+
+    def __getitem__(self, name):
+        return self._servers[name]
+
+    def __contains__(self, name):
+        return name in self._servers
+
+    def __iter__(self):
+        return iter(self._servers)
+
+    def __len__(self):
+        return len(self._servers)
+
+    def command(self, command, names=None, timeout=None):
+        """Run command on every server (or those named) concurrently.
+
+        Returns {name: (status, reply)} in server order; status is SUCCESS,
+        FAILURE (reply is the exception) or TIMEOUT (reply is None).
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if names is None:
+            names = list(self._servers)
+        futures = {
+            name: self._executor.submit(self._servers[name].command, command)
+            for name in names
+        }
+        wait(futures.values(), timeout=timeout)
+
+        results = dict()
+        for name, future in futures.items():
+            if not future.done():
+                future.cancel()
+                logger.warning(f'{name}: no reply to {command!r} after '
+                               f'{timeout}s')
+                results[name] = (self.TIMEOUT, None)
+            elif future.exception() is not None:
+                results[name] = (self.FAILURE, future.exception())
+            else:
+                results[name] = (self.SUCCESS, future.result())
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for mcr in self._servers.values():
+            mcr.close()
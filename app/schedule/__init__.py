@@ -0,0 +1,8 @@
+import logging
+
+from flask import Blueprint
+
+schedule = Blueprint('schedule', __name__)
+logger = logging.getLogger('schedule')
+
+from . import view
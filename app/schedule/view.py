@@ -0,0 +1,55 @@
+from flask import current_app, request
+
+from ..scheduler import Job, Scheduler
+from . import logger
+from . import schedule
+
+
+@schedule.record_once
+def _setup(state):
+    """Start the jobs set by SCHEDULE on each server's job connections"""
+    app = state.app
+    default = next(iter(app.job_mcrs))
+    try:
+        jobs = [
+            Job.from_config(name, settings, default,
+                            history=app.config['SCHEDULE_HISTORY'])
+            for name, settings in app.config['SCHEDULE'].items()
+        ]
+        app.scheduler = Scheduler(app.job_mcrs, jobs)
+    except ValueError as e:
+        app._startup_failures.append(f'Bad SCHEDULE setting: {e}')
+        app.scheduler = Scheduler(app.job_mcrs)
+    app.scheduler.start()
+
+@schedule.before_request
+def _check_job():
+    job = (request.view_args or {}).get('job')
+    if job is not None and job not in current_app.scheduler:
+        return ({
+            'result': 'failure',
+            'response': f'No job named "{job}"'
+        }, 404)
+
+@schedule.route('/')
+def root():
+    """Each job's schedule and its last run"""
+    jobs = current_app.scheduler.jobs
+    return ({name: job.info() for name, job in jobs.items()}, 200)
+
+@schedule.route('/<job>/')
+def job(job):
+    """A job's schedule and its recent runs, newest first"""
+    scheduler = current_app.scheduler
+    return ({**scheduler[job].info(), 'history': scheduler.history(job)}, 200)
+
+@schedule.route('/<job>/run/', methods=['POST'])
+def run(job):
+    """Start a job now, off schedule"""
+    if not current_app.scheduler.run_now(job):
+        return ({
+            'result': 'failure',
+            'response': f'Job "{job}" is already running'
+        }, 409)
+    logger.info(f'started job {job} on request')
+    return ({'result': 'success', 'response': f'Started job "{job}"'}, 202)
@@ -0,0 +1,310 @@
+"""Run RCON commands on a schedule from inside the app
+
+Jobs come from the SCHEDULE config setting:
+
+  SCHEDULE = {
+      'save': {'command': 'save-all', 'every': 300, 'jitter': 10},
+      'warning': {'commands': ['say Restarting in 5 minutes'],
+                  'cron': '55 3 * * *', 'server': 'survival'},
+  }
+
+Each server's jobs run on connections of their own (see create_app), so a
+long job never holds a connection a web request is waiting for, and no job
+pays for a connect and login the way a cron job starting a new process
+does.
+"""
+
+from collections import deque
+from datetime import datetime, timedelta
+import logging
+import random
+import threading
+import time
+
+from .rcon import RCONUnavailable
+
+logger = logging.getLogger(__name__)
+
+# (lowest, highest) of each cron field
+_CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+class CronSchedule():
+    """A five-field cron expression: minute hour day-of-month month weekday.
+
+    Fields take *, numbers, ranges (1-5), lists (1,15) and steps (*/10);
+    weekday 0 and 7 are Sunday. Like cron, when both day fields are
+    restricted a day matching either one matches. Times are local.
+    """
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'cron needs 5 fields: {expression!r}')
+        (self.minutes, self.hours, self.days, self.months,
+         weekdays) = [self._parse(field, *limits)
+                      for field, limits in zip(fields, _CRON_FIELDS)]
+        self.weekdays = {day % 7 for day in weekdays}
+        # like cron, */2 is as unrestricted as * for matching either day
+        self._any_day = fields[2].startswith('*')
+        self._any_weekday = fields[4].startswith('*')
+        self.expression = expression
+
+    @staticmethod
+    def _parse(field, lowest, highest):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            try:
+                step = int(step) if step else 1
+                if part == '*':
+                    start, end = lowest, highest
+                elif '-' in part:
+                    start, end = (int(n) for n in part.split('-', 1))
+                else:
+                    start = end = int(part)
+            except ValueError:
+                raise ValueError(f'bad cron field: {field!r}') from None
+            if not lowest <= start <= end <= highest or step < 1:
+                raise ValueError(f'bad cron field: {field!r}')
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt):
+        day = dt.day in self.days
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp):
+        """Return the first matching minute after timestamp"""
+        dt = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0)
+        dt += timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0)
+                      + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ValueError(f'cron never matches: {self.expression!r}')
+
+
+class Job():
+    """Commands run together on one server, every N seconds or by cron.
+
+    `jitter` adds up to that many seconds to each run so jobs sharing a
+    schedule (or servers sharing a host) don't all fire at once; it delays
+    a run, not the ones after it. The last `history` runs are kept.
+    """
+    def __init__(self, name, commands, server, every=None, cron=None,
+                 jitter=0, history=20):
+        if (every is None) == (cron is None):
+            raise ValueError(f'job {name!r} needs one of "every" or "cron"')
+        if every is not None and every <= 0:
+            raise ValueError(f'job {name!r}: "every" must be positive')
+        if not commands:
+            raise ValueError(f'job {name!r} has no commands')
+        self.name = name
+        self.commands = commands
+        self.server = server
+        self.every = every
+        self.cron = CronSchedule(cron) if cron is not None else None
+        self.jitter = jitter
+        self.history = deque(maxlen=history)
+        self.running = False
+        self.due = None       # the next run's time, before jitter
+        self.next_run = None  # ...and with it
+        self.runs = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_config(cls, name, settings, server, history=20):
+        """Build a Job from one SCHEDULE entry; ValueError if it's bad"""
+        if not isinstance(settings, dict):
+            raise ValueError(f'job {name!r}: settings must be a dict')
+        settings = dict(settings)
+        if 'command' in settings:
+            settings['commands'] = [settings.pop('command')]
+        unknown = set(settings) - {
+            'commands', 'server', 'every', 'cron', 'jitter'}
+        if unknown:
+            raise ValueError(
+                f"job {name!r}: unknown setting(s) {', '.join(unknown)}")
+        for key in ('every', 'jitter'):
+            value = settings.get(key)
+            if value is not None and (isinstance(value, bool)
+                                      or not isinstance(value, (int, float))):
+                raise ValueError(f'job {name!r}: "{key}" must be a number')
+        if settings.get('jitter', 0) < 0:
+            raise ValueError(f'job {name!r}: "jitter" can\'t be negative')
+        commands = settings.get('commands')
+        if commands is not None and (
+                not isinstance(commands, list)
+                or not all(isinstance(c, str) for c in commands)):
+            raise ValueError(f'job {name!r}: "commands" must be a list of '
+                             'strings')
+        for key in ('server', 'cron'):
+            if key in settings and not isinstance(settings[key], str):
+                raise ValueError(f'job {name!r}: "{key}" must be a string')
+        return cls(
+            name,
+            settings.get('commands'),
+            settings.get('server', server),
+            every=settings.get('every'),
+            cron=settings.get('cron'),
+            jitter=settings.get('jitter', 0),
+            history=history
+        )
+
+    def schedule(self, after):
+        """Set (and return) the next run after the given timestamp.
+
+        An `every` job's runs are due `every` seconds after the last was
+        due, however late it started; runs missed altogether are skipped.
+        """
+        if self.cron is not None:
+            self.due = self.cron.next_after(after)
+        elif self.due is None:
+            self.due = after + self.every
+        else:
+            self.due += self.every
+            if self.due <= after:
+                self.due += ((after - self.due) // self.every + 1) * self.every
+        self.next_run = self.due + random.uniform(0, self.jitter)
+        return self.next_run
+
+    def info(self):
+        return {
+            'commands': self.commands,
+            'server': self.server,
+            'every': self.every,
+            'cron': self.cron.expression if self.cron else None,
+            'jitter': self.jitter,
+            'next_run': self.next_run,
+            'running': self.running,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'last': self.history[-1] if self.history else None,
+        }
+
+
+class Scheduler():
+    """Start each Job when it's due, in a thread of its own.
+
+    A job still running when it's due again is skipped (and the skip is
+    recorded) rather than started twice.
+
+      scheduler = Scheduler({'default': mcr}, jobs)
+      scheduler.start()
+      scheduler.run_now('save')
+    """
+    def __init__(self, mcrs, jobs=()):
+        """
+        Arguments:
+        mcrs
+            {server name: MCR} to run each server's jobs on.
+        jobs
+            Job objects; each job's server must be in mcrs.
+        """
+        self._mcrs = mcrs
+        self.jobs = {job.name: job for job in jobs}
+        for job in self.jobs.values():
+            if job.server not in mcrs:
+                raise ValueError(
+                    f'job {job.name!r}: unknown server {job.server!r}')
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __contains__(self, name):
+        return name in self.jobs
+
+    def __getitem__(self, name):
+        return self.jobs[name]
+
+    def start(self):
+        """Schedule every job's first run and start the scheduler thread"""
+        if self._thread is not None or not self.jobs:
+            return
+        now = time.time()
+        for job in self.jobs.values():
+            job.schedule(now)
+        self._thread = threading.Thread(
+            target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        for mcr in self._mcrs.values():
+            mcr.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.time()
+            for job in self.jobs.values():
+                if job.next_run <= now:
+                    if not self._start(job, now):
+                        logger.warning(
+                            f'job {job.name} is still running; skipped')
+                    job.schedule(now)
+            due = min(job.next_run for job in self.jobs.values())
+            self._wake.wait(max(0, due - time.time()))
+            self._wake.clear()
+
+    def history(self, name):
+        """Return a job's recorded runs, newest first"""
+        with self._lock:
+            return [dict(run) for run in reversed(self.jobs[name].history)]
+
+    def run_now(self, name):
+        """Start a job now, off schedule; False if it's already running"""
+        return self._start(self.jobs[name], time.time())
+
+    def _start(self, job, now):
+        with self._lock:
+            if job.running:
+                job.skipped += 1
+                job.history.append({
+                    'started': now, 'duration': 0, 'result': 'skipped',
+                    'responses': [], 'error': None})
+                return False
+            job.running = True
+        threading.Thread(
+            target=self._execute, args=(job,), name=f'job-{job.name}',
+            daemon=True).start()
+        return True
+
+    def _execute(self, job):
+        mcr = self._mcrs[job.server]
+        started = time.time()
+        start = time.perf_counter()
+        responses, error = [], None
+        try:
+            for command in job.commands:
+                responses.append(mcr.command(command))
+        except RCONUnavailable as e:
+            error = str(e)
+            logger.error(f'job {job.name} failed: {e}')
+        except Exception as e:
+            error = repr(e)
+            logger.exception(f'job {job.name} failed')
+        finally:
+            with self._lock:
+                job.runs += 1
+                job.history.append({
+                    'started': started,
+                    'duration': time.perf_counter() - start,
+                    'result': 'failure' if error else 'success',
+                    'responses': responses,
+                    'error': error,
+                })
+                job.running = False
@@ -0,0 +1,233 @@
+"""Remember who was online when, in SQLite
+
+Sessions are recorded from the PlayerWatcher's joins and leaves, so
+history queries never touch RCON or the server's logs. Writes are queued
+and committed in batches by one background thread; the database is in WAL
+mode so request threads read while it writes.
+"""
+
+from itertools import groupby
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    server TEXT NOT NULL,
+    player TEXT NOT NULL,
+    joined REAL NOT NULL,
+    left REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_player ON sessions (player, joined);
+CREATE INDEX IF NOT EXISTS sessions_joined ON sessions (joined);
+CREATE INDEX IF NOT EXISTS sessions_left ON sessions (left);
+CREATE UNIQUE INDEX IF NOT EXISTS sessions_open
+    ON sessions (server, player) WHERE left IS NULL;
+'''
+
+HOUR = 3600
+
+
+class SessionStore():
+    """Player sessions (server, player, joined, left) in a SQLite file.
+
+    A session is opened when a player joins and closed when they leave;
+    `left` is NULL while they're online. Times are Unix timestamps.
+
+      store = SessionStore('sessions.db')
+      store.follow('default', app.players)
+      store.sessions('alice', since=time.time() - 30 * 86400)
+      store.peak_by_hour(since=time.time() - 86400)
+    """
+    def __init__(self, path, flush_interval=1):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._followers = []
+
+        db = self._connect()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(SCHEMA)
+        db.close()
+
+        self._writer = threading.Thread(
+            target=self._write, name='session-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        return db
+
+    # -------
+    # Writing
+    # -------
+    def join(self, server, player, at=None):
+        self._queue.put(('join', server, player, at or time.time()))
+
+    def leave(self, server, player, at=None):
+        self._queue.put(('leave', server, player, at or time.time()))
+
+    def online(self, server, players, at=None):
+        """Record that exactly `players` are online, e.g. after a restart"""
+        self._queue.put(('online', server, list(players), at or time.time()))
+
+    def follow(self, server, watcher):
+        """Record the joins and leaves a PlayerWatcher publishes.
+
+        Following keeps the watcher polling even with no web clients.
+        """
+        subscriber = watcher.subscribe()
+        thread = threading.Thread(
+            target=self._follow, args=(server, watcher, subscriber),
+            name=f'session-follow-{server}', daemon=True)
+        self._followers.append(thread)
+        thread.start()
+
+    def _follow(self, server, watcher, subscriber):
+        try:
+            while not self._stop.is_set():
+                try:
+                    event, data = subscriber.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                if event == 'players':
+                    self.online(server, data['players'])
+                elif event == 'diff':
+                    for player in data['left']:
+                        self.leave(server, player)
+                    for player in data['joined']:
+                        self.join(server, player)
+        finally:
+            watcher.unsubscribe(subscriber)
+
+    def flush(self, timeout=None):
+        """Wait until everything recorded so far is committed."""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self):
+        self._stop.set()
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+
+    def _write(self):
+        db = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # let a burst of events (a restart, a big diff) arrive first
+            self._stop.wait(self.flush_interval)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            flushed = [op[1] for op in batch if op and op[0] == 'flush']
+            ops = [op for op in batch if op and op[0] != 'flush']
+            try:
+                with db:
+                    self._apply(db, ops)
+            except sqlite3.Error as e:
+                logger.error(f'failed to record {len(ops)} session(s): {e!r}')
+            for done in flushed:
+                done.set()
+        db.close()
+
+    @staticmethod
+    def _apply(db, ops):
+        """Write a batch of ops in order, one executemany per run of a kind"""
+        for kind, run in groupby(ops, key=lambda op: op[0]):
+            if kind == 'join':
+                db.executemany(
+                    'INSERT OR IGNORE INTO sessions (server, player, joined) '
+                    'VALUES (?, ?, ?)',
+                    [(server, player, at) for _, server, player, at in run])
+            elif kind == 'leave':
+                db.executemany(
+                    'UPDATE sessions SET left = ? '
+                    'WHERE server = ? AND player = ? AND left IS NULL',
+                    [(at, server, player) for _, server, player, at in run])
+            elif kind == 'online':
+                for _, server, players, at in run:
+                    online = {row[0] for row in db.execute(
+                        'SELECT player FROM sessions '
+                        'WHERE server = ? AND left IS NULL', (server,))}
+                    db.executemany(
+                        'UPDATE sessions SET left = ? '
+                        'WHERE server = ? AND player = ? AND left IS NULL',
+                        [(at, server, p) for p in online - set(players)])
+                    db.executemany(
+                        'INSERT OR IGNORE INTO sessions '
+                        '(server, player, joined) VALUES (?, ?, ?)',
+                        [(server, p, at) for p in players if p not in online])
+
+    # --------
+    # Querying
+    # --------
+    def sessions(self, player, since=None, until=None, server=None):
+        """Return a player's sessions overlapping [since, until], newest first"""
+        since = 0 if since is None else since
+        until = time.time() if until is None else until
+        sql = ('SELECT server, player, joined, left FROM sessions '
+               'WHERE player = ? AND joined <= ? '
+               'AND (left IS NULL OR left >= ?)')
+        args = [player, until, since]
+        if server is not None:
+            sql += ' AND server = ?'
+            args.append(server)
+        sql += ' ORDER BY joined DESC'
+        db = self._connect()
+        try:
+            return [dict(row) for row in db.execute(sql, args)]
+        finally:
+            db.close()
+
+    def peak_by_hour(self, since, until=None, server=None):
+        """Return [{'hour': start, 'peak': most players online}, ...].
+
+        One pass over the joins and leaves in the range (both indexed),
+        starting from the number already online at `since`.
+        """
+        until = time.time() if until is None else until
+        where, args = '', []
+        if server is not None:
+            where, args = ' AND server = ?', [server]
+        db = self._connect()
+        try:
+            (online,) = db.execute(
+                'SELECT count(*) FROM sessions WHERE joined < ? '
+                'AND (left IS NULL OR left >= ?)' + where,
+                [since, since] + args).fetchone()
+            changes = db.execute(
+                'SELECT joined AS at, 1 AS change FROM sessions '
+                'WHERE joined >= ? AND joined < ?' + where +
+                ' UNION ALL '
+                'SELECT left, -1 FROM sessions '
+                'WHERE left >= ? AND left < ?' + where +
+                ' ORDER BY at, change',
+                [since, until] + args + [since, until] + args).fetchall()
+        finally:
+            db.close()
+
+        peaks = []
+        hour = int(since - since % HOUR)
+        changes = iter(changes)
+        change = next(changes, None)
+        while hour < until:
+            peak = online
+            while change is not None and change[0] < hour + HOUR:
+                online += change[1]
+                peak = max(peak, online)
+                change = next(changes, None)
+            peaks.append({'hour': hour, 'peak': peak})
+            hour += HOUR
+        return peaks
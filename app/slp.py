@@ -0,0 +1,181 @@
+"""Ask a server for its status by Server List Ping, without RCON
+
+Server List Ping is what the multiplayer screen uses: an unauthenticated
+request on the game port answered with the players online, the maximum, a
+sample of their names, the MOTD and the version. Unlike RCON `list` it
+isn't run on the server's main thread.
+
+  status('localhost', 25565)
+  {'online': 2, 'max': 20, 'players': ['alice', 'bob'], 'motd': '...',
+   'version': '1.19.2', 'protocol': 760, 'latency': 0.8}
+"""
+
+import json
+import re
+import socket
+import struct
+import time
+
+from .rcon import CircuitBreaker, CommandCache
+
+_FORMATTING = re.compile('§.')
+
+
+class SLPError(Exception):
+    """The server didn't answer the status request."""
+
+
+def _varint(value):
+    """Encode a VarInt; negative values take all five bytes"""
+    value &= 0xFFFFFFFF
+    data = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+def _packet(packet_id, payload=b''):
+    data = _varint(packet_id) + payload
+    return _varint(len(data)) + data
+
+def _read_exactly(sock, length):
+    data = bytearray()
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise SLPError('connection closed by the server')
+        data += chunk
+    return bytes(data)
+
+def _decode_varint(data, offset=0):
+    """Return (value, offset after it) of a VarInt in data"""
+    value = 0
+    for i in range(0, 5):
+        byte = data[offset + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, offset + i + 1
+    raise SLPError('VarInt too long')
+
+def _read_packet(sock):
+    """Return (packet id, payload) of the next packet"""
+    header = b''
+    while not header or header[-1] & 0x80:
+        if len(header) == 5:
+            raise SLPError('VarInt too long')
+        header += _read_exactly(sock, 1)
+    length, _ = _decode_varint(header)
+    data = _read_exactly(sock, length)
+    packet_id, offset = _decode_varint(data)
+    return packet_id, data[offset:]
+
+def _text(component):
+    """Flatten a chat component (the MOTD) to plain text"""
+    if isinstance(component, str):
+        return _FORMATTING.sub('', component)
+    if isinstance(component, list):
+        return ''.join(_text(c) for c in component)
+    if isinstance(component, dict):
+        return _text(component.get('text', '')) + ''.join(
+            _text(c) for c in component.get('extra', []))
+    return ''
+
+def status(host, port=25565, timeout=3):
+    """Return a server's status; raise SLPError if it can't be had.
+
+    `latency` is the milliseconds a ping takes; `players` is the sample the
+    server sends (a vanilla server sends up to 12 names).
+    """
+    address = host.encode()
+    handshake = (
+        _varint(-1)  # any protocol version will do for the status
+        + _varint(len(address)) + address
+        + struct.pack('>H', port)
+        + _varint(1)  # next state: status
+    )
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(_packet(0x00, handshake) + _packet(0x00))
+            packet_id, payload = _read_packet(sock)
+            if packet_id != 0x00:
+                raise SLPError(f'unexpected packet 0x{packet_id:02x}')
+            length, offset = _decode_varint(payload)
+            result = json.loads(payload[offset:offset + length])
+            if not isinstance(result, dict):
+                raise SLPError('status is not a JSON object')
+
+            # the status is enough; a server that doesn't pong has no latency
+            latency = None
+            try:
+                start = time.perf_counter()
+                sock.sendall(_packet(
+                    0x01, struct.pack('>q', int(time.time() * 1000))))
+                if _read_packet(sock)[0] == 0x01:
+                    latency = round((time.perf_counter() - start) * 1000, 1)
+            except (OSError, SLPError):
+                pass
+    except (OSError, ValueError, IndexError) as e:
+        raise SLPError(f'no status from {host}:{port}: {e}') from e
+
+    return _parse(result, latency)
+
+def _parse(result, latency=None):
+    """Pick the fields out of a status; raise SLPError if they're missing
+    or of the wrong type, so callers can fall back to RCON"""
+    players = result.get('players')
+    version = result.get('version', {})
+    if not isinstance(players, dict) or not isinstance(version, dict):
+        raise SLPError('status has no players or version object')
+    online, max_ = players.get('online'), players.get('max')
+    for value in (online, max_):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise SLPError('status player counts are not integers')
+    sample = players.get('sample') or []
+    if not isinstance(sample, list) or not all(
+            isinstance(p, dict) and isinstance(p.get('name'), str)
+            for p in sample):
+        raise SLPError('status player sample is not a list of names')
+    name, protocol = version.get('name'), version.get('protocol')
+    if not isinstance(name, (str, type(None))) \
+            or not isinstance(protocol, (int, type(None))):
+        raise SLPError('status version is not a name and protocol number')
+    return {
+        'online': online,
+        'max': max_,
+        'players': [p['name'] for p in sample],
+        'motd': _text(result.get('description', '')),
+        'version': name,
+        'protocol': protocol,
+        'latency': latency,
+    }
+
+
+class StatusClient():
+    """One server's status, cached for `ttl` seconds.
+
+    Requests for the status at the same time share one ping. After repeated
+    failures the circuit breaker stops pinging (and waiting for the
+    timeout) for a while.
+    """
+    def __init__(self, host, port=25565, timeout=3, ttl=1, breaker=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._cache = CommandCache(ttl={'status': ttl})
+        self._breaker = breaker or CircuitBreaker(name='SLP')
+
+    def status(self):
+        if not self._breaker.allow():
+            raise SLPError('Server List Ping unavailable; circuit open')
+        try:
+            result = self._cache.get(
+                'status', lambda: status(self.host, self.port, self.timeout))
+        except SLPError:
+            self._breaker.failure()
+            raise
+        self._breaker.success()
+        return result
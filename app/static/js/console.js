@@ -0,0 +1,49 @@
+// Show the server console; the server sends recent lines, then new ones
+
+var maxLines = 500;
+
+window.onload=function() {
+  var urlStream = document.getElementById("url-console-stream").value;
+  var source = new EventSource(urlStream);
+  var lines = [];
+  var code = document.getElementById("console-lines");
+
+  source.addEventListener("history", function(event) {
+    lines = JSON.parse(event.data);
+    render(code, lines);
+  });
+  source.addEventListener("line", function(event) {
+    lines.push(JSON.parse(event.data));
+    if (lines.length > maxLines) {
+      lines.splice(0, lines.length - maxLines);
+    }
+    render(code, lines);
+  });
+
+  // typing into the console, when the server runs in tmux
+  var form = document.getElementById("console-keys");
+  if (form) {
+    var urlKeys = document.getElementById("url-console-keys").value;
+    var text = document.getElementById("console-text");
+    form.addEventListener("submit", function(event) {
+      event.preventDefault();
+      fetch(urlKeys, {
+        method: 'POST',
+        headers: {
+          'Accept': 'application/json',
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({"text": text.value})
+      });
+      text.value = "";
+    });
+  }
+};
+
+function render(code, lines) {
+  // textContent, so console output is never interpreted as html
+  code.textContent = lines.join("\n");
+  window.scrollTo(0, document.body.scrollHeight);
+}
+
+// vim: tabstop=2 shiftwidth=2 expandtab
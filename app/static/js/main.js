@@ -1,9 +1,36 @@
 
 window.onload=function() {
+  if (window.EventSource) {
+    watchPlayers();
+  } else {
     var update = setInterval(function() { getPlayers(); }, 5000);
     getPlayers();
+  }
 };
 
+var playerList = null;
+
+function watchPlayers() {
+  // the server pushes the full list once, then only joins and leaves
+  var urlStream = document.getElementById("url-cmd-list-stream").value;
+  var source = new EventSource(urlStream);
+  source.addEventListener("players", function(event) {
+    playerList = JSON.parse(event.data);
+    updatePlayers(playerList);
+  });
+  source.addEventListener("diff", function(event) {
+    var diff = JSON.parse(event.data);
+    var players = playerList["players"].filter(
+      player => !diff["left"].includes(player));
+    playerList = {
+      "count": diff["count"],
+      "max": diff["max"],
+      "players": players.concat(diff["joined"])
+    };
+    updatePlayers(playerList);
+  });
+}
+
 function getPlayers() {
   var urlList = document.getElementById("url-cmd-list").value;
   fetch(urlList, {
@@ -17,7 +44,7 @@ function updatePlayers(jsonReturn) {
 
   var count = jsonReturn["max"];
   var max = jsonReturn["count"];
-  var players = jsonReturn["players"];
+  var players = jsonReturn["players"].slice();
 
   var urlPlayer = document.getElementById("url-main-player").value;
   for (let i = 0; i < players.length; i++) {
@@ -0,0 +1,8 @@
+import logging
+
+from flask import Blueprint
+
+status = Blueprint('status', __name__)
+logger = logging.getLogger('status')
+
+from . import view
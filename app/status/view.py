@@ -0,0 +1,41 @@
+from flask import current_app, request
+
+from ..parsers import parse
+from ..slp import SLPError
+from . import logger
+from . import status
+
+@status.route('/')
+def root():
+    """Players online, the MOTD and version, by Server List Ping.
+
+    The ping is cheaper than RCON list, which the server runs on its main
+    thread. When it fails and STATUS_FALLBACK is set the counts come from
+    list instead ("source": "rcon", without the MOTD or version). Another
+    server is picked with ?server=<name>.
+    """
+    name = request.args.get('server', next(iter(current_app.fleet)))
+    if name not in current_app.statuses:
+        return ({
+            'result': 'failure',
+            'response': f'no server named {name}'
+        }, 404)
+    try:
+        result = current_app.statuses[name].status()
+        return ({'source': 'slp', **result}, 200)
+    except SLPError as e:
+        if not current_app.config['STATUS_FALLBACK']:
+            return ({'result': 'failure', 'response': str(e)}, 503)
+        logger.warning(f'{e}; falling back to RCON list')
+
+    result = parse('list', current_app.fleet[name].command('list')).as_dict()
+    return ({
+        'source': 'rcon',
+        'online': result['count'],
+        'max': result['max'],
+        'players': result['players'],
+        'motd': None,
+        'version': None,
+        'protocol': None,
+        'latency': None,
+    }, 200)
@@ -0,0 +1,88 @@
+"""Fan server-side events out to any number of streaming clients"""
+
+import json
+import queue
+import threading
+
+
+class Broadcaster():
+    """Publish items to every subscriber's bounded queue.
+
+    Publishing never blocks on a slow client. When a subscriber's queue is
+    full its backlog is dropped; if `resync` is given, it's called for an
+    item (e.g. a full snapshot) that lets the client catch up again,
+    otherwise only the oldest item is dropped.
+    """
+    def __init__(self, maxsize=100, resync=None):
+        self.maxsize = maxsize
+        self._resync = resync
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self, *initial):
+        """Return a new subscriber queue, seeded with any initial items."""
+        subscriber = queue.Queue(self.maxsize)
+        for item in initial:
+            subscriber.put_nowait(item)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, item):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(item)
+            except queue.Full:
+                self._overflow(subscriber, item)
+
+    def _overflow(self, subscriber, item):
+        if self._resync is not None:
+            while True:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    break
+            item = self._resync()
+        else:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                pass
+        try:
+            subscriber.put_nowait(item)
+        except queue.Full:
+            pass
+
+
+def sse(event, data):
+    """Format a Server-Sent Events message; data is sent as JSON"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def sse_stream(broadcaster, subscriber, keepalive=15):
+    """Yield SSE messages for (event, data) items until the client leaves.
+
+    A comment line is sent every `keepalive` seconds without events so
+    proxies don't time the connection out.
+    """
+    try:
+        while True:
+            try:
+                event, data = subscriber.get(timeout=keepalive)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            yield sse(event, data)
+    finally:
+        broadcaster.unsubscribe(subscriber)
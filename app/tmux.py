@@ -0,0 +1,184 @@
+"""Show and type into a server console running in tmux
+
+run.bsh starts the server in a tmux session; so can a service:
+
+  tmux -S ./instance/tmux_socket new-session -s mc -d <server command>
+
+Rather than polling `tmux capture-pane`, which copies the whole screen and
+scrollback each time, TmuxConsole has tmux pipe the pane's output into a
+FIFO once and reads only what's new, keeping the last lines in a ring
+buffer. Keystrokes go to the pane with `send-keys`, for whatever RCON
+can't do (answering a prompt, or a server started without RCON).
+"""
+
+from collections import deque
+import codecs
+import logging
+import os
+import re
+import select
+import shlex
+import subprocess
+import tempfile
+import threading
+
+from .stream import Broadcaster
+
+logger = logging.getLogger(__name__)
+
+# CSI (colors, cursor movement), OSC (titles) and other escape sequences
+_ESCAPES = re.compile(
+    r'\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)'
+    r'|\x1b[@-Z\\-_]|[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
+
+class TmuxError(Exception):
+    """A tmux command failed (no server, session or tmux at all)."""
+
+
+class TmuxConsole():
+    """Follow a tmux pane's output and send it keystrokes.
+
+    Works like LogTail: subscribers receive ('history', [lines]) first,
+    then ('line', line). The first subscriber starts the pipe; the history
+    is seeded from one capture of the last `history` lines of the pane.
+
+      console = TmuxConsole('instance/tmux_socket', 'mc')
+      console.send('say hello')
+    """
+    def __init__(self, socket, session='mc', history=500, timeout=5,
+                 maxsize=1000):
+        self.socket = socket
+        self.session = session
+        self.timeout = timeout
+        self.lines = deque(maxlen=history)
+        self._broadcaster = Broadcaster(maxsize)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._dir = None
+        self._fds = ()
+        # a read can end mid-character; the decoder keeps those bytes
+        self._decoder = codecs.getincrementaldecoder('utf8')('replace')
+        self._partial = ''
+
+    @property
+    def broadcaster(self):
+        return self._broadcaster
+
+    def tmux(self, *args):
+        """Run a tmux command on our socket; return its output"""
+        try:
+            result = subprocess.run(
+                ['tmux', '-S', self.socket, *args], capture_output=True,
+                text=True, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise TmuxError(f'tmux {args[0]} failed: {e}') from e
+        if result.returncode != 0:
+            raise TmuxError(
+                f'tmux {args[0]} failed: {result.stderr.strip()}')
+        return result.stdout
+
+    def send(self, text, enter=True):
+        """Type text into the pane (literally, not as key names)"""
+        if text:
+            self.tmux('send-keys', '-t', self.session, '-l', text)
+        if enter:
+            self.keys('Enter')
+
+    def keys(self, *keys):
+        """Send keys by tmux name, like 'C-c' or 'Up'"""
+        self.tmux('send-keys', '-t', self.session, *keys)
+
+    def subscribe(self):
+        """Return a queue of events, starting with the recent history."""
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            return self._broadcaster.subscribe(('history', list(self.lines)))
+
+    def unsubscribe(self, subscriber):
+        self._broadcaster.unsubscribe(subscriber)
+
+    def _start(self):
+        self._dir = tempfile.mkdtemp(prefix='flask_craft-tmux-')
+        fifo = os.path.join(self._dir, 'pane')
+        os.mkfifo(fifo, 0o600)
+        # our own writer keeps reads from seeing end-of-file whenever tmux
+        #   closes its pipe (it does when the pane's command exits)
+        reader = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        writer = os.open(fifo, os.O_WRONLY)
+        self._fds = (reader, writer)
+        try:
+            self._seed()
+            # replaces any earlier pipe, so a restarted app takes it over
+            self.tmux('pipe-pane', '-O', '-t', self.session,
+                      f'cat >> {shlex.quote(fifo)}')
+        except TmuxError:
+            self._cleanup()
+            raise
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='tmux-console', daemon=True)
+        self._thread.start()
+
+    def _seed(self):
+        self.lines.clear()
+        self._decoder.reset()
+        self._partial = ''
+        screen = self.tmux('capture-pane', '-p', '-J', '-t', self.session,
+                           '-S', f'-{self.lines.maxlen}')
+        # the screen's blank rows below the output
+        self.lines.extend(screen.rstrip('\n').split('\n'))
+        while self.lines and not self.lines[-1]:
+            self.lines.pop()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if self._thread is not None:
+                try:
+                    self.tmux('pipe-pane', '-t', self.session)
+                except TmuxError as e:
+                    logger.warning(f'{e}; the pane may still be piped')
+
+    def _run(self):
+        reader = self._fds[0]
+        while not self._stop.is_set():
+            ready, _, _ = select.select([reader], [], [], 0.25)
+            if not ready:
+                continue
+            try:
+                data = os.read(reader, 65536)
+            except BlockingIOError:
+                continue
+            with self._lock:
+                self.feed(data)
+        with self._lock:
+            self._cleanup()
+            self._thread = None
+
+    def _cleanup(self):
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = ()
+        if self._dir is not None:
+            os.unlink(os.path.join(self._dir, 'pane'))
+            os.rmdir(self._dir)
+            self._dir = None
+
+    def feed(self, data):
+        """Add raw pane output, publishing each line it completes.
+
+        Escape sequences are only stripped from whole lines, so one split
+        between two reads is still recognized.
+        """
+        lines = (self._partial + self._decoder.decode(data)).split('\n')
+        # the last piece is an unfinished line (or empty)
+        self._partial = lines.pop()
+        for line in lines:
+            line = _ESCAPES.sub('', line).rstrip('\r')
+            # a carriage return rewrites the line from its start
+            line = line.rsplit('\r', 1)[-1]
+            self.lines.append(line)
+            self._broadcaster.publish(('line', line))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""Load-test the app and RCON client against FakeServer
+
+Drives /cmd/list/, /cmd/kick/ and raw MCRcon.command() from a number of
+threads at once and reports throughput and p50/p95/p99 latency. Requests go
+through Flask's test client, so everything but the HTTP server is measured.
+Run from the project root:
+
+  $ python tests/bench_load.py --concurrency 1,4,16 --requests 400
+  $ python tests/bench_load.py --latency 0.005 --split 7 --save base.json
+  $ python tests/bench_load.py --latency 0.005 --split 7 --compare base.json
+  $ python tests/bench_load.py --players 5000 --churn 20
+
+--compare exits with status 1 if throughput dropped or p95 latency grew by
+more than --tolerance (a fraction) for any target measured in both runs.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.getcwd())
+os.environ['FLASK_TESTING'] = '1'
+
+from fake_server import FakeServer, run_in_thread
+from MCRconLib import MCRcon
+
+from app import create_app
+
+TARGETS = ['list', 'kick', 'raw']
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def make_app(args, concurrency):
+    """Create the app with a config pointing at the fake server"""
+    instance = tempfile.mkdtemp(prefix='bench-')
+    with open(os.path.join(instance, 'bench-testing.conf'), 'w') as f:
+        f.write(
+            f"RCON_SERVER='localhost'\n"
+            f"RCON_PASSWD='password'\n"
+            f"RCON_PORT={args.port}\n"
+            f"RCON_POOL_SIZE={max(concurrency, args.pool_size)}\n"
+            f"RCON_PIPELINING={args.pipelining}\n"
+            f"LOG_FILE={os.path.join(instance, 'application.log')!r}\n"
+        )
+        if not args.cache:
+            f.write('RCON_CACHE_TTL={}\n')
+    return create_app('bench', instance_path=instance)
+
+def run(target, fake_server, app, concurrency, requests):
+    """Send `requests` requests from `concurrency` threads; return latencies"""
+    local = threading.local()
+    players = [f'bench_{i}' for i in range(0, requests)]
+    if target == 'kick':
+        for player in players:
+            fake_server.player_join(player)
+
+    def _request(i):
+        if target == 'raw':
+            if not hasattr(local, 'mcr'):
+                local.mcr = MCRcon(
+                    'localhost', 'password', port=fake_server.bind[1],
+                    framing=True)
+                local.mcr.connect()
+            start = time.perf_counter()
+            local.mcr.command('list')
+            return time.perf_counter() - start, True
+
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        start = time.perf_counter()
+        if target == 'list':
+            rv = local.client.get('/cmd/list/')
+        else:
+            rv = local.client.post('/cmd/kick/', json={'player': players[i]})
+        return time.perf_counter() - start, rv.status_code == 200
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(_request, range(0, requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'target': target,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, ok in results if not ok),
+        'seconds': elapsed,
+        'throughput': requests / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+def compare(results, baseline, tolerance):
+    """Print regressions against a baseline; return how many there were"""
+    base = {f"{r['target']}@{r['concurrency']}": r for r in baseline['results']}
+    regressions = 0
+    for result in results:
+        key = f"{result['target']}@{result['concurrency']}"
+        if key not in base:
+            continue
+        old = base[key]
+        problems = []
+        if result['throughput'] < old['throughput'] * (1 - tolerance):
+            problems.append(
+                f"throughput {old['throughput']:.0f} -> "
+                f"{result['throughput']:.0f} req/s")
+        if result['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            problems.append(
+                f"p95 {old['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        if problems:
+            regressions += 1
+            print(f'REGRESSION {key}: ' + ', '.join(problems))
+    return regressions
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    argparser.add_argument('--target', default='all',
+                           choices=TARGETS + ['all'])
+    argparser.add_argument('--concurrency', default='1,4,16',
+                           help='comma separated thread counts')
+    argparser.add_argument('--requests', type=int, default=400,
+                           help='requests per target and concurrency')
+    argparser.add_argument('--port', type=int, default=25575)
+    argparser.add_argument('--pool-size', type=int, default=4,
+                           help='minimum RCON_POOL_SIZE')
+    argparser.add_argument('--cache', action='store_true',
+                           help='keep the default RCON_CACHE_TTL')
+    argparser.add_argument('--pipelining', action='store_true')
+    argparser.add_argument('--latency', type=float, default=0,
+                           help='seconds the fake server waits to reply')
+    argparser.add_argument('--split', type=int, default=0,
+                           help='bytes per chunk the fake server writes')
+    argparser.add_argument('--split-delay', type=float, default=0,
+                           help='seconds between chunks of a split reply')
+    argparser.add_argument('--players', type=int, default=0,
+                           help='players online on the fake server')
+    argparser.add_argument('--churn', type=float, default=0,
+                           help='joins and leaves a second')
+    argparser.add_argument('--save', metavar='JSON',
+                           help='write results as a baseline file')
+    argparser.add_argument('--compare', metavar='JSON',
+                           help='compare results with a baseline file')
+    argparser.add_argument('--tolerance', type=float, default=0.2)
+    args = argparser.parse_args()
+
+    targets = TARGETS if args.target == 'all' else [args.target]
+    concurrencies = [int(c) for c in args.concurrency.split(',')]
+
+    fake_server = FakeServer(
+        bind=('localhost', args.port), password='password',
+        latency=args.latency, split=args.split, split_delay=args.split_delay,
+        max_players=max(5, args.players * 2))
+    run_in_thread(fake_server)
+    fake_server.populate(args.players)
+    if args.churn:
+        fake_server.start_churn(args.churn)
+
+    results = []
+    print(f"{'target':<8}{'threads':>8}{'req/s':>10}{'p50 ms':>10}"
+          f"{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    try:
+        for concurrency in concurrencies:
+            app = make_app(args, concurrency)
+            for target in targets:
+                result = run(
+                    target, fake_server, app, concurrency, args.requests)
+                results.append(result)
+                print(f"{target:<8}{concurrency:>8}"
+                      f"{result['throughput']:>10.0f}"
+                      f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                      f"{result['p99_ms']:>10.2f}{result['errors']:>8}")
+            app.mcr.close()
+    finally:
+        with MCRcon('localhost', 'password', port=args.port) as mcr:
+            mcr.command('stop')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f'saved baseline to {args.save}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+        print(f'no regressions against {args.compare}')
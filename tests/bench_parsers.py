@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Micro-benchmark the command reply parsers
+
+Compares the list parser with the three lookbehind regexes the list view
+used to run over every response. Run from the project root:
+
+  $ python tests/bench_parsers.py [--number 20000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.getcwd())
+
+from app.parsers import parse
+
+# The list view's original parsing, for comparison
+list_player_count = re.compile('(?<=There are )\\d*')
+list_player_max = re.compile('(?<=a max of )\\d*')
+list_players = re.compile('(?<=online: ).*')
+
+def legacy_list(response):
+    return {
+        'count': int(list_player_count.findall(response)[0]),
+        'max': int(list_player_max.findall(response)[0]),
+        'players': list_players.findall(response)[0].split(', '),
+    }
+
+def list_response(n):
+    players = ', '.join(f'player_{i:04}' for i in range(0, n))
+    return f'There are {n} of a max of {max(n, 20)} players online: {players}'
+
+def bench(label, func, response, number):
+    seconds = min(timeit.repeat(
+        lambda: func(response), number=number, repeat=5))
+    print(f'{label:<28} {seconds / number * 1e6:10.2f} us/response')
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    argparser.add_argument('--number', type=int, default=20000,
+                           help='parses per timing run')
+    args = argparser.parse_args()
+
+    for n in [0, 5, 100, 1000]:
+        response = list_response(n)
+        print(f'list with {n} players ({len(response)} bytes)')
+        bench('  three regexes (legacy)', legacy_list, response, args.number)
+        bench('  single pass ListResult', lambda r: parse('list', r),
+              response, args.number)
+
+    response = 'Kicked player_0001: Kicked by an operator'
+    print('kick')
+    bench('  single pass KickResult', lambda r: parse('kick', r),
+          response, args.number)
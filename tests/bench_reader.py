@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""Benchmark reading multi-packet RCON replies
+
+Compares the buffered recv_into() reader in MCRcon with the reader mcrcon
+ships (two recv loops per packet, decoding each payload and concatenating
+strings). Replies of several sizes, split into 4096 byte packets like a
+Minecraft server does, are written to one end of a socketpair and the time
+to read them back from the other is measured. Run from the project root:
+
+  $ python tests/bench_reader.py [--number 200]
+"""
+
+import argparse
+import os
+import socket
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from MCRconLib import MCRcon
+
+PACKET_PAYLOAD = 4096
+SENTINEL_ID = 2
+
+def reply_bytes(size):
+    """Return a reply of `size` bytes in packets, then a sentinel packet"""
+    text = ('abcdefghijklmnopqrstuvwxyz' * (size // 26 + 1))[:size]
+    packets = [
+        MCRcon._pack(1, MCRcon.SERVERDATA_RESPONSE_VALUE,
+                     text[i:i + PACKET_PAYLOAD])
+        for i in range(0, len(text), PACKET_PAYLOAD)
+    ]
+    packets.append(MCRcon._pack(
+        SENTINEL_ID, MCRcon.SERVERDATA_RESPONSE_VALUE, ''))
+    return b''.join(packets), text
+
+def legacy_read_reply(sock):
+    """mcrcon's reader: recv what's missing, bytes +=, decode per packet"""
+    def _read(length):
+        data = b''
+        while len(data) < length:
+            data += sock.recv(length - len(data))
+        return data
+
+    in_data = ''
+    while True:
+        (in_length,) = struct.unpack('<i', _read(4))
+        in_payload = _read(in_length)
+        in_id, in_type = struct.unpack('<ii', in_payload[:8])
+        if in_id == SENTINEL_ID:
+            return in_data
+        in_data += in_payload[8:-2].decode('utf8')
+
+def buffered_read_reply(mcr):
+    """The framed reader's loop: collect payload bytes, decode once"""
+    in_data = []
+    while True:
+        in_id, in_type, in_data_partial = mcr._read_packet()
+        if in_id == SENTINEL_ID:
+            return b''.join(in_data).decode('utf8')
+        in_data.append(in_data_partial)
+
+def bench(label, read, data, expected, number):
+    client, server = socket.socketpair()
+    # room for a whole reply, so only reading is timed
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 2 * len(data))
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2 * len(data))
+    mcr = MCRcon('localhost', 'password')
+    mcr.socket = client
+
+    elapsed = 0
+    for _ in range(0, number):
+        server.sendall(data)
+        start = time.perf_counter()
+        assert read(client if read is legacy_read_reply else mcr) == expected
+        elapsed += time.perf_counter() - start
+    client.close()
+    server.close()
+    print(f'{label:<24} {elapsed / number * 1e6:10.1f} us/reply '
+          f'{len(data) * number / elapsed / 2**20:8.1f} MiB/s')
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    argparser.add_argument('--number', type=int, default=200,
+                           help='replies read per size')
+    args = argparser.parse_args()
+
+    for size in [1024, 16 * 1024, 64 * 1024, 256 * 1024]:
+        data, text = reply_bytes(size)
+        print(f'reply of {size // 1024} KiB '
+              f'({-(-size // PACKET_PAYLOAD)} packets)')
+        bench('  legacy reader', legacy_read_reply, data, text, args.number)
+        bench('  buffered recv_into', buffered_read_reply, data, text,
+              args.number)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Benchmark how long create_app takes
+
+Creates the app repeatedly in a temporary instance folder, once against a
+FakeServer and once against a server that accepts connections but never
+answers, and reports the fastest and median times. Neither should wait on
+RCON. Run from the project root:
+
+  $ python tests/bench_startup.py [--number 20]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.getcwd())
+os.environ['FLASK_TESTING'] = '1'
+
+from fake_server import FakeServer, run_in_thread
+from MCRconLib import MCRcon
+
+from app import create_app
+
+
+def time_startup(port, number):
+    """Return the seconds each of `number` create_app calls took"""
+    instance = tempfile.mkdtemp(prefix='bench-')
+    with open(os.path.join(instance, 'bench-testing.conf'), 'w') as f:
+        f.write(
+            f"RCON_SERVER='localhost'\n"
+            f"RCON_PASSWD='password'\n"
+            f"RCON_PORT={port}\n"
+            f"RCON_TIMEOUT=5\n"
+            f"LOG_FILE={os.path.join(instance, 'application.log')!r}\n"
+        )
+    times = []
+    for _ in range(0, number):
+        start = time.perf_counter()
+        app = create_app('bench', instance_path=instance)
+        times.append(time.perf_counter() - start)
+        app.fleet.close()
+    return times
+
+def report(label, times):
+    print(f'{label:<20} {min(times) * 1000:8.1f} ms min '
+          f'{statistics.median(times) * 1000:8.1f} ms median')
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    argparser.add_argument('--number', type=int, default=20,
+                           help='apps created per server')
+    argparser.add_argument('--port', type=int, default=25575)
+    args = argparser.parse_args()
+
+    fake_server = FakeServer(bind=('localhost', args.port),
+                             password='password')
+    run_in_thread(fake_server)
+    silent = socket.socket()
+    silent.bind(('localhost', 0))
+    silent.listen()
+    try:
+        report('fake server', time_startup(args.port, args.number))
+        report('silent server',
+               time_startup(silent.getsockname()[1], args.number))
+    finally:
+        silent.close()
+        with MCRcon('localhost', 'password', port=args.port) as mcr:
+            mcr.command('stop')
@@ -1,5 +1,6 @@
 
 import asyncio
+import json
 import threading
 import logging
 import os
@@ -11,7 +12,7 @@ import time
 
 import pytest
 
-from fake_server import FakeServer, SysExitThread
+from fake_server import FakeServer, run_in_thread
 from MCRconLib import MCRcon
 
 sys.path.append(os.getcwd())
@@ -46,19 +47,49 @@ def get_random(n, chars='alnum'):
     else:
         raise RuntimeError('chars must be either "alnum" or "num".')
 
-@pytest.fixture(scope='function')
-def fake_server():
-    """Yield a fake minecraft server available via rcon"""
-    fake_server = FakeServer(password='password')
+def count_calls(fake_server, command, delay=0):
+    """Wrap a fake server command handler to count (and slow) its calls.
 
-    def _run():
-        asyncio.run(fake_server.listen())
+    Returns a list which gets the arguments of every call appended.
+    """
+    handler = fake_server.command[command]
+    calls = []
+
+    def _counted(*args):
+        calls.append(args)
+        time.sleep(delay)
+        return handler(*args)
+
+    fake_server.command[command] = _counted
+    return calls
+
+def drop_after(fake_server, command):
+    """Make a command run, then drop the connection instead of replying"""
+    calls = count_calls(fake_server, command)
+    handler = fake_server.command[command]
+
+    def _dropped(*args):
+        handler(*args)
+        raise ConnectionAbortedError('dropped mid-reply')
+
+    fake_server.command[command] = _dropped
+    return calls
+
+def read_event(events):
+    """Return the next (event, data) from an SSE response iterator"""
+    for chunk in events:
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode()
+        if chunk.startswith(':'):
+            continue
+        lines = chunk.strip().split('\n')
+        return lines[0][len('event: '):], json.loads(lines[1][len('data: '):])
 
-    t = SysExitThread(target=_run)
-    t.start()
-    # it takes a moment for our server to start
-    while not fake_server.server.is_serving():
-        time.sleep(0.25)
+@pytest.fixture(scope='function')
+def fake_server():
+    """Yield a fake minecraft server available via rcon (and SLP)"""
+    fake_server = FakeServer(password='password', slp_port=25565)
+    run_in_thread(fake_server)
     yield fake_server
     try:
         if fake_server.server.is_serving():
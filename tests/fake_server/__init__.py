@@ -3,11 +3,16 @@
 
 import asyncio
 from asyncio.exceptions import CancelledError
+import hashlib
+import json
 import logging 
+import random
 import threading
 import time
+import uuid
 
 from rcon_server.rcon_server import RCONServer
+from rcon_server.rcon_connection import RCONConnection
 from rcon_server.rcon_message import RCONMessage
 from rcon_server.rcon_packet import RCONPacket
 
@@ -27,6 +32,98 @@ logger.addHandler(fh)
 logger.setLevel(logging.INFO)
 
 
+# usage lines returned by the help command (as of Minecraft 1.19)
+HELP = [
+    'advancement (grant|revoke) <targets> (everything|from|only|through|until) <advancement>',
+    'attribute <target> <attribute> (base|get|modifier)',
+    'ban <targets> [<reason>]',
+    'ban-ip <target> [<reason>]',
+    'banlist [ips|players]',
+    'bossbar (add|get|list|remove|set)',
+    'clear [<targets>] [<item>] [<maxCount>]',
+    'clone <begin> <end> <destination> [replace|masked|filtered] [force|move|normal]',
+    'data (get|merge|modify|remove) (block|entity|storage)',
+    'data get (block <targetPos>|entity <target>|storage <target>) [<path>] [<scale>]',
+    'data merge (block <targetPos>|entity <target>|storage <target>) <nbt>',
+    'data modify (block <targetPos>|entity <target>|storage <target>) <targetPath> (append|insert <index>|merge|prepend|set) (from|value) <source>',
+    'data remove (block <targetPos>|entity <target>|storage <target>) <path>',
+    'datapack (disable|enable|list)',
+    'debug (start|stop|function)',
+    'defaultgamemode (survival|creative|adventure|spectator)',
+    'deop <targets>',
+    'difficulty [peaceful|easy|normal|hard]',
+    'effect (clear|give) <targets> [<effect>] [<seconds>] [<amplifier>] [<hideParticles>]',
+    'enchant <targets> <enchantment> [<level>]',
+    'execute (run|if|unless|as|at|store|positioned|rotated|facing|align|anchored|in|summon|on)',
+    'execute if (biome|block|blocks|data|entity|predicate|score) <...> [run <command>]',
+    'execute unless (biome|block|blocks|data|entity|predicate|score) <...> [run <command>]',
+    'execute store (result|success) (block|bossbar|entity|score|storage) <...> run <command>',
+    'execute (positioned|rotated|facing) (<pos>|<rot>|as <targets>|entity <targets> <anchor>) run <command>',
+    'experience (add|set|query) <targets> [<amount>] [points|levels]',
+    'fill <from> <to> <block> [replace|keep|outline|hollow|destroy]',
+    'fillbiome <from> <to> <biome> [replace <filter>]',
+    'forceload (add|remove|query) [<from>] [<to>]',
+    'function <name>',
+    'gamemode (survival|creative|adventure|spectator) [<target>]',
+    'gamerule <rule> [<value>]',
+    'give <targets> <item> [<count>]',
+    'help [<command>]',
+    'item (replace|modify) (block|entity) <pos|targets> <slot> (with|from) <item|modifier>',
+    'jfr (start|stop)',
+    'kick <targets> [<reason>]',
+    'kill [<targets>]',
+    'list [uuids]',
+    'locate (structure|biome|poi) <what>',
+    'loot (replace|insert|give|spawn) <target> (fish|loot|kill|mine) <source>',
+    'me <action>',
+    'msg <targets> <message>',
+    'op <targets>',
+    'pardon <targets>',
+    'pardon-ip <target>',
+    'particle <name> [<pos>] [<delta> <speed> <count> [force|normal] [<viewers>]]',
+    'perf (start|stop)',
+    'place (feature|jigsaw|structure|template) <what> [<pos>]',
+    'playsound <sound> <source> <targets> [<pos>] [<volume>] [<pitch>] [<minVolume>]',
+    'publish [<allowCommands>] [<gamemode>] [<port>]',
+    'recipe (give|take) <targets> (*|<recipe>)',
+    'reload',
+    'save-all [flush]',
+    'save-off',
+    'save-on',
+    'say <message>',
+    'schedule (function|clear) <function> [<time>] [append|replace]',
+    'scoreboard (objectives|players) (add|remove|list|setdisplay|modify|set|get|operation|enable|reset)',
+    'scoreboard objectives (add <objective> <criteria> [<displayName>]|list|modify <objective> (displayname|rendertype) <value>|remove <objective>|setdisplay <slot> [<objective>])',
+    'scoreboard players (add|enable|get|list|operation|remove|reset|set) <targets> [<objective>] [<score>]',
+    'seed',
+    'setblock <pos> <block> [destroy|keep|replace]',
+    'setidletimeout <minutes>',
+    'setworldspawn [<pos>] [<angle>]',
+    'spawnpoint [<targets>] [<pos>] [<angle>]',
+    'spectate [<target>] [<player>]',
+    'spreadplayers <center> <spreadDistance> <maxRange> (under <maxHeight>|<respectTeams>) <targets>',
+    'stop',
+    'stopsound <targets> [*|master|music|record|weather|block|hostile|neutral|player|ambient|voice] [<sound>]',
+    'summon <entity> [<pos>] [<nbt>]',
+    'tag <targets> (add|list|remove) [<name>]',
+    'team (add|empty|join|leave|list|modify|remove) [<team>] [<members>|<option> <value>]',
+    'teammsg <message>',
+    'teleport (<location>|<destination>|<targets>) [<location>|<destination>] [<rotation>|facing (<facingLocation>|entity <facingEntity> [<facingAnchor>])]',
+    'tell <targets> <message>',
+    'tellraw <targets> <message>',
+    'time (add|query|set) (<time>|daytime|gametime|day|day|night|noon|midnight)',
+    'title <targets> (clear|reset|title|subtitle|actionbar|times) [<title>|<fadeIn> <stay> <fadeOut>]',
+    'tm <message>',
+    'tp (<location>|<destination>|<targets>) [<location>|<destination>] [<rotation>|facing (<facingLocation>|entity <facingEntity> [<facingAnchor>])]',
+    'trigger <objective> [add|set] [<value>]',
+    'w <targets> <message>',
+    'weather (clear|rain|thunder) [<duration>]',
+    'whitelist (add|list|off|on|reload|remove) [<targets>]',
+    'worldborder (add|center|damage|get|set|warning) [<distance>] [<time>]',
+    'xp (add|set|query) <targets> [<amount>] [points|levels]',
+]
+
+
 class SysExitThread(threading.Thread):
     """Pass exception from thread run to the parent"""
     # This is a workaround I found to an odd situation that arises
@@ -51,12 +148,139 @@ class SysExitThread(threading.Thread):
             raise self._exc
 
 
+def run_in_thread(fake_server):
+    """Start serving from a background thread; return once it's listening"""
+
+    def _run():
+        asyncio.run(fake_server.listen())
+
+    t = SysExitThread(target=_run)
+    t.start()
+    # it takes a moment for our server to start
+    while not fake_server.server.is_serving():
+        time.sleep(0.05)
+    return t
+
+
 class DummyServer:
     """A dummy server until the asyncio server is created"""
     def is_serving(self):
         return False
 
 
+class FakeConnection(RCONConnection):
+    """An RCONConnection that handles every packet in a read.
+
+    RCONConnection only handles the first complete packet of each chunk it
+    receives, leaving pipelined packets in its buffer until more data
+    arrives.
+    """
+    def __init__(self, rcon_server):
+        super().__init__(rcon_server)
+        # loop time of the last scheduled (delayed) write; see FakeServer
+        self._write_at = 0
+
+    def data_received(self, data):
+        if self._state == "closed":
+            self._transport.close()
+            return
+        self._buffer += data
+        while self._state != "closed":
+            packet, self._buffer = RCONPacket.from_buffer(self._buffer)
+            if packet is None:
+                break
+            self._handle_packet(packet)
+
+    def send_packet(self, packet):
+        """Send through the server to apply its latency and splitting."""
+        self._rcon_server.write(self, packet.msg())
+
+
+def _varint(value):
+    """Encode a VarInt as used by the Minecraft protocol"""
+    value &= 0xFFFFFFFF
+    data = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+def _read_varint(data, offset=0):
+    """Return (value, offset after it), or (None, offset) if incomplete"""
+    value = 0
+    for i in range(0, 5):
+        if offset + i >= len(data):
+            return None, offset
+        byte = data[offset + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, offset + i + 1
+    raise ValueError('VarInt too long')
+
+
+class FakeSLPConnection(asyncio.Protocol):
+    """Answer Server List Ping (the multiplayer screen's status) requests.
+
+    A handshake asking for the status state, then a status request (0x00)
+    gets the server's status JSON; a ping (0x01) is echoed and closes the
+    connection, like a real server.
+    """
+    def __init__(self, fake_server):
+        self._fake_server = fake_server
+        self._buffer = b''
+        self._state = 'handshake'
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def data_received(self, data):
+        self._buffer += data
+        while True:
+            length, start = _read_varint(self._buffer)
+            if length is None or len(self._buffer) < start + length:
+                return
+            packet = self._buffer[start:start + length]
+            self._buffer = self._buffer[start + length:]
+            self._handle(*_read_varint(packet), packet)
+
+    def _handle(self, packet_id, offset, packet):
+        if self._state == 'handshake' and packet_id == 0x00:
+            # protocol version, address, port; then the next state
+            _, offset = _read_varint(packet, offset)
+            length, offset = _read_varint(packet, offset)
+            next_state, _ = _read_varint(packet, offset + length + 2)
+            if next_state != 1:
+                self._transport.close()
+            self._state = 'status'
+        elif self._state == 'status' and packet_id == 0x00:
+            body = json.dumps(self._fake_server.slp_status()).encode()
+            self._send(b'\x00' + _varint(len(body)) + body)
+        elif self._state == 'status' and packet_id == 0x01:
+            self._send(b'\x01' + packet[offset:offset + 8], close=True)
+        else:
+            self._transport.close()
+
+    def _send(self, payload, close=False):
+        data = _varint(len(payload)) + payload
+
+        def _write():
+            if not self._transport.is_closing():
+                self._transport.write(data)
+                if close:
+                    self._transport.close()
+
+        if self._fake_server.latency:
+            asyncio.get_running_loop().call_later(
+                self._fake_server.latency, _write)
+        else:
+            _write()
+
+
 class FakeServer(RCONServer):
     """A mock minecraft server accessible via rcon.
 
@@ -64,14 +288,44 @@ class FakeServer(RCONServer):
     The object offers methods to manipulate server properties.
     """
 
-    def __init__(self, bind=('localhost',25575), password=None):
+    def __init__(self, bind=('localhost',25575), password=None,
+                 latency=0, split=0, split_delay=0, max_players=5,
+                 slp_port=None):
         """Overload RCONServer's init
 
         Better defaults & internal setup to mimick a server.
+
+        Players are kept in a dict (in the order they joined), so a server
+        with thousands of them still joins, kicks and leaves in O(1). See
+        populate() and start_churn() to simulate a busy server.
+
+        Arguments used to simulate slow or fragmented networks (each can be
+        changed while the server runs):
+        latency
+            Seconds to wait before sending each reply.
+        split
+            Write replies in chunks of this many bytes (0 doesn't split).
+        split_delay
+            Seconds to wait between the chunks of a split reply.
+
+        With slp_port, Server List Ping is answered on that port (a real
+        server's game port); see slp_status().
         """
         self._world = 'My World'
-        self._max_players = 5
-        self._players = list()
+        self.motd = 'A Minecraft Server'
+        self.slp_port = slp_port
+        self.slp_server = None
+        self._max_players = max_players
+        # name -> time joined; changed from test threads and the loop
+        self._players = dict()
+        self._players_lock = threading.Lock()
+        self._churn_task = None
+        self._banned = set()
+        self._ops = set()
+        self._whitelist = set()
+        self.latency = latency
+        self.split = split
+        self.split_delay = split_delay
         
         super().__init__(bind, password)
 
@@ -79,10 +333,20 @@ class FakeServer(RCONServer):
             'list': self._list,
             'stop': self._stop,
             'kick': self._kick,
+            'help': self._help,
+            'say': self._say,
+            'seed': self._seed,
+            'ban': self._ban,
+            'op': self._op,
+            'whitelist': self._whitelist_command,
+            'tp': self._tp,
         }
 
         self.server = DummyServer()
 
+    def connection_factory(self):
+        return FakeConnection(self)
+
     @classmethod
     def generator(cls):
         logging.getLogger().addHandler(logging.StreamHandler())
@@ -93,6 +357,9 @@ class FakeServer(RCONServer):
         """Override parent method to make server is a class attribute."""
 
         self._loop = asyncio.get_event_loop()
+        if self.slp_port:
+            self.slp_server = await self._loop.create_server(
+                lambda: FakeSLPConnection(self), self.bind[0], self.slp_port)
         self.server = await self._loop.create_server(self.connection_factory,
                                           self.bind[0], self.bind[1])
         async with self.server:
@@ -133,45 +400,148 @@ class FakeServer(RCONServer):
             type=type_,
             body='\n'.join(response)
         )
-        connection.send_packet(message)
+        sent_at = self.write(connection, message.msg())
 
         if command == 'stop':
-            self._exit()
+            if sent_at is None:
+                self._exit()
+            else:
+                # let the delayed reply go out first
+                self._loop.call_at(sent_at, self._exit)
+
+    def write(self, connection, data):
+        """Write data to a connection applying latency and splitting.
+
+        Returns the loop time the last chunk is written at, or None if it
+        was written immediately. Chunks are scheduled at strictly increasing
+        times so replies on a connection stay in order.
+        """
+        if not self.split:
+            chunks = [data]
+        else:
+            chunks = [data[i:i + self.split]
+                      for i in range(0, len(data), self.split)]
+        if not self.latency and not (self.split_delay and len(chunks) > 1):
+            for chunk in chunks:
+                connection._transport.write(chunk)
+            return None
+
+        when = max(self._loop.time() + self.latency,
+                   connection._write_at + 1e-6)
+        for chunk in chunks:
+            self._loop.call_at(when, connection._transport.write, chunk)
+            connection._write_at = when
+            when += self.split_delay + 1e-6
+        return connection._write_at
 
     def _exit(self):
         """Exit the server"""
+        if self.slp_server is not None:
+            self.slp_server.close()
         if self.server.is_serving():
             self.server.close()
         while self.server.is_serving():
             time.sleep(0.25)
 
+    def slp_status(self):
+        """The status a Server List Ping gets, as of Minecraft 1.19.2"""
+        with self._players_lock:
+            players = list(self._players)
+        return {
+            'version': {'name': '1.19.2', 'protocol': 760},
+            'players': {
+                'max': self._max_players,
+                'online': len(players),
+                # a real server sends a random dozen
+                'sample': [
+                    {'name': name, 'id': self._offline_uuid(name)}
+                    for name in players[:12]
+                ],
+            },
+            'description': {'text': self.motd},
+            'enforcesSecureChat': False,
+        }
+
+    @staticmethod
+    def _offline_uuid(name):
+        """The UUID an offline-mode server gives a player"""
+        digest = hashlib.md5(f'OfflinePlayer:{name}'.encode()).digest()
+        return str(uuid.UUID(bytes=digest, version=3))
+
     # -------------------------
     # Server management methods
     # -------------------------
     def player_join(self, name):
         """A player joins the server."""
-        if name in self._players:
-            raise RuntimeError(f'{name} already joined')
-        self._players.append(name)
+        with self._players_lock:
+            if name in self._players:
+                raise RuntimeError(f'{name} already joined')
+            self._players[name] = time.time()
         # The following info is also logged, but I'm not ready to simulate it
         # f'{name}[/saddress:sport] logged in with entity id <UUID> at (X, Y, Z)
         logger.info(f'{name} joined the game')
 
     def player_leave(self, name):
-        if not name in self._players:
+        if not self._player_disconnect(name, 'Disconnected'):
             raise RuntimeError(f'invalid player {name}')
-        self._player_disconnect(name, 'Disconnected')
+
+    def populate(self, count, prefix='player_'):
+        """Join `count` players named prefix0, prefix1, ..."""
+        for i in range(0, count):
+            self.player_join(f'{prefix}{i}')
+
+    def start_churn(self, rate, players=None, prefix='churn_'):
+        """Have players join and leave about `rate` times a second.
+
+        The number online drifts around `players` (by default, the number
+        online now): below it joins are more likely, above it leaves are.
+        The player who has been online longest is the one to leave.
+        """
+        if players is None:
+            players = len(self._players)
+        self._loop.call_soon_threadsafe(
+            self._start_churn, rate, players, prefix)
+
+    def stop_churn(self):
+        self._loop.call_soon_threadsafe(self._stop_churn)
+
+    def _start_churn(self, rate, players, prefix):
+        self._stop_churn()
+        self._churn_task = self._loop.create_task(
+            self._churn(rate, players, prefix))
+
+    def _stop_churn(self):
+        if self._churn_task is not None:
+            self._churn_task.cancel()
+            self._churn_task = None
+
+    async def _churn(self, rate, players, prefix):
+        joined = 0
+        while True:
+            await asyncio.sleep(random.expovariate(rate))
+            online = len(self._players)
+            if random.random() * (players + online) < players or not online:
+                joined += 1
+                name = f'{prefix}{joined}'
+                if name not in self._players:
+                    self.player_join(name)
+            else:
+                with self._players_lock:
+                    name = next(iter(self._players), None)
+                if name is not None:
+                    self._player_disconnect(name, 'Disconnected')
 
     # -------------------------
     # Minecraft server commands
     # -------------------------
     def _list(self):
         """Show a count of players in game and list them"""
-        s = (
-            f'There are {len(self._players)} of a max of {self._max_players} '
-            'players online: '
-            f"{', '.join(self._players)}"
-        )
+        with self._players_lock:
+            s = (
+                f'There are {len(self._players)} of a max of '
+                f'{self._max_players} players online: '
+                f"{', '.join(self._players)}"
+            )
         return s
 
     def _kick(self, *args):
@@ -180,11 +550,62 @@ class FakeServer(RCONServer):
         reason = ' '.join(args[1:])
         if len(reason) == 0:
             reason='Kicked by an operator'
-        if not name in self._players:
+        if not self._player_disconnect(name, reason):
             return 'No player was found'
-        self._player_disconnect(name, reason)
         return f'Kicked {name}: {reason}'
 
+    def _ban(self, *args):
+        name = args[0]
+        reason = ' '.join(args[1:]).strip() or 'Banned by an operator.'
+        if name in self._banned:
+            return 'Nothing changed. The player is already banned'
+        self._banned.add(name)
+        self._player_disconnect(name, 'You are banned from this server.')
+        return f'Banned {name}: {reason}'
+
+    def _op(self, name):
+        if name in self._ops:
+            return 'Nothing changed. The player already is an operator'
+        self._ops.add(name)
+        return f'Made {name} a server operator'
+
+    def _whitelist_command(self, action, *args):
+        if action == 'add':
+            if args[0] in self._whitelist:
+                return 'Player is already whitelisted'
+            self._whitelist.add(args[0])
+            return f'Added {args[0]} to the whitelist'
+        if action == 'remove':
+            if args[0] not in self._whitelist:
+                return 'Player is not whitelisted'
+            self._whitelist.remove(args[0])
+            return f'Removed {args[0]} from the whitelist'
+        if action == 'list':
+            return (f'There are {len(self._whitelist)} whitelisted players: '
+                    f"{', '.join(sorted(self._whitelist))}")
+        return self._bad_command_or_file_name()
+
+    def _tp(self, name, *destination):
+        if name not in self._players:
+            return 'No entity was found'
+        if len(destination) == 1:
+            if destination[0] not in self._players:
+                return 'No entity was found'
+            return f'Teleported {name} to {destination[0]}'
+        x, y, z = (float(c.lstrip('~^') or 0) for c in destination)
+        return f'Teleported {name} to {x:.6f}, {y:.6f}, {z:.6f}'
+
+    def _help(self, *args):
+        """List every command's usage; far more than one packet's worth"""
+        return [f'/{usage}' for usage in HELP]
+
+    def _say(self, *args):
+        logger.info(f"[Rcon] {' '.join(args)}")
+        return ''
+
+    def _seed(self):
+        return 'Seed: [-4172144997902289642]'
+
     def _stop(self):
         return [
             f'Stopping the server'
@@ -213,15 +634,53 @@ class FakeServer(RCONServer):
     # Internal server operations
     # --------------------------
     def _player_disconnect(self, name, reason):
-        self._players.remove(name)
+        """Remove a player; return False if they weren't online."""
+        with self._players_lock:
+            if self._players.pop(name, None) is None:
+                return False
         logger.info(f'{name} lost connection: {reason}')
         logger.info(f'{name} left the game')
+        return True
+
+
+async def _serve(fake_server, players, churn):
+    """Listen, simulating a busy server once listening (see __main__)"""
+    listen = asyncio.ensure_future(fake_server.listen())
+    while not fake_server.server.is_serving():
+        await asyncio.sleep(0.05)
+    fake_server.populate(players)
+    if churn:
+        fake_server.start_churn(churn)
+    await listen
 
 
 if __name__ == '__main__':
+    import argparse
+
+    argparser = argparse.ArgumentParser(description='A fake Minecraft RCON '
+        'server; the options simulate a large, busy server on a slow link')
+    argparser.add_argument('--port', type=int, default=25575)
+    argparser.add_argument('--password', default='password')
+    argparser.add_argument('--players', type=int, default=0,
+                           help='players online at start')
+    argparser.add_argument('--max-players', type=int, default=None)
+    argparser.add_argument('--churn', type=float, default=0,
+                           help='joins and leaves a second')
+    argparser.add_argument('--latency', type=float, default=0)
+    argparser.add_argument('--split', type=int, default=0)
+    argparser.add_argument('--split-delay', type=float, default=0)
+    argparser.add_argument('--slp-port', type=int, default=25565,
+                           help='answer Server List Ping on this port '
+                                '(0 disables it)')
+    args = argparser.parse_args()
+
     logging.getLogger().addHandler(logging.StreamHandler())
-    rcon = FakeServer(password='password')
-    asyncio.run(rcon.listen())
+    rcon = FakeServer(
+        bind=('localhost', args.port), password=args.password,
+        latency=args.latency, split=args.split, split_delay=args.split_delay,
+        max_players=args.max_players or max(5, args.players * 2),
+        slp_port=args.slp_port)
+    asyncio.run(_serve(rcon, args.players, args.churn))
 
 # Example clients using mcrcon (pip install mcrcon):
 # PYTHON
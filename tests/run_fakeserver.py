@@ -1,26 +1,15 @@
 #!/usr/bin/env python
 #
 
-import asyncio
-import time
-
-from fake_server import FakeServer, SysExitThread
+from fake_server import FakeServer, run_in_thread
 from MCRconLib import MCRcon
 
 
 if __name__ == '__main__':
 
     print('instantiating FakeServer as "fake_server"...')
-    # TODO: This code is shared with conftest, can I make it a function?
     fake_server = FakeServer(password='password')
-
-    def _run():
-        asyncio.run(fake_server.listen())
-
-    t = SysExitThread(target=_run)
-    t.start()
-    while not fake_server.server.is_serving():
-        time.sleep(0.25)
+    run_in_thread(fake_server)
 
     print('fake_server loaded...')
 
@@ -1,7 +1,11 @@
 """Test fake minecraft server commands behave as expected"""
 
+import time
+
 import pytest
 
+from MCRconLib import MCRcon
+
 default = pytest.mark.skipif("config.getoption('realserver')")
 
 
@@ -53,3 +57,54 @@ def test_kick_player_with_reason(fake_server, mcr):
     fake_server.player_join('fluffy_ruffy')
     response = mcr.command('/kick fluffy_ruffy Bad dog, don\'t do that!')
     assert response == 'Kicked fluffy_ruffy: Bad dog, don\'t do that!'
+
+def test_latency_delays_replies(fake_server, mcr):
+    """Replies are sent after the configured latency"""
+    fake_server.latency = 0.1
+    start = time.perf_counter()
+    response = mcr.command('/list')
+    assert time.perf_counter() - start >= 0.1
+    assert response.startswith('There are 0 ')
+
+def test_split_replies_arrive_whole(fake_server):
+    """Replies written in small chunks are reassembled by the client"""
+    fake_server.split = 3
+    fake_server.split_delay = 0.001
+    fake_server.player_join('india')
+    with MCRcon('localhost', 'password', framing=True) as mcr:
+        assert mcr.command('kick india') == \
+            'Kicked india: Kicked by an operator'
+
+@default
+def test_populate_thousands(fake_server):
+    """A large server's list reply spans several packets"""
+    fake_server.populate(5000)
+    with MCRcon('localhost', 'password', framing=True) as mcr:
+        response = mcr.command('list')
+        assert len(response) > 4096
+        assert response.startswith('There are 5000 ')
+        assert response.endswith('player_4998, player_4999')
+        assert mcr.command('kick player_2500').startswith('Kicked')
+        assert 'player_2500,' not in mcr.command('list')
+
+@default
+def test_help_is_multi_packet(fake_server):
+    """help replies with more than one packet, like a real server"""
+    with MCRcon('localhost', 'password', framing=True) as mcr:
+        response = mcr.command('help')
+    assert len(response) > 4096
+    assert response.endswith('/xp (add|set|query) <targets> [<amount>] '
+                             '[points|levels]')
+
+@default
+def test_churn(fake_server, mcr):
+    """Players keep joining and leaving around the target count"""
+    fake_server.populate(20)
+    fake_server.start_churn(500, players=20)
+    seen = set()
+    for _ in range(0, 10):
+        time.sleep(0.02)
+        seen.add(mcr.command('list'))
+    fake_server.stop_churn()
+    assert len(seen) > 1
+    assert 'churn_' in ''.join(seen)
@@ -0,0 +1,77 @@
+"""Test the RCON connection pool"""
+
+import threading
+
+import pytest
+from flask import url_for
+
+from MCRconLib import MCRcon, MCRconPool, PoolTimeout
+
+
+def make_pool(size=2, timeout=5):
+    return MCRconPool(lambda: MCRcon('localhost', 'password'),
+                      size=size, timeout=timeout)
+
+def test_pool_reuses_connections(fake_server):
+    """Sequential checkouts reuse a single connection"""
+    pool = make_pool()
+    for _ in range(0, 3):
+        with pool.connection() as mcr:
+            mcr.command('list')
+    stats = pool.stats()
+    assert stats['created'] == 1
+    assert stats['checkouts'] == 3
+    assert stats['idle'] == 1
+    pool.close()
+
+def test_pool_acquire_timeout(fake_server):
+    """Acquiring from an exhausted pool times out"""
+    pool = make_pool(size=1, timeout=0.1)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.stats()['timeouts'] == 1
+    pool.close()
+
+def test_pool_discards_dead_connection(fake_server):
+    """A connection closed while idle is replaced on checkout"""
+    pool = make_pool()
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.socket.close()
+    with pool.connection() as mcr:
+        assert mcr is not conn
+        assert mcr.command('list').startswith('There are 0')
+    assert pool.stats()['discarded'] == 1
+    pool.close()
+
+def test_pool_parallel_commands(fake_server):
+    """Threads sharing a pool each get their own reply"""
+    pool = make_pool(size=4)
+    players = [f'player{i}' for i in range(0, 8)]
+    for player in players:
+        fake_server.player_join(player)
+    results = {}
+
+    def _kick(player):
+        with pool.connection() as mcr:
+            results[player] = mcr.command(f'kick {player}')
+
+    threads = [threading.Thread(target=_kick, args=(p,)) for p in players]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for player in players:
+        assert results[player] == f'Kicked {player}: Kicked by an operator'
+    assert pool.stats()['open'] <= 4
+    pool.close()
+
+def test_cmd_pool_stats(fake_server, client):
+    """The pool endpoint reports usage"""
+    client.get(url_for('cmd.list'))
+    rv = client.get(url_for('cmd.pool'))
+    assert rv.status_code == 200
+    assert rv.json['size'] == 4
+    assert rv.json['in_use'] == 0
@@ -0,0 +1,77 @@
+"""Test the RCON layer reconnects, retries and fails fast"""
+
+import time
+
+import pytest
+from flask import url_for
+
+from app.rcon import CircuitBreaker, MCR, RCONUnavailable
+from conftest import drop_after
+from MCRconLib import MCRcon, MCRconPool
+
+
+def make_mcr(port=25575, threshold=3):
+    pool = MCRconPool(lambda: MCRcon('localhost', 'password', port=port))
+    return MCR(pool, breaker=CircuitBreaker(threshold, reset_timeout=60),
+               retries=2, backoff=0.01)
+
+def test_reconnect_after_server_drops_connection(fake_server):
+    """A command succeeds after the server closes the pooled connection"""
+    mcr = make_mcr()
+    assert mcr.command('list').startswith('There are 0')
+    # close every connection from the server side
+    for connection in list(fake_server.connections):
+        fake_server._loop.call_soon_threadsafe(connection.close_connection)
+    time.sleep(0.1)
+    assert mcr.command('list').startswith('There are 0')
+    mcr.close()
+
+def test_sent_command_not_retried(fake_server):
+    """A kick whose reply never came isn't sent a second time"""
+    mcr = make_mcr()
+    calls = drop_after(fake_server, 'kick')
+    with pytest.raises(RCONUnavailable, match='may or may not have run'):
+        mcr.command('kick alice')
+    assert len(calls) == 1
+    mcr.close()
+
+def test_read_only_command_retried(fake_server):
+    """A list whose reply never came is safe to send again"""
+    mcr = make_mcr()
+    calls = drop_after(fake_server, 'list')
+    with pytest.raises(RCONUnavailable):
+        mcr.command('list')
+    assert len(calls) == 3
+    mcr.close()
+
+def test_breaker_opens_and_fails_fast():
+    """Once the breaker opens, commands don't touch the network"""
+    # nothing listens on this port
+    mcr = make_mcr(port=25599, threshold=2)
+    for _ in range(0, 2):
+        with pytest.raises(RCONUnavailable):
+            mcr.command('list')
+    assert mcr.stats()['breaker'] == CircuitBreaker.OPEN
+    checkouts = mcr.stats()['checkouts']
+    with pytest.raises(RCONUnavailable):
+        mcr.command('list')
+    assert mcr.stats()['checkouts'] == checkouts
+    mcr.close()
+
+def test_breaker_half_open_recovers():
+    """A successful probe after reset_timeout closes the breaker"""
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+    breaker.failure()
+    assert breaker.allow() is False
+    time.sleep(0.05)
+    assert breaker.allow() is True
+    # only one probe at a time
+    assert breaker.allow() is False
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_cmd_list_returns_503_when_server_down(client):
+    """Requests get a 503 rather than an exception when RCON is down"""
+    rv = client.get(url_for('cmd.list'))
+    assert rv.status_code == 503
+    assert rv.json['result'] == 'failure'
@@ -0,0 +1,75 @@
+"""Test sentinel framing of RCON replies"""
+
+import socket
+
+import pytest
+
+from MCRconLib import MCRcon, MCRconException
+
+
+@pytest.fixture(scope='function')
+def framed_mcr(fake_server):
+    """Yield a connection to the fake server that frames its replies"""
+    with MCRcon('localhost', 'password', framing=True) as mcr:
+        yield mcr
+
+def test_framed_list(framed_mcr):
+    """A framed command returns the reply and nothing else"""
+    response = framed_mcr.command('list')
+    assert response == 'There are 0 of a max of 5 players online: '
+
+def test_framed_replies_stay_in_sync(fake_server, framed_mcr):
+    """Leftover sentinel packets never leak into later replies"""
+    for i in range(0, 20):
+        fake_server.player_join(f'player{i}')
+        assert framed_mcr.command(f'kick player{i}') == \
+            f'Kicked player{i}: Kicked by an operator'
+        assert framed_mcr.command('list').startswith('There are 0 ')
+
+def test_framed_multi_packet_reply(fake_server, framed_mcr):
+    """A reply split over several packets is read completely"""
+    players = [f'{i:0>32}' for i in range(0, 400)]
+    for player in players:
+        fake_server.player_join(player)
+    response = framed_mcr.command('list')
+    assert len(response) > 4096
+    assert response.endswith(', '.join(players))
+
+def test_framed_bad_password(fake_server):
+    """Authentication failures are still reported"""
+    with pytest.raises(MCRconException):
+        with MCRcon('localhost', 'wrong', framing=True):
+            pass
+
+def test_buffered_reader_small_buffer():
+    """Packets split across, or bigger than, the receive buffer parse"""
+    client, server = socket.socketpair()
+    mcr = MCRcon('localhost', 'password')
+    mcr.RECV_BUFFER_SIZE = 16
+    mcr.socket = client
+    mcr._reset_buffer()
+    payloads = ['a' * 5, 'é' * 100, '', 'b' * 3]
+    data = b''.join(
+        MCRcon._pack(i, MCRcon.SERVERDATA_RESPONSE_VALUE, p)
+        for i, p in enumerate(payloads))
+    for i in range(0, len(data), 7):
+        server.sendall(data[i:i + 7])
+    for i, payload in enumerate(payloads):
+        in_id, in_type, in_data = mcr._read_packet()
+        assert in_id == i
+        assert in_data.decode('utf8') == payload
+    assert not mcr._buffered()
+    assert mcr.bytes_received == len(data)
+    client.close()
+    server.close()
+
+def test_buffered_reader_closed_peer():
+    """A connection closed mid-packet raises rather than hanging"""
+    client, server = socket.socketpair()
+    mcr = MCRcon('localhost', 'password')
+    mcr.socket = client
+    server.sendall(MCRcon._pack(1, 0, 'hello')[:9])
+    server.close()
+    with pytest.raises(MCRconException):
+        mcr._read_packet()
+    client.close()
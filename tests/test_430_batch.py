@@ -0,0 +1,101 @@
+"""Test batched and pipelined RCON commands"""
+
+import json
+
+import pytest
+from flask import url_for
+
+from app import MCRconLib as app_mcrconlib
+from app.rcon import BatchIncomplete, MCR
+from conftest import drop_after
+from MCRconLib import BatchError, MCRcon
+
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_command_many_in_order(fake_server, pipelining):
+    """Replies come back in the order the commands were given"""
+    for name in ['alpha', 'bravo']:
+        fake_server.player_join(name)
+    commands = ['list', 'kick alpha', 'kick nobody', 'list']
+    with MCRcon('localhost', 'password', framing=True,
+                pipelining=pipelining) as mcr:
+        responses = mcr.command_many(commands)
+        # the connection stays in sync afterwards
+        assert mcr.command('kick bravo') == \
+            'Kicked bravo: Kicked by an operator'
+    assert responses[0].startswith('There are 2 ')
+    assert responses[1] == 'Kicked alpha: Kicked by an operator'
+    assert responses[2] == 'No player was found'
+    assert responses[3].startswith('There are 1 ')
+
+def test_command_many_pipelined_multi_packet(fake_server):
+    """Multi-packet replies are demultiplexed by ID"""
+    players = [f'{i:0>32}' for i in range(0, 200)]
+    for player in players:
+        fake_server.player_join(player)
+    with MCRcon('localhost', 'password', pipelining=True) as mcr:
+        responses = mcr.command_many(['list', 'kick nobody', 'list'])
+    assert responses[0] == responses[2]
+    assert responses[0].endswith(', '.join(players))
+    assert responses[1] == 'No player was found'
+
+# pipelined, a reply is only known to be complete once the next one starts
+@pytest.mark.parametrize('pipelining, answered', [(True, 1), (False, 2)])
+def test_command_many_partial(fake_server, pipelining, answered):
+    """A batch cut off partway has the replies received before it"""
+    drop_after(fake_server, 'kick')
+    with MCRcon('localhost', 'password', pipelining=pipelining) as mcr:
+        with pytest.raises(BatchError) as e:
+            mcr.command_many(['list', 'seed', 'kick nobody', 'list'])
+    assert len(e.value.replies) == answered
+    assert e.value.replies[0].startswith('There are 0 ')
+
+def test_batch_not_retried(fake_server):
+    """A batch that was sent isn't sent again, even after a failure"""
+    # the app's own MCRconLib, whose BatchError the MCR recognizes
+    pool = app_mcrconlib.MCRconPool(
+        lambda: app_mcrconlib.MCRcon('localhost', 'password'))
+    mcr = MCR(pool, backoff=0.01)
+    calls = drop_after(fake_server, 'kick')
+    with pytest.raises(BatchIncomplete) as e:
+        mcr.command_many(['list', 'kick alice', 'list'])
+    assert len(calls) == 1
+    assert len(e.value.responses) == 1
+    assert '1 of 3 answered' in str(e.value)
+    mcr.close()
+
+def test_cmd_batch(fake_server, client):
+    """The batch endpoint returns one response per command"""
+    fake_server.player_join('charlie')
+    rv = client.post(
+        url_for('cmd.batch'),
+        content_type='application/json',
+        data=json.dumps({'commands': ['list', 'kick charlie', 'list']})
+    )
+    assert rv.status_code == 200
+    responses = rv.json['responses']
+    assert len(responses) == 3
+    assert responses[0].startswith('There are 1 ')
+    assert responses[1] == 'Kicked charlie: Kicked by an operator'
+    assert responses[2].startswith('There are 0 ')
+
+def test_cmd_batch_partial(fake_server, client):
+    """A batch cut off partway is a 503 with the replies received"""
+    drop_after(fake_server, 'kick')
+    rv = client.post(
+        url_for('cmd.batch'),
+        content_type='application/json',
+        data=json.dumps({'commands': ['list', 'kick charlie', 'list']})
+    )
+    assert rv.status_code == 503
+    assert rv.json['result'] == 'failure'
+    assert len(rv.json['responses']) == 1
+
+def test_cmd_batch_rejects_bad_input(client):
+    """The batch endpoint wants a list of command strings"""
+    rv = client.post(
+        url_for('cmd.batch'),
+        content_type='application/json',
+        data=json.dumps({'commands': 'list'})
+    )
+    assert rv.status_code == 400
@@ -0,0 +1,104 @@
+"""Test the asyncio RCON client and async views"""
+
+import asyncio
+import json
+
+from flask import url_for
+from mcrcon import MCRconException
+import pytest
+
+from MCRconLib import AsyncMCRcon, AsyncMCRconPool
+
+
+def test_async_concurrent_commands(fake_server):
+    """Concurrent commands on one connection each get their own reply"""
+    players = [f'player{i}' for i in range(0, 50)]
+    for player in players:
+        fake_server.player_join(player)
+
+    async def _run():
+        async with AsyncMCRcon('localhost', 'password') as mcr:
+            return await asyncio.gather(
+                *[mcr.command(f'kick {player}') for player in players])
+
+    responses = asyncio.run(_run())
+    for player, response in zip(players, responses):
+        assert response == f'Kicked {player}: Kicked by an operator'
+
+def test_async_multi_packet_reply(fake_server):
+    """A reply split over several packets is read completely"""
+    players = [f'{i:0>32}' for i in range(0, 200)]
+    for player in players:
+        fake_server.player_join(player)
+
+    async def _run():
+        async with AsyncMCRcon('localhost', 'password') as mcr:
+            return await asyncio.gather(
+                mcr.command('list'), mcr.command('kick nobody'))
+
+    listing, kick = asyncio.run(_run())
+    assert listing.endswith(', '.join(players))
+    assert kick == 'No player was found'
+
+def test_async_pool_spreads_commands(fake_server):
+    """The pool opens connections up to its size under load"""
+    pool = AsyncMCRconPool(
+        lambda: AsyncMCRcon('localhost', 'password'), size=3)
+
+    async def _run():
+        responses = await asyncio.gather(
+            *[pool.command('list') for _ in range(0, 30)])
+        stats = pool.stats()
+        await pool.close()
+        return responses, stats
+
+    responses, stats = asyncio.run(_run())
+    assert all(r.startswith('There are 0 ') for r in responses)
+    assert 1 < stats['open'] <= 3
+
+def test_cmd_aio_list_and_kick(fake_server, app, client):
+    """The async views behave like their blocking counterparts"""
+    for player in ['delta', 'echo']:
+        fake_server.player_join(player)
+    rv = client.get(url_for('cmd.list_async'))
+    assert rv.json['count'] == 2
+    assert sorted(rv.json['players']) == ['delta', 'echo']
+    rv = client.post(
+        url_for('cmd.kick_async'),
+        content_type='application/json',
+        data=json.dumps({'player': 'delta', 'reason': 'bye'})
+    )
+    assert rv.json['result'] == 'success'
+    assert rv.json['response'] == 'Kicked delta: bye'
+    app.amcr.close()
+
+def test_async_timeout_drops_connection(fake_server):
+    """A command that times out closes its connection and leaves the pool"""
+    pool = AsyncMCRconPool(
+        lambda: AsyncMCRcon('localhost', 'password', timeout=0.2))
+
+    async def _run():
+        await pool.command('list')
+        fake_server.latency = 0.5
+        with pytest.raises(MCRconException):
+            await pool.command('list')
+        timed_out = pool.stats()
+        fake_server.latency = 0
+        response = await pool.command('list')
+        await pool.close()
+        return timed_out, response
+
+    timed_out, response = asyncio.run(_run())
+    assert timed_out['open'] == 0
+    assert response.startswith('There are 0 ')
+
+def test_async_failed_login_closes_connection(fake_server):
+    """A connection whose login fails isn't left open"""
+    mcr = AsyncMCRcon('localhost', 'wrong password')
+
+    async def _run():
+        with pytest.raises(MCRconException, match='Login failed'):
+            await mcr.connect()
+
+    asyncio.run(_run())
+    assert mcr._writer is None
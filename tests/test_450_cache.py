@@ -0,0 +1,78 @@
+"""Test caching and coalescing of read-only commands"""
+
+import json
+import threading
+import time
+
+from flask import url_for
+
+from app.rcon import CommandCache
+from conftest import count_calls
+
+
+def test_cmd_list_is_cached(fake_server, client):
+    """Repeated list requests within the TTL hit the server once"""
+    calls = count_calls(fake_server, 'list')
+    for _ in range(0, 5):
+        rv = client.get(url_for('cmd.list'))
+        assert rv.status_code == 200
+    assert len(calls) == 1
+
+def test_kick_invalidates_list(fake_server, client):
+    """A kick makes the next list request go to the server"""
+    calls = count_calls(fake_server, 'list')
+    fake_server.player_join('foxtrot')
+    assert client.get(url_for('cmd.list')).json['count'] == 1
+    client.post(
+        url_for('cmd.kick'),
+        content_type='application/json',
+        data=json.dumps({'player': 'foxtrot'})
+    )
+    assert client.get(url_for('cmd.list')).json['count'] == 0
+    assert len(calls) == 2
+
+def test_async_kick_invalidates_list(fake_server, app, client):
+    """A kick through the async view also makes list go to the server"""
+    fake_server.player_join('golf')
+    assert client.get(url_for('cmd.list')).json['count'] == 1
+    client.post(
+        url_for('cmd.kick_async'),
+        content_type='application/json',
+        data=json.dumps({'player': 'golf'})
+    )
+    assert client.get(url_for('cmd.list')).json['count'] == 0
+    app.amcr.close()
+
+def test_concurrent_misses_coalesce(fake_server, app):
+    """Concurrent identical commands share one RCON call"""
+    calls = count_calls(fake_server, 'list', delay=0.2)
+    responses = []
+    threads = [
+        threading.Thread(target=lambda: responses.append(
+            app.mcr.command('list')))
+        for _ in range(0, 8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len(responses) == 8
+    assert len(set(responses)) == 1
+    assert app.mcr.stats()['cache']['coalesced'] == 7
+
+def test_cache_entries_expire():
+    """Replies are fetched again once their TTL has passed"""
+    cache = CommandCache(ttl={'list': 0.05})
+    replies = iter(['first', 'second'])
+    assert cache.get('list', lambda: next(replies)) == 'first'
+    assert cache.get('list', lambda: next(replies)) == 'first'
+    time.sleep(0.05)
+    assert cache.get('list', lambda: next(replies)) == 'second'
+
+def test_uncached_commands_pass_through():
+    """Commands without a TTL are never cached"""
+    cache = CommandCache(ttl={'list': 60})
+    replies = iter(['first', 'second'])
+    assert cache.get('seed', lambda: next(replies)) == 'first'
+    assert cache.get('seed', lambda: next(replies)) == 'second'
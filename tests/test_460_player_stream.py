@@ -0,0 +1,55 @@
+"""Test the player list event stream"""
+
+import time
+
+from flask import url_for
+
+from app.stream import Broadcaster
+from conftest import count_calls, read_event
+
+
+def test_list_stream_sends_snapshot_then_diffs(fake_server, app, client):
+    """Clients get the full list first, then only joins and leaves"""
+    app.players.interval = 0.05
+    app.mcr._cache.ttl = {}
+    fake_server.player_join('golf')
+    rv = client.get(url_for('cmd.list_stream'), buffered=False)
+    assert rv.mimetype == 'text/event-stream'
+    events = iter(rv.response)
+
+    event, data = read_event(events)
+    assert event == 'players'
+    assert data['players'] == ['golf']
+
+    fake_server.player_join('hotel')
+    event, data = read_event(events)
+    assert event == 'diff'
+    assert data == {'joined': ['hotel'], 'left': [], 'count': 2, 'max': 5}
+
+    fake_server.player_leave('golf')
+    event, data = read_event(events)
+    assert data['left'] == ['golf']
+    assert data['count'] == 1
+    rv.close()
+    app.players.close()
+
+def test_one_poll_for_many_subscribers(fake_server, app):
+    """The number of list commands doesn't grow with subscribers"""
+    calls = count_calls(fake_server, 'list')
+    app.players.interval = 0.1
+    app.mcr._cache.ttl = {}
+    subscribers = [app.players.subscribe() for _ in range(0, 20)]
+    time.sleep(0.45)
+    app.players.close()
+    assert 1 <= len(calls) <= 6
+    for subscriber in subscribers:
+        assert subscriber.get_nowait()[0] == 'players'
+
+def test_broadcaster_resyncs_slow_subscribers():
+    """A full queue is replaced by a resync item"""
+    broadcaster = Broadcaster(maxsize=2, resync=lambda: 'snapshot')
+    subscriber = broadcaster.subscribe()
+    for i in range(0, 3):
+        broadcaster.publish(i)
+    assert subscriber.get_nowait() == 'snapshot'
+    assert subscriber.empty()
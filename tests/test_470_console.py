@@ -0,0 +1,111 @@
+"""Test following the server log for console output"""
+
+import os
+
+from flask import url_for
+
+from app.logtail import LogTail
+from conftest import read_event
+
+
+def write(path, text, mode='a'):
+    with open(path, mode) as f:
+        f.write(text)
+
+def drain(subscriber):
+    items = []
+    while not subscriber.empty():
+        items.append(subscriber.get_nowait())
+    return items
+
+# The tests poll() by hand; a long interval keeps the thread out of the way
+
+def test_tail_history_and_new_lines(tmp_path):
+    """Late joiners get recent lines, then new ones as they're written"""
+    log = tmp_path / 'latest.log'
+    write(log, ''.join(f'line {i}\n' for i in range(0, 10)))
+    tail = LogTail(str(log), history=3, interval=60)
+    subscriber = tail.subscribe()
+    assert subscriber.get_nowait() == ('history', ['line 7', 'line 8', 'line 9'])
+
+    write(log, 'line 10\nline 1')
+    tail.poll()
+    write(log, '1\n')
+    tail.poll()
+    assert drain(subscriber) == [('line', 'line 10'), ('line', 'line 11')]
+    tail.close()
+
+def test_tail_seeds_without_reading_whole_file(tmp_path):
+    """Only the end of a large log is read to seed the history"""
+    log = tmp_path / 'latest.log'
+    write(log, ''.join(f'line {i}\n' for i in range(0, 100000)))
+    tail = LogTail(str(log), history=5, seed_bytes=1024, interval=60)
+    subscriber = tail.subscribe()
+    assert subscriber.get_nowait()[1][-1] == 'line 99999'
+    assert tail._file.tell() == os.path.getsize(log)
+    tail.close()
+
+def test_tail_follows_rotation(tmp_path):
+    """Lines written before and after rotation are all delivered"""
+    log = tmp_path / 'latest.log'
+    write(log, 'old\n')
+    tail = LogTail(str(log), interval=60)
+    subscriber = tail.subscribe()
+    drain(subscriber)
+    write(log, 'last old line\n')
+    os.rename(log, tmp_path / 'rotated.log')
+    write(log, 'first new line\n', 'w')
+    tail.poll()
+    assert drain(subscriber) == [
+        ('line', 'last old line'), ('line', 'first new line')]
+    tail.close()
+
+def test_tail_follows_truncation(tmp_path):
+    """A truncated log is read again from the start"""
+    log = tmp_path / 'latest.log'
+    write(log, 'a long line before truncation\n')
+    tail = LogTail(str(log), interval=60)
+    subscriber = tail.subscribe()
+    drain(subscriber)
+    write(log, 'short\n', 'w')
+    tail.poll()
+    assert drain(subscriber) == [('line', 'short')]
+    tail.close()
+
+def test_console_stream(tmp_path, app, client):
+    """The console endpoint streams history, then new lines"""
+    log = tmp_path / 'latest.log'
+    write(log, 'Done (1.234s)! For help, type "help"\n')
+    app.console = LogTail(str(log), interval=0.01)
+    rv = client.get(url_for('console.stream'), buffered=False)
+    events = iter(rv.response)
+    assert read_event(events) == (
+        'history', ['Done (1.234s)! For help, type "help"'])
+    write(log, 'bob joined the game\n')
+    assert read_event(events) == ('line', 'bob joined the game')
+    rv.close()
+    app.console.close()
+
+def test_console_stream_not_configured(client):
+    """Without a log file the stream endpoint is a 404"""
+    rv = client.get(url_for('console.stream'))
+    assert rv.status_code == 404
+
+def test_tail_stops_without_subscribers(tmp_path):
+    """The last unsubscribe stops the thread; the next subscribe restarts it"""
+    log = tmp_path / 'latest.log'
+    write(log, 'first\n')
+    tail = LogTail(str(log), interval=0.01)
+    subscriber = tail.subscribe()
+    thread = tail._thread
+    tail.unsubscribe(subscriber)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert tail._thread is None and tail._file is None
+
+    write(log, 'second\n')
+    subscriber = tail.subscribe()
+    assert subscriber.get_nowait() == ('history', ['first', 'second'])
+    write(log, 'third\n')
+    assert subscriber.get(timeout=5) == ('line', 'third')
+    tail.close()
@@ -0,0 +1,66 @@
+"""Test parsing command replies into result objects"""
+
+import re
+
+import pytest
+from flask import url_for
+
+from app import parsers
+from app.parsers import (
+    ListResult, ParseError, Result, get_parser, parse, parser)
+
+
+def test_parse_list():
+    """All list fields are extracted in one go"""
+    result = parse('list', 'There are 2 of a max of 20 players online: a, b')
+    assert isinstance(result, ListResult)
+    assert result.as_dict() == {'count': 2, 'max': 20, 'players': ['a', 'b']}
+
+def test_parse_list_empty_server():
+    """Nobody online is an empty list, not a list with an empty name"""
+    for response in ['There are 0 of a max of 5 players online: ',
+                     'There are 0 of a max of 5 players online:',
+                     'There are 0/5 players online:']:
+        assert parse('/list', response).players == []
+
+def test_parse_kick():
+    """Kick replies parse whether or not a player was kicked"""
+    result = parse('kick bob', 'Kicked bob: Bad dog: no biscuit')
+    assert result.kicked is True
+    assert result.player == 'bob'
+    assert result.reason == 'Bad dog: no biscuit'
+    result = parse('kick bob', 'No player was found')
+    assert result.kicked is False
+    assert result.response == 'No player was found'
+
+def test_parse_unexpected_reply():
+    """A reply that doesn't match raises ParseError"""
+    with pytest.raises(ParseError):
+        parse('list', 'Unknown or incomplete command')
+    with pytest.raises(ParseError):
+        get_parser('not-a-command')
+
+def test_register_parser(monkeypatch):
+    """New commands can register their own parser"""
+    # registered for this test only
+    monkeypatch.setattr(parsers, '_parsers', dict(parsers._parsers))
+
+    @parser('seed')
+    class SeedResult(Result):
+        __slots__ = ('seed',)
+        pattern = re.compile(r'Seed: \[(?P<seed>-?\d+)\]')
+
+        @staticmethod
+        def convert(groups):
+            return {'seed': int(groups['seed'])}
+
+    assert parse('seed', 'Seed: [-42]').seed == -42
+    with pytest.raises(AttributeError):
+        parse('seed', 'Seed: [1]').other = 1
+
+def test_cmd_list_no_players(fake_server, app, client):
+    """The list view returns no players for an empty server"""
+    rv = client.get(url_for('cmd.list'))
+    epoch = app.server_players['default'].epoch
+    assert rv.json == {'count': 0, 'max': 5, 'players': [],
+                       'version': f'{epoch}-1'}
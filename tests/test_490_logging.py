@@ -0,0 +1,74 @@
+"""Test logging to file through a queue"""
+
+import logging
+from logging.handlers import QueueHandler
+
+from app import start_file_logging
+
+
+def test_file_logging_through_queue(tmp_path):
+    """Records reach the file once the listener is stopped (flushed)"""
+    log_file = tmp_path / 'application.log'
+    listener = start_file_logging(
+        str(log_file), logging.Formatter('%(message)s'), buffer_records=100)
+    logging.getLogger('test').warning('queued message')
+    logging.getLogger('werkzeug').warning('filtered message')
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    assert log_file.read_text() == 'queued message\n'
+
+def test_file_logging_rotates(tmp_path):
+    """The log file is rotated once it reaches max_bytes"""
+    log_file = tmp_path / 'application.log'
+    listener = start_file_logging(
+        str(log_file), logging.Formatter('%(message)s'),
+        max_bytes=100, backup_count=2)
+    for i in range(0, 20):
+        logging.getLogger('test').warning(f'message number {i:>4}')
+    listener.stop()
+    assert (tmp_path / 'application.log.1').exists()
+    assert (tmp_path / 'application.log.2').exists()
+    assert not (tmp_path / 'application.log.3').exists()
+    assert log_file.stat().st_size <= 100
+
+def test_full_queue_drops_records(tmp_path):
+    """Logging never blocks when the queue is full"""
+    listener = start_file_logging(
+        str(tmp_path / 'application.log'), logging.Formatter('%(message)s'),
+        queue_size=1)
+    listener.stop()
+    for i in range(0, 5):
+        logging.getLogger('test').warning(f'message {i}')
+    handler = [h for h in logging.getLogger().handlers
+               if isinstance(h, QueueHandler)]
+    assert len(handler) == 1
+    assert handler[0].dropped == 4
+
+def test_app_logs_through_queue(app):
+    """The app's root logger only holds a queue handler, not a file"""
+    handlers = logging.getLogger().handlers
+    assert any(isinstance(h, QueueHandler) for h in handlers)
+    assert not any(isinstance(h, logging.FileHandler) for h in handlers)
+    assert app._log_listener._thread is not None
+
+def test_replaced_listener_is_stopped(tmp_path):
+    """Logging to a new file stops the old listener and closes its file"""
+    first = start_file_logging(
+        str(tmp_path / 'first.log'), logging.Formatter('%(message)s'),
+        buffer_records=100)
+    logging.getLogger('test_490').warning('to the first file')
+    second = start_file_logging(
+        str(tmp_path / 'second.log'), logging.Formatter('%(message)s'))
+    assert first._thread is None
+    assert first.handlers[0].target is None
+    assert (tmp_path / 'first.log').read_text() == 'to the first file\n'
+    logging.getLogger('test_490').warning('to the second file')
+    second.stop()
+    second.stop()
+    assert second.handlers[0].stream is None
+    assert (tmp_path / 'second.log').read_text() == 'to the second file\n'
+
+def test_module_loggers_stay_enabled(app):
+    """Configuring logging doesn't silence modules imported before it"""
+    assert not logging.getLogger('app.rcon').disabled
@@ -0,0 +1,83 @@
+"""Test the counters, histograms and the /metrics endpoint"""
+
+import threading
+
+from flask import url_for
+
+from app.metrics import (Counter, HTTP_REQUEST_SECONDS, RCON_COMMAND_SECONDS,
+                         RCON_RECEIVED_BYTES, RCON_SENT_BYTES, Registry)
+
+
+def test_counter_sums_threads():
+    """Increments from many threads, finished or not, all add up"""
+    counter = Counter('things_total', 'Things', ['kind'])
+
+    def _count():
+        for _ in range(0, 1000):
+            counter.inc(kind='a')
+
+    threads = [threading.Thread(target=_count) for _ in range(0, 8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counter.inc(5, kind='b')
+    assert counter.value(kind='a') == 8000
+    assert counter.value(kind='b') == 5
+    # finished threads were folded into one total
+    assert len(counter._cells._threads) == 1
+
+def test_histogram_exposition():
+    """Buckets are cumulative and end with +Inf, _sum and _count"""
+    registry = Registry()
+    histogram = registry.histogram(
+        'wait_seconds', 'Waits', ['command'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, command='list')
+    text = registry.exposition()
+    assert '# TYPE wait_seconds histogram' in text
+    assert 'wait_seconds_bucket{command="list",le="0.1"} 1' in text
+    assert 'wait_seconds_bucket{command="list",le="1.0"} 2' in text
+    assert 'wait_seconds_bucket{command="list",le="+Inf"} 3' in text
+    assert 'wait_seconds_sum{command="list"} 5.55' in text
+    assert 'wait_seconds_count{command="list"} 3' in text
+
+def test_label_values_are_escaped():
+    """Quotes, backslashes and newlines in label values are escaped"""
+    registry = Registry()
+    registry.counter('odd_total', 'Odd', ['name']).inc(name='a"b\\c\nd')
+    assert 'odd_total{name="a\\"b\\\\c\\nd"} 1' in registry.exposition()
+
+def test_metrics_endpoint(fake_server, client):
+    """RCON and request metrics are served as text"""
+    commands = RCON_COMMAND_SECONDS.count(command='list')
+    requests = HTTP_REQUEST_SECONDS.count(
+        endpoint='cmd.list', method='GET', status='200')
+    sent, received = RCON_SENT_BYTES.value(), RCON_RECEIVED_BYTES.value()
+
+    assert client.get(url_for('cmd.list')).status_code == 200
+
+    assert RCON_COMMAND_SECONDS.count(command='list') == commands + 1
+    assert HTTP_REQUEST_SECONDS.count(
+        endpoint='cmd.list', method='GET', status='200') == requests + 1
+    assert RCON_SENT_BYTES.value() > sent
+    assert RCON_RECEIVED_BYTES.value() > received
+
+    rv = client.get('/metrics')
+    assert rv.status_code == 200
+    assert rv.mimetype == 'text/plain'
+    text = rv.get_data(as_text=True)
+    assert '# TYPE rcon_command_seconds histogram' in text
+    assert 'rcon_command_seconds_count{command="list"}' in text
+    assert 'rcon_pool_waiting{server="default"} 0' in text
+    assert '# TYPE rcon_pool_created_total counter' in text
+    assert 'rcon_cache_misses_total{server="default"}' in text
+    assert 'rcon_circuit_open{server="default"} 0' in text
+
+def test_pool_counts_reconnects(fake_server, app):
+    """A connection opened to replace a dropped one is a reconnect"""
+    app.mcr.command('list')
+    with app.mcr._pool.connection() as mcr:
+        mcr.disconnect()
+    app.mcr.command('seed')
+    assert app.mcr.stats()['reconnects'] == 1
@@ -0,0 +1,149 @@
+"""Test named servers and fleet-wide commands"""
+
+import json
+import time
+
+import pytest
+from flask import url_for
+
+from app import create_app
+from fake_server import FakeServer, run_in_thread
+from MCRconLib import MCRcon
+
+PORTS = {'lobby': 25576, 'survival': 25577}
+
+
+@pytest.fixture(scope='function')
+def fleet_servers(fake_server):
+    """Yield two more fake servers, each 0.2s slow to reply"""
+    servers = {
+        name: FakeServer(bind=('localhost', port), password='password',
+                         latency=0.2)
+        for name, port in PORTS.items()
+    }
+    for server in servers.values():
+        run_in_thread(server)
+    yield servers
+    for name, server in servers.items():
+        server.latency = 0
+        if server.server.is_serving():
+            with MCRcon('localhost', 'password', port=PORTS[name]) as mcr:
+                mcr.command('stop')
+
+@pytest.fixture(scope='function')
+def fleet_client(fleet_servers, tmp_path):
+    """Yield a test client for an app managing the fake servers"""
+    servers = {
+        name: {'RCON_SERVER': 'localhost', 'RCON_PORT': port,
+               'RCON_PASSWD': 'password'}
+        for name, port in PORTS.items()
+    }
+    (tmp_path / 'fleet-testing.conf').write_text(
+        "RCON_SERVER='localhost'\n"
+        "RCON_PASSWD='password'\n"
+        f'RCON_SERVERS={servers!r}\n'
+        'RCON_FLEET_TIMEOUT=2\n'
+        'RCON_CACHE_TTL={}\n'
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}\n"
+    )
+    app = create_app('fleet', instance_path=str(tmp_path))
+    with app.test_request_context():
+        with app.test_client() as client:
+            yield client
+    app.fleet.close()
+
+def test_server_routes(fleet_servers, fleet_client):
+    """/srv/<name>/cmd/ runs commands on the named server"""
+    fleet_servers['lobby'].player_join('alice')
+    rv = fleet_client.get(url_for('srv_cmd.list', server='lobby'))
+    assert rv.status_code == 200
+    assert rv.json['players'] == ['alice']
+    rv = fleet_client.get(url_for('srv_cmd.list', server='survival'))
+    assert rv.json['players'] == []
+    # without a server name, the RCON_SERVER server
+    assert fleet_client.get(url_for('cmd.list')).json['count'] == 0
+
+def test_server_kick(fleet_servers, fleet_client):
+    """A kick on a named server reaches only that server"""
+    fleet_servers['survival'].player_join('bob')
+    rv = fleet_client.post(
+        url_for('srv_cmd.kick', server='survival'),
+        content_type='application/json',
+        data=json.dumps({'player': 'bob'})
+    )
+    assert rv.json['result'] == 'success'
+    assert fleet_servers['survival']._players == {}
+
+def test_unknown_server(fleet_client):
+    """A server not in RCON_SERVERS is a 404"""
+    rv = fleet_client.get('/srv/nowhere/cmd/list/')
+    assert rv.status_code == 404
+    assert rv.json['result'] == 'failure'
+
+def test_fleet_list_runs_concurrently(fake_server, fleet_servers,
+                                      fleet_client):
+    """A fleet list takes as long as the slowest server, not the sum"""
+    fake_server.player_join('carol')
+    fleet_servers['lobby'].player_join('dave')
+    fleet_client.get(url_for('fleet.list'))  # connections are opened
+    # a framed command takes two round trips: 1.2s each, so one server after
+    #   the other would run past RCON_FLEET_TIMEOUT=2
+    for server in fleet_servers.values():
+        server.latency = 0.6
+    start = time.perf_counter()
+    rv = fleet_client.get(url_for('fleet.list'))
+    assert time.perf_counter() - start < 5
+    assert rv.json['result'] == 'success'
+    assert rv.json['count'] == 2
+    assert rv.json['servers']['default']['players'] == ['carol']
+    assert rv.json['servers']['lobby']['players'] == ['dave']
+    assert rv.json['servers']['survival']['players'] == []
+
+def test_fleet_timeout(fleet_servers, fleet_client):
+    """A server slower than the timeout is reported, the rest still are"""
+    fleet_client.get(url_for('fleet.list'))  # connections are opened
+    fleet_servers['survival'].latency = 1
+    rv = fleet_client.post(
+        url_for('fleet.command'),
+        content_type='application/json',
+        data=json.dumps({'command': 'seed', 'timeout': 0.8})
+    )
+    assert rv.json['result'] == 'partial'
+    servers = rv.json['servers']
+    assert servers['survival'] == {'result': 'timeout', 'response': None}
+    assert servers['lobby']['result'] == 'success'
+    assert servers['default']['response'].startswith('Seed: ')
+
+def test_fleet_command_selects_servers(fleet_client):
+    """servers picks which servers run the command; unknown ones are a 400"""
+    rv = fleet_client.post(
+        url_for('fleet.command'),
+        content_type='application/json',
+        data=json.dumps({'command': 'seed', 'servers': ['lobby']})
+    )
+    assert list(rv.json['servers']) == ['lobby']
+    rv = fleet_client.post(
+        url_for('fleet.command'),
+        content_type='application/json',
+        data=json.dumps({'command': 'seed', 'servers': ['nowhere']})
+    )
+    assert rv.status_code == 400
+
+def test_fleet_command_rejects_bad_timeouts(fleet_client):
+    """timeout has to be a positive number of seconds"""
+    for timeout in (True, 0, -1, float('nan'), '2'):
+        rv = fleet_client.post(
+            url_for('fleet.command'),
+            content_type='application/json',
+            data=json.dumps({'command': 'seed', 'timeout': timeout})
+        )
+        assert rv.status_code == 400
+
+def test_metrics_per_server(fleet_servers, fleet_client):
+    """Pool metrics are labeled with each server's name"""
+    fleet_client.get(url_for('fleet.list'))
+    text = fleet_client.get('/metrics').get_data(as_text=True)
+    for name in ('default', 'lobby', 'survival'):
+        assert f'rcon_pool_in_use{{server="{name}"}} 0' in text
+        assert f'rcon_pool_reconnects_total{{server="{name}"}} 0' in text
+        assert f'rcon_circuit_open{{server="{name}"}} 0' in text
@@ -0,0 +1,76 @@
+"""Test that creating the app doesn't wait on the server"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from app.MCRconLib import MCRconPool
+
+
+def make_app(tmp_path, port=25575, **settings):
+    """Create an app in a temporary instance folder"""
+    lines = [
+        "RCON_SERVER='localhost'",
+        "RCON_PASSWD='password'",
+        f'RCON_PORT={port}',
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}",
+    ] + [f'{k}={v!r}' for k, v in settings.items()]
+    (tmp_path / 'startup-testing.conf').write_text('\n'.join(lines) + '\n')
+    return create_app('startup', instance_path=str(tmp_path))
+
+@pytest.fixture(scope='function')
+def silent_server():
+    """Yield the port of a server that accepts connections but never replies"""
+    sock = socket.socket()
+    sock.bind(('localhost', 0))
+    sock.listen()
+    yield sock.getsockname()[1]
+    sock.close()
+
+def test_startup_doesnt_connect(fake_server, tmp_path, monkeypatch):
+    """create_app returns without waiting for the connection to warm"""
+    called, release = threading.Event(), threading.Event()
+    warmed_on = []
+
+    def _warm(pool):
+        warmed_on.append(threading.current_thread())
+        called.set()
+        release.wait(5)
+
+    monkeypatch.setattr(MCRconPool, 'warm', _warm)
+    app = make_app(tmp_path)
+    assert app.mcr.stats()['created'] == 0
+    release.set()
+    assert called.wait(5)
+    assert threading.main_thread() not in warmed_on
+    app.fleet.close()
+
+def test_unresponsive_server_doesnt_block_startup(silent_server, tmp_path):
+    """Startup doesn't wait for RCON_TIMEOUT on a server that's hung"""
+    app = make_app(tmp_path, port=silent_server, RCON_TIMEOUT=5)
+    # still waiting for the server to answer the login
+    warming = [t for t in threading.enumerate()
+               if t.name == 'rcon-warm-default']
+    assert warming and warming[0].is_alive()
+    assert app.mcr.stats()['created'] == 0
+    app.fleet.close()
+
+def test_connection_warmed_in_background(fake_server, tmp_path):
+    """A connection is opened after startup, before the first request"""
+    app = make_app(tmp_path)
+    deadline = time.monotonic() + 2
+    while app.mcr.stats()['idle'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert app.mcr.stats()['created'] == 1
+    app.fleet.close()
+
+def test_lazy_connection(fake_server, tmp_path):
+    """Without warming, the first command opens the connection"""
+    app = make_app(tmp_path, RCON_WARM=False)
+    assert app.mcr.stats()['created'] == 0
+    assert app.mcr.command('list').startswith('There are 0 ')
+    assert app.mcr.stats()['created'] == 1
+    app.fleet.close()
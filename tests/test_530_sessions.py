@@ -0,0 +1,130 @@
+"""Test recording player sessions and querying their history"""
+
+import time
+
+import pytest
+from flask import url_for
+
+from app import create_app
+from app.sessions import SessionStore
+
+HOUR = 3600
+T0 = 1700000000 - 1700000000 % HOUR  # on the hour
+
+
+@pytest.fixture(scope='function')
+def store(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), flush_interval=0)
+    yield store
+    store.close()
+
+def test_join_and_leave(store):
+    """Sessions overlapping the range are returned, newest first"""
+    store.join('default', 'alice', at=T0)
+    store.join('default', 'bob', at=T0 + 10)
+    store.leave('default', 'alice', at=T0 + 60)
+    store.join('default', 'alice', at=T0 + 120)
+    assert store.flush(timeout=5)
+    sessions = store.sessions('alice', since=T0, until=T0 + 200)
+    assert [(s['joined'], s['left']) for s in sessions] == [
+        (T0 + 120, None), (T0, T0 + 60)]
+    # only sessions overlapping the range
+    assert len(store.sessions('alice', since=T0 + 61, until=T0 + 100)) == 0
+
+def test_repeated_join_keeps_one_open_session(store):
+    """Joining again while online does not open a second session"""
+    store.join('default', 'alice', at=T0)
+    store.join('default', 'alice', at=T0 + 5)
+    store.flush(timeout=5)
+    assert len(store.sessions('alice', since=T0, until=T0 + 10)) == 1
+
+def test_online_reconciles(store):
+    """A full player list closes sessions of players no longer online"""
+    store.join('default', 'alice', at=T0)
+    store.join('survival', 'alice', at=T0)
+    store.join('default', 'bob', at=T0)
+    store.online('default', ['bob', 'carol'], at=T0 + 30)
+    store.flush(timeout=5)
+    alice = store.sessions('alice', since=T0, until=T0 + 60)
+    assert {(s['server'], s['left']) for s in alice} == {
+        ('default', T0 + 30), ('survival', None)}
+    assert store.sessions('bob', since=T0, until=T0 + 60)[0]['joined'] == T0
+    assert store.sessions('carol', since=T0, until=T0 + 60)[0]['joined'] == \
+        T0 + 30
+
+def test_peak_by_hour(store):
+    """Peaks count players already online and can be per server"""
+    store.join('default', 'alice', at=T0 - 100)  # already online
+    store.join('default', 'bob', at=T0 + 10)
+    store.join('default', 'carol', at=T0 + 20)
+    store.leave('default', 'bob', at=T0 + 30)
+    store.leave('default', 'carol', at=T0 + 30)
+    store.join('default', 'dave', at=T0 + HOUR + 10)
+    store.leave('default', 'alice', at=T0 + 2 * HOUR + 10)
+    store.join('survival', 'erin', at=T0 + 10)
+    store.flush(timeout=5)
+    assert store.peak_by_hour(
+        since=T0, until=T0 + 3 * HOUR, server='default') == [
+        {'hour': T0, 'peak': 3},
+        {'hour': T0 + HOUR, 'peak': 2},
+        {'hour': T0 + 2 * HOUR, 'peak': 2},
+    ]
+    assert store.peak_by_hour(since=T0, until=T0 + HOUR)[0]['peak'] == 4
+
+def test_queries_use_indexes(store):
+    """Session and peak queries are answered from indexes"""
+    db = store._connect()
+    plan = ' '.join(row[3] for row in db.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM sessions '
+        'WHERE player = ? AND joined <= ? AND (left IS NULL OR left >= ?)',
+        ('alice', T0, T0)))
+    assert 'USING INDEX sessions_player' in plan
+    plan = ' '.join(row[3] for row in db.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM sessions '
+        'WHERE left >= ? AND left < ?', (T0, T0)))
+    assert 'USING INDEX sessions_left' in plan
+    db.close()
+
+def test_history_endpoints(fake_server, tmp_path):
+    """Joins seen by the player list poll show up in /history/"""
+    (tmp_path / 'history-testing.conf').write_text(
+        "RCON_SERVER='localhost'\n"
+        "RCON_PASSWD='password'\n"
+        "RCON_CACHE_TTL={}\n"
+        "PLAYER_POLL_INTERVAL=0.05\n"
+        "SESSION_DB='sessions.db'\n"
+        "SESSION_FLUSH_INTERVAL=0.05\n"
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}\n"
+    )
+    app = create_app('history', instance_path=str(tmp_path))
+    fake_server.player_join('alice')
+    deadline = time.monotonic() + 5
+    with app.test_request_context(), app.test_client() as client:
+        while time.monotonic() < deadline:
+            rv = client.get(url_for('history.player', player='alice'))
+            if rv.json['sessions']:
+                break
+            time.sleep(0.05)
+        assert rv.json['sessions'][0]['server'] == 'default'
+        assert rv.json['sessions'][0]['left'] is None
+        rv = client.get(url_for('history.peak', hours=1))
+        assert rv.json['hours'][-1]['peak'] == 1
+        # a huge range is cut down to SESSION_PEAK_MAX_HOURS
+        rv = client.get(url_for('history.peak', hours=1e9))
+        assert len(rv.json['hours']) <= 24 * 31 + 1
+        for hours in (0, -1, 'nan'):
+            rv = client.get(url_for('history.peak', hours=hours))
+            assert rv.status_code == 400
+            rv = client.get(url_for('history.player', player='alice',
+                                    days=hours))
+            assert rv.status_code == 400
+        assert b'Sessions in the last 30 days' in client.get(
+            url_for('main.player', player='alice')).data
+    app.sessions.close()
+    for players in app.server_players.values():
+        players.close()
+
+def test_history_not_configured(client):
+    """Without SESSION_DB the history endpoints are a 404"""
+    rv = client.get(url_for('history.peak'))
+    assert rv.status_code == 404
@@ -0,0 +1,113 @@
+"""Test running one player action on many players at once"""
+
+import json
+import time
+
+import pytest
+from flask import url_for
+
+from app.bulk import bulk_commands, BulkError
+
+
+def post_bulk(client, **body):
+    return client.post(
+        url_for('cmd.bulk'),
+        content_type='application/json',
+        data=json.dumps(body)
+    )
+
+def test_bulk_commands():
+    """One command per distinct player, with arguments cleaned up"""
+    commands = bulk_commands('kick', ['alice', 'bob', 'alice'],
+                             reason='too\nmuch  lag')
+    assert commands == [('alice', 'kick alice too much lag'),
+                        ('bob', 'kick bob too much lag')]
+    assert bulk_commands('tp', ['alice'], destination='~ 64 -12.5') == [
+        ('alice', 'tp alice ~ 64 -12.5')]
+
+@pytest.mark.parametrize('action, targets, destination', [
+    ('explode', ['alice'], None),
+    ('kick', 'alice', None),
+    ('kick', [], None),
+    ('kick', ['@a'], None),
+    ('kick', ['alice bob'], None),
+    ('tp', ['alice'], None),
+    ('tp', ['alice'], '1 2 3; stop'),
+])
+def test_bulk_commands_invalid(action, targets, destination):
+    """Unknown actions, selectors and unsafe arguments are refused"""
+    with pytest.raises(BulkError):
+        bulk_commands(action, targets, destination=destination)
+
+def test_bulk_kick(fake_server, client):
+    """Every player is kicked and each reply reported in order"""
+    fake_server.populate(10)
+    players = [f'player_{i}' for i in range(10)]
+    rv = post_bulk(client, action='kick', targets=players, reason='restart')
+    assert rv.status_code == 200
+    assert rv.json['result'] == 'success'
+    assert rv.json['succeeded'] == 10
+    assert [r['target'] for r in rv.json['results']] == players
+    assert rv.json['results'][0]['response'] == f'Kicked {players[0]}: restart'
+    assert fake_server._players == {}
+
+def test_bulk_partial(fake_server, client):
+    """Some commands failing makes the result partial"""
+    fake_server.player_join('alice')
+    rv = post_bulk(client, action='kick', targets=['alice', 'nobody'])
+    assert rv.json['result'] == 'partial'
+    assert rv.json['failed'] == 1
+    assert rv.json['results'][1]['result'] == 'failure'
+
+def test_bulk_actions(fake_server, client):
+    """Each allowed action runs its own command"""
+    fake_server.player_join('alice')
+    fake_server.player_join('bob')
+    rv = post_bulk(client, action='whitelist add', targets=['alice', 'bob'])
+    assert rv.json['result'] == 'success'
+    assert fake_server._whitelist == {'alice', 'bob'}
+    rv = post_bulk(client, action='whitelist remove', targets=['bob', 'bob2'])
+    assert rv.json['result'] == 'partial'
+    rv = post_bulk(client, action='op', targets=['alice'])
+    assert rv.json['results'][0]['response'] == \
+        'Made alice a server operator'
+    rv = post_bulk(client, action='tp', targets=['alice'], destination='bob')
+    assert rv.json['results'][0]['response'] == 'Teleported alice to bob'
+    rv = post_bulk(client, action='ban', targets=['alice'])
+    assert rv.json['result'] == 'success'
+    assert 'alice' not in fake_server._players
+
+def test_bulk_invalid_request(client):
+    """A request that bulk_commands refuses is a 400"""
+    rv = post_bulk(client, action='kick', targets=['@a'])
+    assert rv.status_code == 400
+    assert rv.json['result'] == 'failure'
+
+def test_bulk_too_many_targets(client):
+    """More than BULK_MAX_TARGETS players is a 400"""
+    targets = [f'p{i}' for i in range(client.application.config[
+        'BULK_MAX_TARGETS'] + 1)]
+    assert post_bulk(client, action='op', targets=targets).status_code == 400
+
+def test_bulk_stream(fake_server, client):
+    """With stream, each result is a line as it finishes, then a summary"""
+    fake_server.populate(3)
+    players = ['player_0', 'player_1', 'player_2']
+    rv = post_bulk(client, action='kick', targets=players, stream=True)
+    assert rv.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in rv.data.decode().splitlines()]
+    assert sorted(line['target'] for line in lines[:-1]) == sorted(players)
+    assert lines[-1] == {'result': 'success', 'succeeded': 3, 'failed': 0}
+
+def test_bulk_runs_concurrently(fake_server, client):
+    """Eight slow commands four at a time take about two round trips"""
+    players = [f'player_{i}' for i in range(8)]
+    post_bulk(client, action='op', targets=players)  # connections are opened
+    fake_server.latency = 0.1
+    start = time.perf_counter()
+    rv = post_bulk(client, action='whitelist add', targets=players)
+    elapsed = time.perf_counter() - start
+    fake_server.latency = 0
+    assert rv.json['succeeded'] == 8
+    # a framed command takes two round trips: 0.2s each, 1.6s one by one
+    assert elapsed < 0.8
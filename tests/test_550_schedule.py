@@ -0,0 +1,162 @@
+"""Test running RCON commands on a schedule"""
+
+from datetime import datetime
+import time
+
+import pytest
+from flask import url_for
+
+from app import create_app
+from app.scheduler import CronSchedule, Job
+
+
+def make_app(tmp_path, schedule, **settings):
+    """Create an app running the given SCHEDULE"""
+    lines = [
+        "RCON_SERVER='localhost'",
+        "RCON_PASSWD='password'",
+        f'SCHEDULE={schedule!r}',
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}",
+    ] + [f'{k}={v!r}' for k, v in settings.items()]
+    (tmp_path / 'schedule-testing.conf').write_text('\n'.join(lines) + '\n')
+    return create_app('schedule', instance_path=str(tmp_path))
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def at(*args):
+    return datetime(*args).timestamp()
+
+def test_cron_next_after():
+    """The next matching minute, across days, weekdays and leap years"""
+    every_15 = CronSchedule('*/15 * * * *')
+    assert every_15.next_after(at(2024, 5, 1, 10, 7, 30)) == \
+        at(2024, 5, 1, 10, 15)
+    assert every_15.next_after(at(2024, 5, 1, 23, 50)) == at(2024, 5, 2)
+    # 2024-05-06 is a Monday
+    mondays = CronSchedule('30 3 * * 1')
+    assert mondays.next_after(at(2024, 5, 1)) == at(2024, 5, 6, 3, 30)
+    # either day field matches when both are set
+    either = CronSchedule('0 0 10 * 0')
+    assert either.next_after(at(2024, 5, 1)) == at(2024, 5, 5)
+    assert either.next_after(at(2024, 5, 8)) == at(2024, 5, 10)
+    assert CronSchedule('0 12 29 2 *').next_after(at(2024, 3, 1)) == \
+        at(2028, 2, 29, 12)
+    # a stepped day field still counts as unrestricted: both have to match
+    odd_mondays = CronSchedule('0 0 */2 * 1')
+    assert odd_mondays.next_after(at(2024, 5, 1)) == at(2024, 5, 13)
+
+@pytest.mark.parametrize('expression', [
+    '* * * *', '60 * * * *', '* * 0 * *', '*/0 * * * *', 'a * * * *',
+])
+def test_cron_invalid(expression):
+    """Malformed or out of range cron fields raise ValueError"""
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+@pytest.mark.parametrize('settings', [
+    {'command': 'save-all'},
+    {'command': 'save-all', 'every': 60, 'cron': '* * * * *'},
+    {'commands': [], 'every': 60},
+    {'command': 'save-all', 'every': 60, 'when': 'now'},
+    {'command': 'save-all', 'every': '300'},
+    {'command': 'save-all', 'every': 60, 'jitter': '10'},
+    {'command': 'save-all', 'every': 60, 'jitter': -1},
+    {'command': 'save-all', 'every': True},
+    {'command': 'save-all', 'cron': 5},
+    {'commands': 'save-all', 'every': 60},
+    {'command': 7, 'every': 60},
+    'save-all',
+])
+def test_job_invalid(settings):
+    """A SCHEDULE entry that is missing or mistyping fields is refused"""
+    with pytest.raises(ValueError):
+        Job.from_config('save', settings, 'default')
+
+def test_jitter_doesnt_drift(monkeypatch):
+    """Runs stay `every` apart however much jitter and lateness delay one"""
+    monkeypatch.setattr('random.uniform', lambda low, high: high)
+    job = Job('save', ['save-all'], 'default', every=10, jitter=4)
+    assert job.schedule(0) == 14
+    # fired late, at 15
+    assert job.schedule(15) == 24
+    assert job.schedule(24.5) == 34
+    assert job.due == 30
+    # a long stall skips the runs it missed
+    assert job.schedule(71) == 84
+
+def test_interval_job(fake_server, tmp_path):
+    """An interval job keeps running and its runs show in /schedule/"""
+    app = make_app(tmp_path, {'seed': {'command': 'seed', 'every': 0.05}})
+    assert wait_for(lambda: app.scheduler['seed'].runs >= 3)
+    with app.test_request_context(), app.test_client() as client:
+        rv = client.get(url_for('schedule.root'))
+        assert rv.json['seed']['every'] == 0.05
+        rv = client.get(url_for('schedule.job', job='seed'))
+        run = rv.json['history'][0]
+        assert run['result'] == 'success'
+        assert run['responses'][0].startswith('Seed: ')
+        assert run['duration'] >= 0
+        assert client.get('/schedule/nothing/').status_code == 404
+    app.scheduler.close()
+    app.fleet.close()
+
+def test_job_runs_dont_overlap(fake_server, tmp_path):
+    """A job still running when it's due again is skipped"""
+    fake_server.latency = 0.1
+    app = make_app(tmp_path, {
+        'slow': {'commands': ['seed', 'seed'], 'every': 0.05}})
+    assert wait_for(lambda: app.scheduler['slow'].runs >= 1)
+    assert app.scheduler['slow'].skipped >= 1
+    history = app.scheduler.history('slow')
+    assert {'success', 'skipped'} == {run['result'] for run in history}
+    app.scheduler.close()
+    app.fleet.close()
+    fake_server.latency = 0
+
+def test_jobs_dont_use_request_connections(fake_server, tmp_path):
+    """Requests aren't kept waiting for the pool while a job runs"""
+    app = make_app(tmp_path, {'slow': {'command': 'seed', 'every': 60}},
+                   RCON_POOL_SIZE=1, RCON_POOL_TIMEOUT=0.1, RCON_WARM=False)
+    app.mcr.command('seed')  # connections are opened
+    app.job_mcrs['default'].command('seed')
+    fake_server.latency = 0.2
+    with app.test_request_context(), app.test_client() as client:
+        rv = client.post(url_for('schedule.run', job='slow'))
+        assert rv.status_code == 202
+        assert client.post(
+            url_for('schedule.run', job='slow')).status_code == 409
+        assert app.scheduler['slow'].running
+        rv = client.get(url_for('cmd.list'))
+        assert rv.status_code == 200
+    fake_server.latency = 0
+    assert wait_for(lambda: app.scheduler['slow'].runs == 1)
+    app.scheduler.close()
+    app.fleet.close()
+
+def test_job_invalidates_cached_replies(fake_server, tmp_path):
+    """A job's kick drops the cached player list like a request's would"""
+    fake_server.player_join('alice')
+    app = make_app(tmp_path, {'kick': {'command': 'kick alice', 'every': 60}},
+                   RCON_CACHE_TTL={'list': 60})
+    assert app.mcr.command('list').endswith('alice')
+    with app.test_request_context(), app.test_client() as client:
+        client.post(url_for('schedule.run', job='kick'))
+    assert wait_for(lambda: app.scheduler['kick'].runs == 1)
+    assert app.mcr.command('list').startswith('There are 0 ')
+    app.scheduler.close()
+    app.fleet.close()
+
+@pytest.mark.parametrize('settings', [
+    {'command': 'save-all'},
+    {'command': 'save-all', 'every': '300'},
+])
+def test_bad_schedule_is_a_startup_failure(fake_server, tmp_path, settings):
+    """A bad SCHEDULE entry is reported like any other config problem"""
+    app = make_app(tmp_path, {'save': settings})
+    rv = app.test_client().get('/')
+    assert b'Bad SCHEDULE setting' in rv.data
+    app.fleet.close()
@@ -0,0 +1,90 @@
+"""Test pacing RCON commands with the dispatcher"""
+
+import threading
+import time
+
+import pytest
+from flask import url_for
+
+from app import create_app
+from app.rcon import Dispatcher, RCONUnavailable
+
+LANES = {'high': ['kick'], 'low': ['list']}
+
+
+def test_unlimited():
+    """With no rate commands are never held back"""
+    dispatcher = Dispatcher(rate=0, burst=1)
+    start = time.perf_counter()
+    for _ in range(0, 100):
+        dispatcher.acquire(['list'])
+    assert time.perf_counter() - start < 0.05
+
+def test_burst_then_rate():
+    """A full bucket lets a burst through, then commands go at the rate"""
+    dispatcher = Dispatcher(rate=20, burst=2)
+    start = time.perf_counter()
+    for _ in range(0, 6):
+        dispatcher.acquire(['say hi'])
+    # two at once, then four at 20 a second
+    assert 0.18 <= time.perf_counter() - start < 0.4
+
+def test_lanes():
+    """Queued commands go out most urgent lane first"""
+    dispatcher = Dispatcher(rate=10, burst=1, lanes=LANES)
+    dispatcher.acquire(['seed'])  # the bucket is empty
+    order = []
+
+    def _acquire(name):
+        dispatcher.acquire([name])
+        order.append(name)
+
+    threads = []
+    for name in ('list', 'seed', 'kick'):
+        threads.append(threading.Thread(target=_acquire, args=(name,)))
+        threads[-1].start()
+        time.sleep(0.01)
+    assert dispatcher.stats()['queued'] == {'high': 1, 'normal': 1, 'low': 1}
+    for thread in threads:
+        thread.join()
+    assert order == ['kick', 'seed', 'list']
+
+def test_lane_names():
+    """Commands not in a lane are normal; unknown lane names are refused"""
+    dispatcher = Dispatcher(lanes=LANES)
+    assert dispatcher.lane('list') == 'low'
+    assert dispatcher.lane('weather') == 'normal'
+    with pytest.raises(ValueError):
+        Dispatcher(lanes={'urgent': ['kick']})
+
+def test_queue_timeout():
+    """A command queued longer than the timeout gives up"""
+    dispatcher = Dispatcher(rate=1, burst=1, timeout=0.1)
+    dispatcher.acquire(['list'])
+    with pytest.raises(RCONUnavailable):
+        dispatcher.acquire(['list'])
+    stats = dispatcher.stats()
+    assert stats['timeouts'] == 1
+    assert sum(stats['queued'].values()) == 0
+
+def test_app_paces_commands(fake_server, tmp_path):
+    """RCON_RATE paces the app's commands and the queue shows in /metrics"""
+    (tmp_path / 'paced-testing.conf').write_text(
+        "RCON_SERVER='localhost'\n"
+        "RCON_PASSWD='password'\n"
+        'RCON_RATE=20\n'
+        'RCON_BURST=1\n'
+        'RCON_CACHE_TTL={}\n'
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}\n"
+    )
+    app = create_app('paced', instance_path=str(tmp_path))
+    with app.test_request_context(), app.test_client() as client:
+        start = time.perf_counter()
+        for _ in range(0, 5):
+            assert client.get(url_for('cmd.list')).status_code == 200
+        assert time.perf_counter() - start >= 0.18
+        assert client.get(url_for('cmd.pool')).json['queue']['rate'] == 20
+        text = client.get(url_for('metrics')).data.decode()
+        assert 'rcon_queue_depth{server="default",lane="high"} 0' in text
+        assert 'rcon_queue_seconds_count{lane="low"}' in text
+    app.fleet.close()
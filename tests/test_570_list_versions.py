@@ -0,0 +1,90 @@
+"""Test conditional GETs and deltas on the player list"""
+
+from flask import url_for
+
+from app.players import PlayerWatcher
+
+
+def state(*players, max=5):
+    return {'count': len(players), 'max': max, 'players': list(players)}
+
+def test_versions_and_changes():
+    """Versions count changes; the joins and leaves since one add up"""
+    watcher = PlayerWatcher(None, None)
+
+    def v(n):
+        return f'{watcher.epoch}-{n}'
+
+    version, etag = watcher.update(state('alice'))
+    assert version == v(1)
+    assert etag.startswith(f'{watcher.epoch}-')
+    assert watcher.update(state('alice')) == (v(1), etag)
+    watcher.update(state('alice', 'bob'))
+    watcher.update(state('bob', 'carol'))
+    version, etag2 = watcher.update(state('bob', 'carol', 'alice'))
+    assert version == v(4) and etag2 != etag
+    assert watcher.changes_since(v(1)) == (v(4), ['bob', 'carol'], [])
+    assert watcher.changes_since(v(2)) == (v(4), ['carol'], [])
+    assert watcher.changes_since(v(0)) == (
+        v(4), ['bob', 'carol', 'alice'], [])
+    assert watcher.changes_since(v(4)) == (v(4), [], [])
+    assert watcher.changes_since(v(5)) is None
+    assert watcher.changes_since('4') is None
+    assert watcher.changes_since(f'{watcher.epoch}-x') is None
+
+def test_versions_from_another_process():
+    """Another worker's versions and ETags are never taken for ours"""
+    watcher, other = PlayerWatcher(None, None), PlayerWatcher(None, None)
+    version, etag = watcher.update(state('alice'))
+    other_version, other_etag = other.update(state('alice'))
+    assert watcher.epoch != other.epoch
+    assert etag != other_etag
+    assert watcher.changes_since(other_version) is None
+
+def test_old_versions_are_forgotten():
+    """Only the last `history` changes can be asked for"""
+    watcher = PlayerWatcher(None, None, history=2)
+    for i in range(0, 4):
+        watcher.update(state(*[f'p{n}' for n in range(0, i + 1)]))
+    assert watcher.changes_since(f'{watcher.epoch}-2') == (
+        f'{watcher.epoch}-4', ['p2', 'p3'], [])
+    assert watcher.changes_since(f'{watcher.epoch}-1') is None
+
+def test_list_etag(fake_server, app, client):
+    """A list request with the current ETag is a 304"""
+    app.mcr._cache.ttl = {}
+    rv = client.get(url_for('cmd.list'))
+    etag = rv.headers['ETag']
+    assert rv.headers['Cache-Control'] == 'no-cache'
+    rv = client.get(url_for('cmd.list'), headers={'If-None-Match': etag})
+    assert rv.status_code == 304
+    assert rv.data == b''
+    fake_server.player_join('india')
+    rv = client.get(url_for('cmd.list'), headers={'If-None-Match': etag})
+    assert rv.status_code == 200
+    assert rv.headers['ETag'] != etag
+    assert rv.json['players'] == ['india']
+    # another worker's ETag for the same players
+    rv = client.get(url_for('cmd.list'),
+                    headers={'If-None-Match': f'"0-{etag.split("-", 1)[1]}'})
+    assert rv.status_code == 200
+
+def test_list_since(fake_server, app, client):
+    """?since= returns the joins and leaves after that version"""
+    app.mcr._cache.ttl = {}
+    fake_server.player_join('juliet')
+    version = client.get(url_for('cmd.list')).json['version']
+    epoch, n = version.rsplit('-', 1)
+    fake_server.player_join('kilo')
+    fake_server.player_leave('juliet')
+    rv = client.get(url_for('cmd.list', since=version))
+    assert rv.json == {'version': f'{epoch}-{int(n) + 1}', 'since': version,
+                       'count': 1, 'max': 5, 'joined': ['kilo'],
+                       'left': ['juliet']}
+    rv = client.get(url_for('cmd.list', since=rv.json['version']))
+    assert rv.json['joined'] == rv.json['left'] == []
+    # a version this process doesn't know gets the full list
+    rv = client.get(url_for('cmd.list', since=f'{epoch}-{int(n) + 100}'))
+    assert rv.json['players'] == ['kilo']
+    rv = client.get(url_for('cmd.list', since=f'other-{n}'))
+    assert rv.json['players'] == ['kilo']
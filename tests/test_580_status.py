@@ -0,0 +1,123 @@
+"""Test the Server List Ping client and /status/"""
+
+from flask import url_for
+import pytest
+
+from app import create_app
+from app.rcon import CircuitBreaker
+from app.slp import _parse, _text, SLPError, status, StatusClient
+
+
+def make_client(tmp_path, **settings):
+    lines = [
+        "RCON_SERVER='localhost'",
+        "RCON_PASSWD='password'",
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}",
+    ] + [f'{k}={v!r}' for k, v in settings.items()]
+    (tmp_path / 'status-testing.conf').write_text('\n'.join(lines) + '\n')
+    app = create_app('status', instance_path=str(tmp_path))
+    return app, app.test_client()
+
+def test_status(fake_server):
+    """The status has counts, a sample of names, the MOTD and the version"""
+    fake_server.populate(2)
+    fake_server.motd = '§aA §lfake§r server'
+    result = status('localhost')
+    assert result['online'] == 2
+    assert result['max'] == 5
+    assert result['players'] == ['player_0', 'player_1']
+    assert result['motd'] == 'A fake server'
+    assert result['version'] == '1.19.2'
+    assert result['latency'] >= 0
+
+def test_status_sample_is_limited(fake_server):
+    """Only a dozen names are sampled however many are online"""
+    fake_server._max_players = 100
+    fake_server.populate(20)
+    result = status('localhost')
+    assert result['online'] == 20
+    assert len(result['players']) == 12
+
+def test_chat_component_text():
+    """Components and their extras flatten to text without formatting"""
+    assert _text({'text': 'A ', 'extra': [{'text': '§cred'}, ' server']}) \
+        == 'A red server'
+    assert _text(['a', {'text': 'b'}]) == 'ab'
+
+@pytest.mark.parametrize('result', [
+    {},
+    {'players': [], 'version': {}},
+    {'players': {'online': '2', 'max': 20}},
+    {'players': {'online': True, 'max': 20}},
+    {'players': {'online': 2, 'max': 20, 'sample': 'alice'}},
+    {'players': {'online': 2, 'max': 20, 'sample': [{'name': 7}]}},
+    {'players': {'online': 2, 'max': 20}, 'version': '1.19.2'},
+    {'players': {'online': 2, 'max': 20}, 'version': {'name': 1.19}},
+])
+def test_status_of_the_wrong_shape(result):
+    """A status with missing or mistyped fields raises SLPError"""
+    with pytest.raises(SLPError):
+        _parse(result)
+
+def test_no_server():
+    """Nothing listening on the port raises SLPError"""
+    with pytest.raises(SLPError):
+        status('localhost', 25564, timeout=0.5)
+
+def test_status_client_breaker_logs_slp(caplog):
+    """An SLP outage is logged as one, not as an RCON outage"""
+    client = StatusClient('localhost', 25564, timeout=0.5,
+                          breaker=CircuitBreaker(threshold=1, name='SLP'))
+    with pytest.raises(SLPError):
+        client.status()
+    assert 'SLP circuit opened after 1 failure(s)' in caplog.text
+
+def test_status_client_caches(fake_server):
+    """StatusClient reuses a status for ttl seconds"""
+    client = StatusClient('localhost', ttl=10)
+    assert client.status()['online'] == 0
+    fake_server.player_join('lima')
+    assert client.status()['online'] == 0
+    assert StatusClient('localhost', ttl=0).status()['online'] == 1
+
+def test_status_view(fake_server, client):
+    """/status/ answers from the Server List Ping when it can"""
+    fake_server.player_join('mike')
+    rv = client.get(url_for('status.root'))
+    assert rv.status_code == 200
+    assert rv.json['source'] == 'slp'
+    assert rv.json['players'] == ['mike']
+    assert rv.json['motd'] == 'A Minecraft Server'
+    assert client.get(
+        url_for('status.root', server='nowhere')).status_code == 404
+
+def test_status_falls_back_to_rcon(fake_server, tmp_path):
+    """Without a ping the player list comes from RCON, without a MOTD"""
+    fake_server.player_join('november')
+    app, client = make_client(tmp_path, SLP_PORT=25564, SLP_TIMEOUT=0.5)
+    rv = client.get('/status/')
+    assert rv.json['source'] == 'rcon'
+    assert rv.json['players'] == ['november']
+    assert rv.json['motd'] is None
+    app.fleet.close()
+
+def test_bad_status_falls_back_to_rcon(fake_server, monkeypatch,
+                                       tmp_path):
+    """A status that isn't shaped like one is treated as no status"""
+    fake_server.player_join('oscar')
+    monkeypatch.setattr(fake_server, 'slp_status',
+                        lambda: {'players': {'online': 'many'}})
+    app, client = make_client(tmp_path)
+    rv = client.get('/status/')
+    assert rv.json['source'] == 'rcon'
+    assert rv.json['players'] == ['oscar']
+    app.fleet.close()
+
+def test_status_without_fallback(fake_server, tmp_path):
+    """With STATUS_FALLBACK off a failed ping is a 503"""
+    app, client = make_client(tmp_path, SLP_PORT=25564, SLP_TIMEOUT=0.5,
+                              STATUS_FALLBACK=False)
+    rv = client.get('/status/')
+    assert rv.status_code == 503
+    assert rv.json['result'] == 'failure'
+    app.fleet.close()
@@ -0,0 +1,213 @@
+"""Test reading NBT player data and stats from the world folder"""
+
+import gzip
+import json
+import os
+import struct
+
+import pytest
+
+from app import create_app
+from app import nbt
+from app.nbt import NBTError
+from app.playerdata import FileCache, offline_uuid, PlayerData
+
+UUID = '0f6b7a2c-3b1e-4a5d-9c1f-2e8d7b6a5c4f'
+
+
+def payload(tag_type, value):
+    """Encode an NBT payload; compounds are lists of (type, name, value)"""
+    if tag_type in nbt._NUMBERS:
+        return nbt._NUMBERS[tag_type].pack(value)
+    if tag_type == nbt.STRING:
+        data = value.encode()
+        return struct.pack('>H', len(data)) + data
+    if tag_type == nbt.LIST:
+        item_type, items = value
+        return (bytes([item_type]) + struct.pack('>i', len(items))
+                + b''.join(payload(item_type, item) for item in items))
+    if tag_type == nbt.COMPOUND:
+        return b''.join(named(*tag) for tag in value) + bytes([nbt.END])
+    if tag_type == nbt.BYTE_ARRAY:
+        return struct.pack('>i', len(value)) + value
+    code = 'i' if tag_type == nbt.INT_ARRAY else 'q'
+    return struct.pack(f'>i{len(value)}{code}', len(value), *value)
+
+def named(tag_type, name, value):
+    return bytes([tag_type]) + payload(nbt.STRING, name) + payload(
+        tag_type, value)
+
+def write_nbt(path, tags, truncate=0):
+    data = named(nbt.COMPOUND, '', tags)
+    with gzip.open(path, 'wb') as f:
+        f.write(data[:len(data) - truncate])
+
+def item(slot, id, count):
+    return [(nbt.BYTE, 'Slot', slot), (nbt.STRING, 'id', id),
+            (nbt.BYTE, 'Count', count)]
+
+PLAYER = [
+    (nbt.INT, 'DataVersion', 3120),
+    (nbt.LIST, 'Pos', (nbt.DOUBLE, [12.5, 64.0, -3.25])),
+    (nbt.STRING, 'Dimension', 'minecraft:overworld'),
+    (nbt.FLOAT, 'Health', 18.5),
+    (nbt.INT, 'foodLevel', 20),
+    (nbt.INT, 'XpLevel', 7),
+    (nbt.INT, 'playerGameType', 0),
+    (nbt.LONG_ARRAY, 'Seeds', [1, 2, 3]),
+    (nbt.BYTE_ARRAY, 'Blob', b'\x00' * 1000),
+    (nbt.COMPOUND, 'abilities', [
+        (nbt.BYTE, 'flying', 0), (nbt.FLOAT, 'walkSpeed', 0.1)]),
+    (nbt.LIST, 'Inventory', (nbt.COMPOUND, [
+        item(1, 'minecraft:torch', 32), item(0, 'minecraft:iron_pickaxe', 1)
+    ])),
+    (nbt.INT_ARRAY, 'UUID', [1, 2, 3, 4]),
+]
+
+STATS = {
+    'stats': {
+        'minecraft:custom': {
+            'minecraft:play_time': 20 * 3600,
+            'minecraft:deaths': 2,
+            'minecraft:mob_kills': 40,
+        },
+        'minecraft:mined': {'minecraft:stone': 100, 'minecraft:dirt': 20},
+    },
+    'DataVersion': 3120,
+}
+
+
+@pytest.fixture(scope='function')
+def world(tmp_path):
+    """Yield a world folder with one player, 'oscar', in the usercache"""
+    world = tmp_path / 'world'
+    (world / 'playerdata').mkdir(parents=True)
+    (world / 'stats').mkdir()
+    write_nbt(world / 'playerdata' / f'{UUID}.dat', PLAYER)
+    (world / 'stats' / f'{UUID}.json').write_text(json.dumps(STATS))
+    (tmp_path / 'usercache.json').write_text(json.dumps(
+        [{'name': 'Oscar', 'uuid': UUID, 'expiresOn': ''}]))
+    yield world
+
+def test_load_all(tmp_path):
+    """Every tag type is read from a gzipped file"""
+    write_nbt(tmp_path / 'p.dat', PLAYER)
+    tags = nbt.load(tmp_path / 'p.dat')
+    assert tags['Pos'] == [12.5, 64.0, -3.25]
+    assert tags['Health'] == 18.5
+    assert tags['Seeds'] == [1, 2, 3]
+    assert tags['UUID'] == [1, 2, 3, 4]
+    assert tags['abilities']['flying'] == 0
+    assert tags['Inventory'][0]['id'] == 'minecraft:torch'
+
+def test_load_selected(tmp_path):
+    """Only the selected tags are returned, nested ones too"""
+    write_nbt(tmp_path / 'p.dat', PLAYER)
+    tags = nbt.load(tmp_path / 'p.dat', select={
+        'UUID': True, 'abilities': {'walkSpeed': True}, 'Missing': True})
+    assert tags == {'UUID': [1, 2, 3, 4],
+                    'abilities': {'walkSpeed': pytest.approx(0.1)}}
+
+def test_reading_stops_after_selected_tags(tmp_path):
+    """Tags after the last selected one aren't even read"""
+    write_nbt(tmp_path / 'p.dat', PLAYER, truncate=10)
+    with pytest.raises(NBTError):
+        nbt.load(tmp_path / 'p.dat')
+    assert nbt.load(tmp_path / 'p.dat', select={'Health': True}) == {
+        'Health': 18.5}
+
+def test_not_nbt(tmp_path):
+    """A file that is not gzipped NBT raises NBTError"""
+    (tmp_path / 'p.dat').write_bytes(b'not gzip')
+    with pytest.raises(NBTError):
+        nbt.load(tmp_path / 'p.dat')
+
+@pytest.mark.parametrize('tag_type', [nbt.LIST, nbt.BYTE_ARRAY,
+                                      nbt.LONG_ARRAY])
+def test_negative_length(tmp_path, tag_type):
+    """A negative list or array length is an error, read or skipped"""
+    length = struct.pack('>i', -1)
+    if tag_type == nbt.LIST:
+        length = bytes([nbt.INT]) + length
+    data = (bytes([nbt.COMPOUND]) + payload(nbt.STRING, '')
+            + bytes([tag_type]) + payload(nbt.STRING, 'Bad') + length)
+    with gzip.open(tmp_path / 'p.dat', 'wb') as f:
+        f.write(data)
+    with pytest.raises(NBTError, match='negative length'):
+        nbt.load(tmp_path / 'p.dat')
+    with pytest.raises(NBTError, match='negative length'):
+        nbt.load(tmp_path / 'p.dat', select={'Health': True})
+
+def test_player_data(world):
+    """A player looked up by name through the usercache"""
+    player = PlayerData(str(world)).player('oscar')
+    assert player['uuid'] == UUID
+    assert player['position'] == {
+        'x': 12.5, 'y': 64.0, 'z': -3.25, 'dimension': 'minecraft:overworld'}
+    assert player['game_mode'] == 'survival'
+    assert [i['id'] for i in player['inventory']] == [
+        'minecraft:iron_pickaxe', 'minecraft:torch']
+    assert player['stats']['play_time'] == 3600
+    assert player['stats']['mined'] == 120
+    assert PlayerData(str(world)).player('nobody') is None
+
+def test_item_count_since_1_20_5(world):
+    """Newer player files name an item's count in lowercase"""
+    write_nbt(world / 'playerdata' / f'{UUID}.dat', [
+        (nbt.LIST, 'Inventory', (nbt.COMPOUND, [[
+            (nbt.BYTE, 'Slot', 0), (nbt.STRING, 'id', 'minecraft:torch'),
+            (nbt.INT, 'count', 64)]]))])
+    player = PlayerData(str(world)).player('oscar')
+    assert player['inventory'] == [
+        {'slot': 0, 'id': 'minecraft:torch', 'count': 64}]
+
+def test_offline_uuid(world):
+    """A player missing from the usercache has their offline UUID"""
+    uuid = offline_uuid('papa')
+    write_nbt(world / 'playerdata' / f'{uuid}.dat', PLAYER)
+    player = PlayerData(str(world)).player('papa')
+    assert player['uuid'] == uuid
+    assert player['stats'] is None
+
+def test_cache_reloads_changed_files(world):
+    """Unchanged files come from the cache; changed ones are read again"""
+    data = PlayerData(str(world))
+    data.player('oscar')
+    data.player('oscar')
+    assert data.stats()['hits'] == 3  # usercache, .dat and .json
+    path = world / 'stats' / f'{UUID}.json'
+    path.write_text(json.dumps({'stats': {}}))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert data.player('oscar')['stats']['play_time'] == 0
+
+def test_cache_is_lru(tmp_path):
+    """The least recently used file is the one dropped"""
+    cache = FileCache(size=2)
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).write_text(name)
+    loads = []
+
+    def _load(path):
+        loads.append(os.path.basename(path))
+        return path
+
+    for name in ('a', 'b', 'a', 'c', 'a', 'b'):
+        cache.get(str(tmp_path / name), _load)
+    assert loads == ['a', 'b', 'c', 'b']
+
+def test_player_page(world, tmp_path):
+    """The page reads the world's files without touching RCON"""
+    (tmp_path / 'world-testing.conf').write_text(
+        "RCON_SERVER='localhost'\n"
+        "RCON_PASSWD='password'\n"
+        'RCON_WARM=False\n'
+        "WORLD_DIR='world'\n"
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}\n"
+    )
+    app = create_app('world', instance_path=str(tmp_path))
+    rv = app.test_client().get('/player/oscar/')
+    assert b'minecraft:iron_pickaxe' in rv.data
+    assert b'1h 00m' in rv.data
+    assert app.mcr.stats()['created'] == 0
+    app.fleet.close()
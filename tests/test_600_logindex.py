@@ -0,0 +1,231 @@
+"""Test indexing and searching the server's logs"""
+
+from datetime import datetime
+import gzip
+import json
+import os
+
+import pytest
+
+from app import create_app
+from app.logindex import LogIndex
+
+# 2026-10-14 22:00 to 2026-10-15 01:00, rotated on the 15th
+ARCHIVE = [
+    '[22:00:00] [Server thread/INFO]: Starting minecraft server version '
+    '1.19.2',
+    '[22:10:00] [User Authenticator #1/INFO]: UUID of player alice is 1234',
+    '[22:10:01] [Server thread/INFO]: alice[/127.0.0.1:5000] logged in with '
+    'entity id 1 at (0.5, 64.0, 0.5)',
+    '[22:10:01] [Server thread/INFO]: alice joined the game',
+    '[23:30:00] [Server thread/INFO]: <alice> hello',
+    '[23:59:59] [Server thread/WARN]: Can\'t keep up! Is the server '
+    'overloaded?',
+    '[00:30:00] [Server thread/INFO]: [alice: Gave 1 [Diamond] to alice]',
+    '[01:00:00] [Server thread/INFO]: alice left the game',
+]
+# 2026-10-15, no alice
+QUIET = [
+    '[09:00:00] [Server thread/INFO]: bob joined the game',
+    '[09:05:00] [Server thread/INFO]: bob left the game',
+]
+LATEST = [
+    '[10:00:00] [Server thread/INFO]: bob joined the game',
+    '[10:01:00] [Server thread/INFO]: alice joined the game',
+    '[10:02:00] [Server thread/INFO]: <bob> hi alice',
+    'a continuation line without a timestamp',
+    '[10:03:00] [Server thread/ERROR]: Exception stopping the server',
+]
+
+
+def at(day, clock):
+    return datetime.fromisoformat(f'2026-10-{day} {clock}').timestamp()
+
+def write_log(path, lines, mtime=None):
+    data = ''.join(line + '\n' for line in lines).encode()
+    if path.suffix == '.gz':
+        with gzip.open(path, 'wb') as f:
+            f.write(data)
+    else:
+        path.write_bytes(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+@pytest.fixture
+def logs(tmp_path):
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    write_log(logs / '2026-10-15-1.log.gz', ARCHIVE)
+    write_log(logs / '2026-10-15-2.log.gz', QUIET)
+    write_log(logs / 'latest.log', LATEST, mtime=at(16, '10:03:00'))
+    return logs
+
+@pytest.fixture
+def index(logs, tmp_path):
+    index = LogIndex(str(logs), str(tmp_path / 'logindex.db'))
+    index.update()
+    yield index
+    index.close()
+
+def lines(matches):
+    return [match['line'].split(': ', 1)[1] for match in matches]
+
+def test_files(index):
+    """Every log is listed with its time range and line count"""
+    files = index.files()
+    assert [f['name'] for f in files] == [
+        '2026-10-15-1.log.gz', '2026-10-15-2.log.gz', 'latest.log']
+    assert files[0]['start'] == at(14, '22:00:00')
+    assert files[0]['end'] == at(15, '01:00:00')
+    assert files[2]['lines'] == 4
+
+def test_search_player(index):
+    """A player search finds their lines across files, case-insensitively"""
+    matches = list(index.search(player='Alice'))
+    assert [m['time'] for m in matches[:2]] == [
+        at(14, '22:10:01'), at(14, '22:10:01')]
+    # alice wasn't known until she logged in
+    assert lines(matches) == [
+        'alice[/127.0.0.1:5000] logged in with entity id 1 at '
+        '(0.5, 64.0, 0.5)',
+        'alice joined the game',
+        '<alice> hello',
+        '[alice: Gave 1 [Diamond] to alice]',
+        'alice left the game',
+        'alice joined the game',
+        '<bob> hi alice',
+    ]
+    assert matches[-1]['file'] == 'latest.log'
+    assert matches[-1]['time'] == at(16, '10:02:00')
+
+def test_search_event(index):
+    """Lines are found by event, alone or with a player"""
+    assert lines(index.search(event='join')) == [
+        'alice joined the game', 'bob joined the game',
+        'bob joined the game', 'alice joined the game']
+    assert lines(index.search(event='chat', player='bob')) == [
+        '<bob> hi alice']
+    assert [m['time'] for m in index.search(event='warn')] == [
+        at(14, '23:59:59')]
+    assert lines(index.search(event='error')) == [
+        'Exception stopping the server']
+
+def test_search_time_and_text(index):
+    """Searches can be limited to a time range and to text in the line"""
+    matches = index.search(since=at(15, '00:00:00'),
+                           until=at(16, '10:01:00'))
+    assert lines(matches) == [
+        '[alice: Gave 1 [Diamond] to alice]',
+        'alice left the game',
+        'bob joined the game',
+        'bob left the game',
+        'bob joined the game',
+        'alice joined the game',
+    ]
+    assert lines(index.search(text='GAVE')) == [
+        '[alice: Gave 1 [Diamond] to alice]']
+    assert lines(index.search(player='bob', text='left')) == [
+        'bob left the game']
+    # a line without a timestamp has its previous line's time
+    matches = list(index.search(text='continuation'))
+    assert matches[0]['time'] == at(16, '10:02:00')
+
+def test_limit(index):
+    """limit caps the number of matches"""
+    assert len(list(index.search(player='alice', limit=3))) == 3
+
+def test_only_matching_files_are_read(index, logs):
+    """A file without postings for the search is never opened"""
+    path = logs / '2026-10-15-2.log.gz'
+    path.write_bytes(b'\xff' * path.stat().st_size)
+    assert index.update() == 0
+    assert len(list(index.search(player='alice'))) == 7
+    with pytest.raises(OSError):
+        list(index.search(player='bob'))
+
+def test_incremental(index, logs):
+    """Only appended lines are indexed; a partial line waits for its end"""
+    with open(logs / 'latest.log', 'a') as f:
+        f.write('[10:04:00] [Server thread/INFO]: alice left the game\n'
+                '[10:05:00] [Server thread/INFO]: <ali')
+    assert index.update() == 1
+    assert index.update() == 0
+    assert lines(index.search(player='alice', since=at(16, '10:00:00'))) == [
+        'alice joined the game', '<bob> hi alice', 'alice left the game']
+    match = next(index.search(event='leave', since=at(16, '10:04:00')))
+    assert match['time'] == at(16, '10:04:00')
+
+    with open(logs / 'latest.log', 'a') as f:
+        f.write('ce> bye\n')
+    assert index.update() == 1
+    assert lines(index.search(event='chat', player='alice',
+                              since=at(16, '00:00:00'))) == [
+        '<bob> hi alice', '<alice> bye']
+
+def test_rotation(index, logs):
+    """A rotated latest.log is indexed anew and deleted logs are dropped"""
+    latest = logs / 'latest.log'
+    write_log(logs / '2026-10-16-1.log.gz', LATEST)
+    latest.unlink()
+    write_log(latest, ['[11:00:00] [Server thread/INFO]: carol joined the '
+                       'game'], mtime=at(16, '11:00:00'))
+    index.update()
+    assert [f['name'] for f in index.files()] == [
+        '2026-10-15-1.log.gz', '2026-10-15-2.log.gz', '2026-10-16-1.log.gz',
+        'latest.log']
+    assert lines(index.search(event='join', since=at(16, '00:00:00'))) == [
+        'bob joined the game', 'alice joined the game',
+        'carol joined the game']
+
+    # deleted logs are forgotten
+    (logs / '2026-10-15-1.log.gz').unlink()
+    index.update()
+    assert lines(index.search(event='chat')) == ['<bob> hi alice']
+
+def test_index_persists(index, logs, tmp_path):
+    """An index reopened from its file picks up where it left off"""
+    again = LogIndex(str(logs), str(tmp_path / 'logindex.db'))
+    assert again.update() == 0
+    # players seen before are still recognized in new lines
+    with open(logs / 'latest.log', 'a') as f:
+        f.write('[10:04:00] [Server thread/INFO]: Teleported alice to 0, 0\n')
+    again.update()
+    assert lines(again.search(player='alice', since=at(16, '10:03:00'))) == [
+        'Teleported alice to 0, 0']
+
+def test_search_endpoint(logs, tmp_path):
+    """/logs/search streams matches as JSON lines"""
+    (tmp_path / 'logs-testing.conf').write_text(
+        "RCON_SERVER='localhost'\n"
+        "RCON_PASSWD='password'\n"
+        'RCON_WARM=False\n'
+        "LOG_DIR='logs'\n"
+        'LOG_SEARCH_LIMIT=2\n'
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}\n"
+    )
+    app = create_app('logs', instance_path=str(tmp_path))
+    app.logindex.update()
+    client = app.test_client()
+
+    rv = client.get('/logs/search?player=alice&limit=5')
+    assert rv.mimetype == 'application/x-ndjson'
+    matches = [json.loads(line) for line in rv.data.splitlines()]
+    assert lines(matches) == ['alice[/127.0.0.1:5000] logged in with entity '
+                              'id 1 at (0.5, 64.0, 0.5)',
+                              'alice joined the game']
+    assert matches[0]['file'] == '2026-10-15-1.log.gz'
+
+    rv = client.get('/logs/search?event=leave&since='
+                    f'{at(15, "02:00:00")}')
+    assert lines(json.loads(line) for line in rv.data.splitlines()) == [
+        'bob left the game']
+    assert client.get('/logs/search?event=nope').status_code == 400
+    assert len(client.get('/logs/').json['files']) == 3
+    app.logindex.close()
+    app.fleet.close()
+
+def test_no_log_dir(client):
+    """Without LOG_DIR the log search is a 404"""
+    rv = client.get('/logs/search?player=alice')
+    assert rv.status_code == 404
+    assert rv.json['result'] == 'failure'
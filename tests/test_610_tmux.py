@@ -0,0 +1,159 @@
+"""Test following and typing into a console running in tmux"""
+
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app import create_app
+from app.tmux import TmuxConsole, TmuxError
+
+needs_tmux = pytest.mark.skipif(shutil.which('tmux') is None,
+                                reason='tmux is not installed')
+RUN_FAKESERVER = os.path.join(os.path.dirname(__file__), 'run_fakeserver.py')
+
+
+def wait_for(subscriber, text, timeout=10):
+    """Return the first line containing text"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            event, line = subscriber.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if event == 'line' and text in line:
+            return line
+    raise AssertionError(f'no line with {text!r}')
+
+@pytest.fixture
+def session(tmp_path):
+    """The fake server in a tmux session, the way run.bsh starts it"""
+    socket = str(tmp_path / 'tmux_socket')
+    subprocess.run(
+        ['tmux', '-S', socket, 'new-session', '-s', 'mc', '-d', '-x', '200',
+         sys.executable, '-i', RUN_FAKESERVER],
+        check=True, cwd=tmp_path)
+    console = TmuxConsole(socket, 'mc')
+    # wait for the prompt
+    deadline = time.time() + 10
+    while 'mcr connected' not in console.tmux('capture-pane', '-p'):
+        assert time.time() < deadline, 'the fake server did not start'
+        time.sleep(0.1)
+    yield socket
+    console.send('mcr.command("stop")')
+    time.sleep(0.25)
+    subprocess.run(['tmux', '-S', socket, 'kill-server'])
+
+def test_feed_lines():
+    """Escape sequences are dropped and carriage returns rewrite a line"""
+    console = TmuxConsole('unused', history=2)
+    subscriber = console.broadcaster.subscribe()
+    console.feed(b'\x1b[?2004h>>> print(1)\r\n1\r\n>>> ')
+    console.feed(b'\x1b[32mgreen\x1b[0m\r\n'
+                 b'\x1b]0;title\x07loading...\rdone\n')
+    assert list(console.lines) == ['>>> green', 'done']
+    assert [subscriber.get_nowait() for _ in range(0, 4)] == [
+        ('line', '>>> print(1)'), ('line', '1'), ('line', '>>> green'),
+        ('line', 'done')]
+
+def test_feed_split_reads():
+    """Characters and escape sequences split between reads survive"""
+    console = TmuxConsole('unused')
+    data = '\x1b[32mgrün §\x1b[0m\r\n'.encode()
+    for i in range(0, len(data)):
+        console.feed(data[i:i + 1])
+    assert list(console.lines) == ['grün §']
+
+def test_no_session(tmp_path):
+    """Without a tmux server to talk to, TmuxError is raised"""
+    console = TmuxConsole(str(tmp_path / 'no_socket'))
+    with pytest.raises(TmuxError):
+        console.subscribe()
+    with pytest.raises(TmuxError):
+        console.send('list')
+
+@needs_tmux
+def test_console_output_and_keys(session):
+    """The history comes from the pane, then new output as it's written"""
+    console = TmuxConsole(session, 'mc', history=50)
+    subscriber = console.subscribe()
+    event, history = subscriber.get_nowait()
+    assert event == 'history'
+    assert 'mcr connected...' in history
+
+    console.send('print(mcr.command("list"))')
+    assert 'There are 0 of a max of' in wait_for(subscriber, 'There are')
+    console.send('fake_server.player_join("alice")')
+    console.send('print(mcr.command("list"))')
+    assert wait_for(subscriber, 'There are 1').endswith('alice')
+
+    # a key by name: C-c interrupts a half typed line
+    console.send('print("never run")', enter=False)
+    console.keys('C-c')
+    wait_for(subscriber, 'KeyboardInterrupt')
+    console.close()
+
+@needs_tmux
+def test_console_endpoints(session, tmp_path):
+    """The console page types into the pane and shows what it prints"""
+    (tmp_path / 'tmux-testing.conf').write_text(
+        "RCON_SERVER='localhost'\n"
+        "RCON_PASSWD='password'\n"
+        'RCON_WARM=False\n'
+        "CONSOLE_TMUX_SOCKET='tmux_socket'\n"
+        f"LOG_FILE={str(tmp_path / 'application.log')!r}\n"
+    )
+    app = create_app('tmux', instance_path=str(tmp_path))
+    client = app.test_client()
+    assert b'console-keys' in client.get('/console/').data
+
+    subscriber = app.tmux.subscribe()
+    rv = client.post('/console/keys', json={'text': 'print(6 * 7)'})
+    assert rv.json == {'result': 'success'}
+    assert wait_for(subscriber, '42') == '42'
+    app.tmux.close()
+    app.fleet.close()
+
+class RecordingConsole(TmuxConsole):
+    """A TmuxConsole recording the tmux commands instead of running them"""
+    def __init__(self):
+        super().__init__('unused')
+        self.commands = []
+
+    def tmux(self, *args):
+        self.commands.append(args)
+        return ''
+
+def test_keys_only_sends_no_enter(app, client):
+    """Keys by name are sent alone, without typing Enter first"""
+    app.tmux = RecordingConsole()
+    rv = client.post('/console/keys', json={'keys': ['C-c']})
+    assert rv.json == {'result': 'success'}
+    assert app.tmux.commands == [('send-keys', '-t', 'mc', 'C-c')]
+
+    app.tmux.commands.clear()
+    client.post('/console/keys', json={'text': 'y', 'enter': False})
+    client.post('/console/keys', json={'enter': True})
+    assert app.tmux.commands == [
+        ('send-keys', '-t', 'mc', '-l', 'y'),
+        ('send-keys', '-t', 'mc', 'Enter')]
+
+def test_keys_rejects_bad_input(app, client):
+    """The keys endpoint wants a JSON object"""
+    app.tmux = RecordingConsole()
+    for body in (['stop'], 'stop', {'enter': 'yes'}, {'keys': 'C-c'}):
+        rv = client.post('/console/keys', json=body)
+        assert rv.status_code == 400
+    rv = client.post('/console/keys', data='stop',
+                     content_type='application/json')
+    assert rv.status_code == 400
+    assert app.tmux.commands == []
+
+def test_keys_without_tmux(client):
+    """Without a tmux socket the keys endpoint is a 404"""
+    rv = client.post('/console/keys', json={'text': 'stop'})
+    assert rv.status_code == 404